@@ -0,0 +1,343 @@
+###############################################
+# FTZ Savings – B-Test Analytics
+###############################################
+"""Incremental B-test metrics over the log sheet.
+
+The sheet only ever grows by appends, so ``AnalyticsCache`` keeps a cursor
+(the last sheet row it has read) and each ``refresh`` fetches just the rows
+after it, a page of ``PAGE_ROWS`` at a time with ``Worksheet.get`` on the
+range from column A through ``column_letter(len(LOG_COLUMNS))``, one column
+per logged field. New rows are folded into running aggregates in the same
+SQLite transaction that advances the cursor, so a refresh costs time in
+proportion to what was logged since the last one, never to the sheet's size.
+
+Row kinds follow the app's logging: a CTA row has ``cta_clicked == "Yes"``,
+a chat row carries the (unmatched) ``chat_question``, anything else is a
+Calculate click. Only unanswered questions are logged, so the question
+metrics are about gaps in the FAQ rather than total chat volume. Calculate
+clicks stopped being logged one row each when the experiment counters came
+in; those, and per-variant conversion, come from the aggregates worksheet
+(``refresh_aggregates``), read with its own cursor in the same way.
+
+If rows are ever deleted or reordered in the sheet, ``reset()`` and refresh.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+
+from experiments import COUNTERS, TDigest
+from sheet_logging import LOG_COLUMNS
+
+ANALYTICS_PATH = os.environ.get("FTZ_ANALYTICS_DB", "var/analytics.sqlite3")
+
+# Rows per range read; a Sheets API call returns this many in well under a second
+PAGE_ROWS = 2000
+
+CALCULATE, CTA, QUESTION = 0, 1, 2
+
+# Lower edges of the net-savings buckets ($); anything below 0 is "negative"
+SAVINGS_EDGES = (0, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+
+
+def column_letter(number: int) -> str:
+    """1 -> "A", 27 -> "AA"."""
+    letters = ""
+    while number:
+        number, rest = divmod(number - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def savings_bucket(value: float) -> int:
+    """Index into ``bucket_labels()``: 0 for negative savings, then one per edge."""
+    return bisect_right(SAVINGS_EDGES, value)
+
+
+def bucket_labels() -> list:
+    def short(x):
+        if x >= 1_000_000:
+            return f"${x / 1_000_000:g}M"
+        return f"${x / 1000:g}k" if x else "$0"
+
+    labels = ["< $0"]
+    for low, high in zip(SAVINGS_EDGES, SAVINGS_EDGES[1:]):
+        labels.append(f"{short(low)}–{short(high)}")
+    labels.append(f"≥ {short(SAVINGS_EDGES[-1])}")
+    return labels
+
+
+def _number(text: str):
+    try:
+        return float(str(text).replace("$", "").replace(",", ""))
+    except ValueError:
+        return None
+
+
+class AnalyticsCache:
+    def __init__(self, path: str = ANALYTICS_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+            CREATE TABLE IF NOT EXISTS events (
+                row INTEGER PRIMARY KEY,
+                event_id TEXT UNIQUE,
+                session_id TEXT NOT NULL,
+                kind INTEGER NOT NULL,
+                net_savings REAL,
+                timestamp TEXT
+            );
+            CREATE TABLE IF NOT EXISTS counters (kind INTEGER PRIMARY KEY, events INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS savings_buckets (bucket INTEGER PRIMARY KEY, events INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                calculations INTEGER NOT NULL,
+                ctas INTEGER NOT NULL,
+                questions INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS aggregate_rows (event_id TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS variants (
+                experiment TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                counts TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (experiment, variant)
+            );
+            """
+        )
+
+    # -----------------------------
+    # FETCHING
+    # -----------------------------
+    def cursor(self, key: str = "cursor") -> int:
+        """Last sheet row already folded in (1 is the header)."""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else 1
+
+    def refresh(self, sheet, page_rows: int = PAGE_ROWS) -> int:
+        """Fetch and aggregate every log row appended since the last refresh; returns how many."""
+        required = ("session_id", "net_savings", "cta_clicked", "chat_question")
+        with self._lock:
+            fetched = self._fetch(sheet, "cursor", LOG_COLUMNS, required, self._ingest, page_rows)
+            self._set_meta("refreshed_at", time.time())
+            return fetched
+
+    def refresh_aggregates(self, sheet, page_rows: int = PAGE_ROWS) -> int:
+        """Fold in new experiment aggregate rows; returns how many were read."""
+        required = ("experiment", "variant", *COUNTERS)
+        with self._lock:
+            return self._fetch(sheet, "aggregate_cursor", None, required, self._ingest_aggregates, page_rows)
+
+    def _fetch(self, sheet, cursor_key: str, columns, required: tuple, ingest, page_rows: int) -> int:
+        header = [cell or "" for cell in sheet.row_values(1)]
+        missing = [name for name in required if name not in header]
+        if missing:
+            raise ValueError(f"Sheet has no {', '.join(missing)} column")
+        index = {name: i for i, name in enumerate(header) if name and (columns is None or name in columns)}
+        # The log sheet is read through its LOG_COLUMNS only (further if a
+        # hand-added column pushed one of them right); the aggregates sheet whole
+        width = len(header) if columns is None else max(len(columns), max(index.values(), default=-1) + 1)
+        last_column = column_letter(width)
+
+        fetched = 0
+        while True:
+            start = self.cursor(cursor_key) + 1
+            rows = sheet.get(f"A{start}:{last_column}{start + page_rows - 1}")
+            if rows:
+                ingest(start, rows, index)
+                fetched += len(rows)
+            if len(rows) < page_rows:
+                return fetched
+
+    def reset(self):
+        """Forget everything; the next refresh re-reads the sheet from row 2."""
+        with self._lock:
+            self._conn.executescript(
+                "BEGIN; DELETE FROM meta; DELETE FROM events; DELETE FROM counters;"
+                " DELETE FROM savings_buckets; DELETE FROM sessions;"
+                " DELETE FROM aggregate_rows; DELETE FROM variants; COMMIT;"
+            )
+
+    def _ingest(self, start: int, rows: list, index: dict):
+        events = []
+        counters = defaultdict(int)
+        buckets = defaultdict(int)
+        sessions = defaultdict(lambda: [0, 0, 0])
+
+        def cell(row, name):
+            i = index.get(name)
+            return row[i] if i is not None and i < len(row) else ""
+
+        for offset, row in enumerate(rows):
+            session_id = cell(row, "session_id")
+            if not session_id:
+                continue
+            if cell(row, "cta_clicked") == "Yes":
+                kind = CTA
+            elif cell(row, "chat_question"):
+                kind = QUESTION
+            else:
+                kind = CALCULATE
+            savings = _number(cell(row, "net_savings"))
+            events.append((start + offset, cell(row, "event_id") or None, session_id, kind, savings, cell(row, "timestamp")))
+
+        with self._conn:
+            self._conn.execute("BEGIN")
+            cur = self._conn.executemany("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?)", events)
+            # Rows already seen under another row number (a re-sent batch) add nothing
+            if cur.rowcount != len(events):
+                inserted = {r[0] for r in self._conn.execute(
+                    "SELECT row FROM events WHERE row BETWEEN ? AND ?", (start, start + len(rows) - 1)
+                )}
+                events = [e for e in events if e[0] in inserted]
+            for _, _, session_id, kind, savings, _ in events:
+                counters[kind] += 1
+                sessions[session_id][kind] += 1
+                if kind == CALCULATE and savings is not None:
+                    buckets[savings_bucket(savings)] += 1
+
+            self._conn.executemany(
+                "INSERT INTO counters VALUES (?, ?) ON CONFLICT(kind) DO UPDATE SET events = events + excluded.events",
+                counters.items(),
+            )
+            self._conn.executemany(
+                "INSERT INTO savings_buckets VALUES (?, ?)"
+                " ON CONFLICT(bucket) DO UPDATE SET events = events + excluded.events",
+                buckets.items(),
+            )
+            self._conn.executemany(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET"
+                " calculations = calculations + excluded.calculations,"
+                " ctas = ctas + excluded.ctas, questions = questions + excluded.questions",
+                [(s, *counts) for s, counts in sessions.items()],
+            )
+            self._conn.execute(
+                "INSERT INTO meta VALUES ('cursor', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (start + len(rows) - 1,),
+            )
+
+    def _ingest_aggregates(self, start: int, rows: list, index: dict):
+        def cell(row, name):
+            i = index.get(name)
+            return row[i] if i is not None and i < len(row) else ""
+
+        with self._conn:
+            self._conn.execute("BEGIN")
+            totals = {}
+            for row in rows:
+                event_id = cell(row, "event_id")
+                if event_id and self._conn.execute(
+                    "INSERT OR IGNORE INTO aggregate_rows VALUES (?)", (event_id,)
+                ).rowcount == 0:
+                    continue
+                key = (cell(row, "experiment"), cell(row, "variant"))
+                if not key[1]:
+                    continue
+                if key not in totals:
+                    stored = self._conn.execute(
+                        "SELECT counts, digest FROM variants WHERE experiment = ? AND variant = ?", key
+                    ).fetchone()
+                    digest = TDigest()
+                    if stored:
+                        digest.merge(json.loads(stored[1]))
+                    totals[key] = (json.loads(stored[0]) if stored else dict.fromkeys(COUNTERS, 0), digest)
+                counts, digest = totals[key]
+                for name in COUNTERS:
+                    counts[name] += int(_number(cell(row, name)) or 0)
+                if cell(row, "net_savings_digest"):
+                    digest.merge(json.loads(cell(row, "net_savings_digest")))
+
+            self._conn.executemany(
+                "INSERT INTO variants VALUES (?, ?, ?, ?) ON CONFLICT(experiment, variant)"
+                " DO UPDATE SET counts = excluded.counts, digest = excluded.digest",
+                [(*key, json.dumps(counts), json.dumps(digest.centroids())) for key, (counts, digest) in totals.items()],
+            )
+            self._conn.execute(
+                "INSERT INTO meta VALUES ('aggregate_cursor', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (start + len(rows) - 1,),
+            )
+
+    def _set_meta(self, key: str, value):
+        self._conn.execute(
+            "INSERT INTO meta VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value)
+        )
+
+    # -----------------------------
+    # METRICS
+    # -----------------------------
+    def _session_counts(self) -> tuple:
+        return self._conn.execute(
+            """
+            SELECT COUNT(*),
+                   COALESCE(SUM(calculations > 0), 0),
+                   COALESCE(SUM(calculations > 0 AND ctas > 0), 0),
+                   COALESCE(SUM(questions > 0), 0)
+            FROM sessions
+            """
+        ).fetchone()
+
+    def summary(self) -> dict:
+        counts = dict(self._conn.execute("SELECT kind, events FROM counters"))
+        sessions, calculated, converted, asked = self._session_counts()
+        refreshed = self._conn.execute("SELECT value FROM meta WHERE key = 'refreshed_at'").fetchone()
+        return {
+            "rows": sum(counts.values()),
+            "calculations": counts.get(CALCULATE, 0),
+            "ctas": counts.get(CTA, 0),
+            "unmatched_questions": counts.get(QUESTION, 0),
+            "sessions": sessions,
+            # Share of sessions that calculated and also asked for a call
+            "calculate_to_cta": converted / calculated if calculated else 0.0,
+            "unmatched_per_session": counts.get(QUESTION, 0) / sessions if sessions else 0.0,
+            "sessions_with_unmatched": asked / sessions if sessions else 0.0,
+            "cursor": self.cursor(),
+            "refreshed_at": float(refreshed[0]) if refreshed else None,
+        }
+
+    def savings_histogram(self) -> list:
+        """``(label, calculations)`` for every net-savings bucket, in order."""
+        counts = dict(self._conn.execute("SELECT bucket, events FROM savings_buckets"))
+        return [(label, counts.get(i, 0)) for i, label in enumerate(bucket_labels())]
+
+    def funnel(self) -> list:
+        """``(stage, sessions)`` from first visit through to a CTA."""
+        sessions, calculated, converted, asked = self._session_counts()
+        return [
+            ("Logged any event", sessions),
+            ("Calculated savings", calculated),
+            ("Calculated, then requested a call", converted),
+            ("Asked an unanswered question", asked),
+        ]
+
+    def variant_summary(self) -> list:
+        """Per experiment variant: totals, conversion and median net savings shown."""
+        summary = []
+        for experiment, variant, counts, digest in self._conn.execute(
+            "SELECT experiment, variant, counts, digest FROM variants ORDER BY experiment, variant"
+        ):
+            counts = json.loads(counts)
+            savings = TDigest()
+            savings.merge(json.loads(digest))
+            calculating = counts["calculating_sessions"]
+            exposures = counts["exposures"]
+            summary.append({
+                "experiment": experiment,
+                "variant": variant,
+                **counts,
+                "calculate_to_cta": counts["converted_sessions"] / calculating if calculating else 0.0,
+                "cta_per_exposure": counts["cta_sessions"] / exposures if exposures else 0.0,
+                "unmatched_per_exposure": counts["unmatched_questions"] / exposures if exposures else 0.0,
+                "net_savings_p50": savings.quantile(0.5),
+            })
+        return summary
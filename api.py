@@ -0,0 +1,459 @@
+###############################################
+# FTZ Savings – Headless HTTP/JSON API
+###############################################
+"""The calculator, chatbot and lead capture as an ASGI service, no Streamlit.
+
+    uvicorn api:app --workers 4
+
+    POST /estimate   {"inputs": {...}}                   one scenario
+                     {"columns": {"field": [...], ...}}  a batch, columnar
+                     {"scenarios": [{...}, ...]}          a batch, row by row
+    POST /ask        {"question": "...", "session_id": "..."}
+    POST /lead       {"name", "company", "email", "phone", "message", "inputs", "session_id"}
+    GET  /metrics    Prometheus text, same spans as the app
+    GET  /health
+
+Inputs are named as in ``INPUT_FIELDS``; anything left out takes the form
+default. A single estimate goes through the shared ``cached_savings`` LRU and
+a batch is one vectorized ``compute_savings`` call, off the event loop. Leads
+and unmatched questions are logged with the app's ``LOG_COLUMNS`` row shape
+through one process-wide ``SheetWriter``, so the Sheets client is authorized
+once and reused. A spool has exactly one replayer: each worker process locks
+the first free slot of ``FTZ_API_LOG_SPOOL`` (the path itself, then
+``<name>.1``, ``<name>.2``, ...) and replays only that file, never the app's
+spool. A restarted worker takes over the slot its predecessor released,
+rows still pending included, and adopts any higher slot left unheld with
+rows to send (as after a restart with fewer workers).
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import tomllib
+import uuid
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from calculations import INPUT_BOUNDS, INPUT_DEFAULTS, INPUT_FIELDS, LINE_ITEMS, cached_savings, compute_savings
+from knowledge_base import FAQ_PATH, KnowledgeBaseStore
+from log_spool import LogSpool
+from perf import render_prometheus, span
+from sheet_logging import LOCAL_SHEET_PATH, LocalSheet, SheetWriter, build_row, ensure_header, open_sheet
+
+logger = logging.getLogger(__name__)
+
+API_SPOOL_PATH = os.environ.get("FTZ_API_LOG_SPOOL", "var/api_log_spool.sqlite3")
+SERVICE_ACCOUNT_FILE = os.environ.get("FTZ_SERVICE_ACCOUNT_FILE", "")
+SECRETS_PATH = os.environ.get("FTZ_SECRETS_PATH", ".streamlit/secrets.toml")
+
+# Largest batch one request may price, and how many batches run at once
+MAX_BATCH_ROWS = int(os.environ.get("FTZ_API_MAX_BATCH", "100000"))
+BATCH_CONCURRENCY = int(os.environ.get("FTZ_API_BATCH_CONCURRENCY", str(os.cpu_count() or 2)))
+# Leads and questions each fsync a spool row; cap the threads doing that
+LOG_CONCURRENCY = int(os.environ.get("FTZ_API_LOG_CONCURRENCY", "8"))
+# How long a request waits for a slot before getting a 503
+QUEUE_TIMEOUT = float(os.environ.get("FTZ_API_QUEUE_TIMEOUT", "5"))
+# Spool slots tried at startup; more than any sensible --workers count
+MAX_SPOOL_SLOTS = 64
+
+UNMATCHED_REPLY = (
+    "Thank you for your question, Your question will be directed to the Customer "
+    "Success Lead at MAS US Holdings at oscarc@masholdings.com."
+)
+
+
+class InvalidRequest(ValueError):
+    """The request body can't be priced or logged; reported as a 422."""
+
+
+# -----------------------------
+# INPUT VALIDATION
+# -----------------------------
+def _check_fields(names) -> None:
+    unknown = sorted(set(names) - set(INPUT_FIELDS))
+    if unknown:
+        raise InvalidRequest(f"Unknown input(s): {', '.join(unknown)}")
+
+
+def _number(label: str, value) -> float:
+    """One input value as a finite float; the single rule every endpoint applies."""
+    # Exactly int or float: bools, numeric strings and nulls are rejected
+    if type(value) not in (int, float):
+        raise InvalidRequest(f"{label}: {value!r} is not a number")
+    try:
+        number = float(value)
+    except OverflowError:
+        raise InvalidRequest(f"{label}: integer is too large") from None
+    # json.loads accepts NaN and Infinity, which would come back out as invalid JSON
+    if not math.isfinite(number):
+        raise InvalidRequest(f"{label}: {value!r} is not a finite number")
+    return number
+
+
+def parse_inputs(raw) -> dict:
+    """One scenario as ``{field: float}``, with defaults filled in and bounds enforced."""
+    if raw is None:
+        raw = {}
+    if not isinstance(raw, dict):
+        raise InvalidRequest("inputs must be an object")
+    _check_fields(raw)
+    inputs = dict(INPUT_DEFAULTS)
+    for name, value in raw.items():
+        inputs[name] = _number(name, value)
+    for name, (low, high) in INPUT_BOUNDS.items():
+        if low is not None and inputs[name] < low:
+            raise InvalidRequest(f"{name}: {inputs[name]:g} is below the minimum {low:g}")
+        if high is not None and inputs[name] > high:
+            raise InvalidRequest(f"{name}: {inputs[name]:g} is above the maximum {high:g}")
+    return inputs
+
+
+def parse_columns(columns) -> tuple:
+    """A columnar batch as ``(inputs, rows)``: float64 arrays (or defaults) and the row count."""
+    if not isinstance(columns, dict) or not columns:
+        raise InvalidRequest("columns must be a non-empty object of arrays")
+    _check_fields(columns)
+    lengths = {len(v) if isinstance(v, list) else -1 for v in columns.values()}
+    if -1 in lengths or len(lengths) != 1:
+        raise InvalidRequest("every column must be an array of the same length")
+    rows = lengths.pop()
+    if rows > MAX_BATCH_ROWS:
+        raise InvalidRequest(f"batch of {rows} rows exceeds the limit of {MAX_BATCH_ROWS}")
+
+    inputs = {}
+    for name, values in columns.items():
+        # Same rule as a single estimate, checked in bulk; _number reports
+        # the first offending value
+        if not set(map(type, values)) <= {int, float}:
+            bad = next(i for i, v in enumerate(values) if type(v) not in (int, float))
+            _number(f"{name}[{bad}]", values[bad])
+        try:
+            array = np.asarray(values, dtype=np.float64)
+        except OverflowError:
+            array = np.array([_number(f"{name}[{i}]", v) for i, v in enumerate(values)])
+        finite = np.isfinite(array)
+        if not finite.all():
+            row = int(np.argmin(finite))
+            _number(f"{name}[{row}]", values[row])
+        low, high = INPUT_BOUNDS.get(name, (None, None))
+        if low is not None and (array < low).any():
+            row = int(np.argmax(array < low))
+            raise InvalidRequest(f"{name}[{row}]: {array[row]:g} is below the minimum {low:g}")
+        if high is not None and (array > high).any():
+            row = int(np.argmax(array > high))
+            raise InvalidRequest(f"{name}[{row}]: {array[row]:g} is above the maximum {high:g}")
+        inputs[name] = array
+    return inputs, rows
+
+
+def scenarios_to_columns(scenarios) -> dict:
+    if not isinstance(scenarios, list) or not scenarios:
+        raise InvalidRequest("scenarios must be a non-empty array of objects")
+    if len(scenarios) > MAX_BATCH_ROWS:
+        raise InvalidRequest(f"batch of {len(scenarios)} rows exceeds the limit of {MAX_BATCH_ROWS}")
+    if not all(isinstance(s, dict) for s in scenarios):
+        raise InvalidRequest("scenarios must be a non-empty array of objects")
+    names = set().union(*scenarios)
+    _check_fields(names)
+    return {name: [s.get(name, INPUT_DEFAULTS[name]) for s in scenarios] for name in names}
+
+
+def price(inputs: dict) -> dict:
+    """``cached_savings`` for one validated scenario, refused if any line item overflows."""
+    with np.errstate(over="ignore", invalid="ignore"):
+        results = cached_savings(inputs)
+    # Finite inputs can still multiply past the float range (1e307 of
+    # imports), and NaN or inf can't be sent back as JSON
+    if not all(math.isfinite(v) for v in results.values()):
+        raise InvalidRequest("inputs are too large to price")
+    return results
+
+
+def price_batch(columns: dict) -> dict:
+    inputs, rows = parse_columns(columns)
+    with span("api.estimate.batch"):
+        with np.errstate(over="ignore", invalid="ignore"):
+            results = compute_savings(inputs)
+        finite = np.ones(rows, dtype=bool)
+        for name in LINE_ITEMS:
+            finite &= np.isfinite(np.broadcast_to(results[name], (rows,)))
+        if not finite.all():
+            raise InvalidRequest(f"row {int(np.argmin(finite))}: inputs are too large to price")
+        return {
+            "count": rows,
+            "results": {name: np.broadcast_to(results[name], (rows,)).tolist() for name in LINE_ITEMS},
+        }
+
+
+# -----------------------------
+# SHARED RESOURCES
+# -----------------------------
+class Busy(Exception):
+    """No slot freed up within the queue timeout."""
+
+
+class Limiter:
+    """At most ``limit`` holders; waiting longer than ``timeout`` is a 503."""
+
+    def __init__(self, limit: int, timeout: float = QUEUE_TIMEOUT):
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise Busy() from None
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+def service_account_info() -> dict:
+    """Service-account key from ``FTZ_SERVICE_ACCOUNT_FILE``, else the Streamlit secrets file."""
+    if SERVICE_ACCOUNT_FILE:
+        with open(SERVICE_ACCOUNT_FILE) as f:
+            return json.load(f)
+    with open(SECRETS_PATH, "rb") as f:
+        return tomllib.load(f)["gcp_service_account"]
+
+
+def open_log_sheet():
+    with span("sheet.connect"):
+        if LOCAL_SHEET_PATH:
+            return ensure_header(LocalSheet(LOCAL_SHEET_PATH))
+        return open_sheet(service_account_info())
+
+
+def _slot_paths(path: str) -> list:
+    root, ext = os.path.splitext(path)
+    return [path if slot == 0 else f"{root}.{slot}{ext}" for slot in range(MAX_SPOOL_SLOTS)]
+
+
+def _lock_slot(slot_path: str):
+    """The slot's lock file, held; None if another live process holds it."""
+    # POSIX only, like the uvicorn workers this is for
+    import fcntl
+
+    lock = open(f"{slot_path}.lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def claim_spool(path: str = API_SPOOL_PATH) -> tuple:
+    """``(spool path, lock file)`` for the first slot no other live process holds.
+
+    Two writers on one spool would both append its pending rows. The lock
+    is released when the process exits, however it exits.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    for slot_path in _slot_paths(path):
+        lock = _lock_slot(slot_path)
+        if lock is not None:
+            return slot_path, lock
+    raise RuntimeError(f"All {MAX_SPOOL_SLOTS} log spool slots of {path} are in use")
+
+
+def adopt_orphaned_spools(own_path: str, path: str = API_SPOOL_PATH) -> list:
+    """``(spool, lock file)`` for every unheld slot that still has rows to send.
+
+    After a restart with fewer workers, nobody would claim the higher slots
+    again and their pending leads would never reach the sheet. Whoever finds
+    one free takes its lock and replays it alongside its own.
+    """
+    adopted = []
+    for slot_path in _slot_paths(path):
+        if slot_path == own_path or not os.path.exists(slot_path):
+            continue
+        lock = _lock_slot(slot_path)
+        if lock is None:
+            continue
+        spool = LogSpool(slot_path)
+        if spool.pending_count():
+            logger.info("Replaying %d rows left in %s", spool.pending_count(), slot_path)
+            adopted.append((spool, lock))
+        else:
+            spool.close()
+            lock.close()
+    return adopted
+
+
+class Services:
+    """Per-process state created at startup: the FAQ index, log writers and limits."""
+
+    def __init__(self):
+        self.knowledge_base = KnowledgeBaseStore(FAQ_PATH)
+        spool_path, self._spool_lock = claim_spool()
+        self.writer = SheetWriter(open_log_sheet, LogSpool(spool_path))
+        # Held until shutdown; an orphan's writer idles once it is drained
+        adopted = adopt_orphaned_spools(spool_path)
+        self.orphan_writers = [SheetWriter(open_log_sheet, spool) for spool, _ in adopted]
+        self._orphan_locks = [lock for _, lock in adopted]
+        self.batches = Limiter(BATCH_CONCURRENCY)
+        self.logging = Limiter(LOG_CONCURRENCY)
+
+    def log_backlog(self) -> int:
+        return sum(w.spool.pending_count() for w in (self.writer, *self.orphan_writers))
+
+    def close(self):
+        for writer in (self.writer, *self.orphan_writers):
+            writer.close()
+        for lock in (self._spool_lock, *self._orphan_locks):
+            lock.close()
+
+
+async def log_event(services: Services, row: dict) -> bool:
+    """Spool one ``LOG_COLUMNS`` row on a worker thread; True once it is durable."""
+    async with services.logging.slot():
+        with span("api.log.submit"):
+            return await run_in_threadpool(services.writer.submit, build_row(row))
+
+
+def _log_fields(session_id: str, results: dict, **fields) -> dict:
+    return {
+        "session_id": session_id,
+        "net_savings": results["net_savings_to_brand"],
+        "cost_with_ftz": results["total_cost_with_ftz"],
+        "cost_without_ftz": results["total_cost_without_ftz"],
+        "cta_clicked": "No",
+        "cta_name": "",
+        "cta_company": "",
+        "cta_email": "",
+        "cta_phone": "",
+        "cta_message": "",
+        "chat_question": "",
+        **fields,
+    }
+
+
+# -----------------------------
+# ENDPOINTS
+# -----------------------------
+async def _json_body(request) -> dict:
+    try:
+        body = json.loads(await request.body() or b"{}")
+    except ValueError:
+        raise InvalidRequest("body is not valid JSON") from None
+    if not isinstance(body, dict):
+        raise InvalidRequest("body must be a JSON object")
+    return body
+
+
+def _session_id(body: dict) -> str:
+    session_id = body.get("session_id") or f"api-{uuid.uuid4()}"
+    return str(session_id)[:64]
+
+
+async def estimate(request):
+    body = await _json_body(request)
+    if "columns" in body or "scenarios" in body:
+        columns = body["columns"] if "columns" in body else scenarios_to_columns(body["scenarios"])
+        async with request.app.state.services.batches.slot():
+            return JSONResponse(await run_in_threadpool(price_batch, columns))
+
+    with span("api.estimate"):
+        inputs = parse_inputs(body.get("inputs"))
+        return JSONResponse({"inputs": inputs, "results": price(inputs)})
+
+
+async def ask(request):
+    services = request.app.state.services
+    body = await _json_body(request)
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise InvalidRequest("question must be a non-empty string")
+
+    with span("api.ask"):
+        matcher = services.knowledge_base.matcher()
+        key, score = matcher.best(question)
+        answer = matcher.match(question)
+    if answer is None:
+        # Same row the app logs for an unanswered chat question
+        results = price(parse_inputs(body.get("inputs")))
+        await log_event(services, _log_fields(_session_id(body), results, chat_question=question))
+    return JSONResponse({
+        "matched": answer is not None,
+        "key": key if answer is not None else None,
+        "score": round(score, 4),
+        "answer": answer if answer is not None else UNMATCHED_REPLY,
+    })
+
+
+async def lead(request):
+    body = await _json_body(request)
+    fields = {name: body.get(name) or "" for name in ("name", "company", "email", "phone", "message")}
+    if not all(isinstance(v, str) for v in fields.values()):
+        raise InvalidRequest("name, company, email, phone and message must be strings")
+    missing = [name for name in ("name", "company", "email") if not fields[name].strip()]
+    if missing:
+        raise InvalidRequest(f"Missing required field(s): {', '.join(missing)}")
+
+    results = price(parse_inputs(body.get("inputs")))
+    row = _log_fields(
+        _session_id(body),
+        results,
+        cta_clicked="Yes",
+        **{f"cta_{name}": value for name, value in fields.items()},
+    )
+    if not await log_event(request.app.state.services, row):
+        return JSONResponse({"error": "lead could not be recorded, please retry"}, status_code=503)
+    return JSONResponse({"accepted": True, "net_savings": results["net_savings_to_brand"]}, status_code=202)
+
+
+async def metrics(request):
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def health(request):
+    return JSONResponse({"ok": True, "log_backlog": request.app.state.services.log_backlog()})
+
+
+async def invalid_request(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=422)
+
+
+async def busy(request, exc):
+    return JSONResponse({"error": "server busy, retry shortly"}, status_code=503, headers={"Retry-After": "1"})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    app.state.services = Services()
+    try:
+        yield
+    finally:
+        app.state.services.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/estimate", estimate, methods=["POST"]),
+        Route("/ask", ask, methods=["POST"]),
+        Route("/lead", lead, methods=["POST"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/health", health, methods=["GET"]),
+    ],
+    exception_handlers={InvalidRequest: invalid_request, Busy: busy},
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api:app", host="0.0.0.0", port=int(os.environ.get("PORT", "8000")))
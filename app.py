@@ -4,81 +4,135 @@
 
 import streamlit as st
 import pandas as pd
-import difflib
+import io
+import hmac
+import os
 import uuid
-from datetime import datetime
-from zoneinfo import ZoneInfo
-
-import gspread
-from google.oauth2.service_account import Credentials
+from collections import deque
+
+from calculations import INPUT_LABELS, cached_savings
+from knowledge_base import FAQ_PATH, KnowledgeBaseStore
+from sensitivity import OUTPUTS, SWEEP_INPUTS, heatmap, tornado
+from simulation import distribution_around, simulate
+from projection import MAX_YEARS, project_cash_flows
+from breakeven import SOLVABLE_INPUTS, breakeven_table
+from portfolio import summarize_portfolio, template_csv, write_results_csv
+from ledger import ledger_totals, weekly_ledger
+from tariff import duty_by_line, get_tariff_table, read_mix, roll_up
+from reports import report_bytes, report_future, write_results_xlsx
+from log_spool import LogSpool
+from analytics import ANALYTICS_PATH, AnalyticsCache
+from question_clusters import CLUSTER_PATH, QuestionClusters
+from chat_store import ASSISTANT, CHAT_SPILL_PATH, USER, ChatSpill, SessionRegistry, format_message
+from experiments import (
+    AGGREGATE_COLUMNS,
+    AGGREGATE_EVENT_ID_INDEX,
+    AGGREGATE_SPOOL_PATH,
+    AGGREGATE_WORKSHEET,
+    CTA_LABELS,
+    ExperimentCounters,
+    assign_variant,
+)
+from perf import (
+    METRICS_PORT,
+    PERF_JSONL_PATH,
+    SLOW_RERUN_MS,
+    snapshot as perf_snapshot,
+    span,
+    start_jsonl_export,
+    start_metrics_server,
+    start_rerun,
+    traced,
+)
+from sheet_logging import (
+    LOCAL_SHEET_PATH,
+    SPOOL_PATH,
+    STARTUP_TIMINGS,
+    LocalSheet,
+    SheetWriter,
+    build_row,
+    ensure_header,
+    open_sheet,
+)
 
 # =====================================================
-# GOOGLE SHEETS LOGGING
+# PERFORMANCE TRACING
 # =====================================================
-SHEET_NAME = "FTZ_App_B_Test_Log"
+rerun_trace = start_rerun()
 
+@st.cache_resource
+def start_perf_exporters():
+    # Once per process: FTZ_METRICS_PORT serves /metrics, FTZ_PERF_JSONL gets periodic dumps
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    if PERF_JSONL_PATH:
+        start_jsonl_export(PERF_JSONL_PATH)
+    return True
 
-LOG_COLUMNS = [
-    "timestamp",
-    "session_id",
-    "net_savings",
-    "cost_with_ftz",
-    "cost_without_ftz",
-    "cta_clicked",
-    "cta_name",
-    "cta_company",
-    "cta_email",
-    "cta_phone",
-    "cta_message",
-    "chat_question",
-]
+start_perf_exporters()
 
+# =====================================================
+# GOOGLE SHEETS LOGGING
+# =====================================================
 @st.cache_resource
 def get_sheet():
-    # scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-    # creds = Credentials.from_service_account_info(
-    #     st.secrets["gcp_service_account"],
-    #     scopes=scopes,
-    SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-    ]
-
-    creds = Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"],
-        scopes=SCOPES
-    )
-    client = gspread.authorize(creds)
-    sheet = client.open(SHEET_NAME).sheet1
-    #return client.open(SHEET_NAME).sheet1
-
-    # Ensure headers exist
-    if sheet.row_count == 0 or sheet.get_all_values() == []:
-        sheet.append_row(LOG_COLUMNS)
+    with span("sheet.connect"):
+        # FTZ_LOCAL_SHEET swaps in a CSV file so the app runs fully offline
+        if LOCAL_SHEET_PATH:
+            return ensure_header(LocalSheet(LOCAL_SHEET_PATH))
+        return open_sheet(st.secrets["gcp_service_account"])
 
-    return sheet
+@st.cache_resource
+def get_log_writer():
+    # One replayer thread per process; rows hit the local spool first and
+    # are flushed to the sheet in batches off the rerun
+    return SheetWriter(get_sheet, LogSpool(SPOOL_PATH))
 
+@traced("log.submit")
 def log_to_google_sheets(row: dict):
-    sheet = get_sheet()
+    row["variant"] = st.session_state.variant
+    get_log_writer().submit(build_row(row))
 
-    # Force EST timestamp
-    row["timestamp"] = datetime.now(
-        ZoneInfo("America/New_York")
-    ).strftime("%Y-%m-%d %H:%M:%S %Z")
-
-    # Build row strictly by column order
-    ordered_row = [row.get(col, "") for col in LOG_COLUMNS]
+# =====================================================
+# EXPERIMENT COUNTERS
+# =====================================================
+@st.cache_resource
+def get_aggregate_sheet():
+    with span("sheet.connect"):
+        if LOCAL_SHEET_PATH:
+            root, ext = os.path.splitext(LOCAL_SHEET_PATH)
+            return ensure_header(LocalSheet(f"{root}_{AGGREGATE_WORKSHEET}{ext}"), AGGREGATE_COLUMNS)
+        return open_sheet(st.secrets["gcp_service_account"], AGGREGATE_WORKSHEET, AGGREGATE_COLUMNS)
 
-    sheet.append_row(
-        ordered_row,
-        value_input_option="USER_ENTERED"
+@st.cache_resource
+def get_aggregate_writer():
+    return SheetWriter(
+        get_aggregate_sheet,
+        LogSpool(AGGREGATE_SPOOL_PATH),
+        event_id_index=AGGREGATE_EVENT_ID_INDEX,
     )
 
+@st.cache_resource
+def get_experiment_counters():
+    # Events are counted in memory and flushed as one row per variant per
+    # window, through their own spool and writer
+    return ExperimentCounters(get_aggregate_writer().submit)
+
+@traced("experiment.record")
+def record_event(event: str, **kwargs):
+    get_experiment_counters().record(st.session_state.variant, event, **kwargs)
+
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
 
-if "show_inline_details" not in st.session_state:
-    st.session_state.show_inline_details = False
+if "variant" not in st.session_state:
+    st.session_state.variant = assign_variant(st.session_state.session_id)
+    st.session_state.calculated = False
+    st.session_state.cta_sent = False
+    record_event("exposure")
+
+if "slow_reruns" not in st.session_state:
+    st.session_state.slow_reruns = deque(maxlen=20)
 
 # =====================================================
 # PAGE CONFIG
@@ -131,10 +185,16 @@ h1,h2,h3,h4 { color:#0f172a; }
 # =====================================================
 # HEADER
 # =====================================================
+@st.cache_resource
+def load_asset(path: str) -> bytes:
+    # Read from disk once per process instead of on every rerun
+    with open(path, "rb") as f:
+        return f.read()
+
 st.markdown("<h3 style='text-align:center;'>FTZ Savings – Agentic AI Calculator - B Testing</h3>", unsafe_allow_html=True)
 c1,c2,c3 = st.columns([2,1,2])
 with c2:
-    st.image("assets/mas_logo.jpg", width=150)
+    st.image(load_asset("assets/mas_logo.jpg"), width=150)
 
 st.markdown("""
 <div style="text-align:center; max-width:700px; margin:auto;">
@@ -150,6 +210,7 @@ st.markdown("---")
 # =====================================================
 # INPUTS — CUSTOMER DATA (5 × 2)
 # =====================================================
+inputs_span = span("ui.inputs")
 st.subheader("Customer Data Assumptions")
 
 r1 = st.columns(5)
@@ -179,148 +240,193 @@ noftz_consult = r4[0].number_input("Consulting (No FTZ)", value=0)
 noftz_mgmt = r4[1].number_input("Management (No FTZ)", value=0)
 noftz_software = r4[2].number_input("Software (No FTZ)", value=0)
 noftz_bond = r4[3].number_input("Operator Bond (No FTZ)", value=0)
+inputs_span.stop()
 
 # =====================================================
-# CALCULATIONS
+# SKU / HTS DUTY MIX
 # =====================================================
-export_sales = export_pct / 100
-off_spec = offspec_pct / 100
-avg_duty = duty_pct / 100
-mpf_rate = mpf_pct / 100
-hmf_rate = hmf_pct / 100
-
-total_import_value = shipments_per_week * avg_import_value * 52
-entries_per_year = shipments_per_week * 52
-
-total_duty = total_import_value * avg_duty
-duty_saved_export = total_import_value * export_sales * avg_duty
-duty_saved_offspec = total_import_value * off_spec * avg_duty
-
-total_net_duty_no_ftz = total_duty
-total_net_duty_with_ftz = total_duty - duty_saved_export - duty_saved_offspec
-
-per_entry_mpf = min(avg_import_value * mpf_rate, 634.62)
-mpf_no_ftz = per_entry_mpf * entries_per_year
-mpf_with_ftz = min(shipments_per_week * avg_import_value * mpf_rate, 634.62) * 52
-
-broker_hmf_no_ftz = entries_per_year * broker_cost + shipments_per_week * avg_import_value * hmf_rate
-broker_hmf_with_ftz = 52 * broker_cost + shipments_per_week * avg_import_value * hmf_rate
-
-cost_with_ftz = ftz_consult + ftz_mgmt + ftz_software + ftz_bond
-cost_without_ftz = noftz_consult + noftz_mgmt + noftz_software + noftz_bond
-
-interest_rate = current_interest_rate / 100
-total_wc_saving = total_net_duty_with_ftz * interest_rate * (avg_stock_days / 365)
-
-total_cost_without_ftz = total_net_duty_no_ftz + mpf_no_ftz + broker_hmf_no_ftz + cost_without_ftz
-total_cost_with_ftz = total_net_duty_with_ftz + mpf_with_ftz + broker_hmf_with_ftz + cost_with_ftz - total_wc_saving
-
-net_savings_to_brand = total_cost_without_ftz - total_cost_with_ftz
-
-
-# =====================================================
-# BUTTONS
-# =====================================================
-b1,b2,b3 = st.columns(3)
-calculate = b1.button("📊 Calculate Savings", use_container_width=True)
-#cta_btn = b2.button("📞 Smart CTA", use_container_width=True)
-#details = b3.button("📄 Show Details", use_container_width=True)
+@st.cache_data(max_entries=16, show_spinner=False)
+def duty_mix_lines(data: bytes, filename: str, default_duty_pct: float):
+    return duty_by_line(read_mix(io.BytesIO(data), filename), get_tariff_table(), default_duty_pct)
+
+with st.expander("🏷️ SKU / HTS Duty Mix"), span("ui.duty_mix"):
+    st.caption(
+        "Upload your SKU mix (HTS code plus import value or share per line) to price duty "
+        "line by line from the tariff table. Codes not in the table use the Avg Duty % above."
+    )
+    mix_file = st.file_uploader("SKU mix (CSV or XLSX)", type=["csv", "xlsx"], key="duty_mix")
+    if mix_file is not None:
+        try:
+            mix_lines = duty_mix_lines(mix_file.getvalue(), mix_file.name, duty_pct)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            mix = roll_up(mix_lines, shipments_per_week * 52 * avg_import_value, export_pct, offspec_pct)
+            duty_pct = mix["effective_duty_pct"]
+            m = st.columns(3)
+            m[0].metric("Effective Duty %", f"{duty_pct:.2f}%")
+            m[1].metric("Lines Priced", f"{len(mix_lines):,}")
+            m[2].metric("Value Matched to Tariff", f"{mix['matched_share']:.0%}")
+            st.dataframe(mix_lines, use_container_width=True, hide_index=True)
 
 # =====================================================
-# KPI OUTPUT + LOGGING
+# CALCULATIONS
 # =====================================================
-def money(x):
-    try:
-        x = float(x)
-    except (ValueError, TypeError):
-        return x  # leave strings untouched
-
-    return f"(${abs(x):,.0f})" if x < 0 else f"${x:,.0f}"
-
-
-if calculate:
-    log_to_google_sheets({
-        "session_id": st.session_state.session_id,
-        "net_savings": net_savings_to_brand,
-        "cost_with_ftz": total_cost_with_ftz,
-        "cost_without_ftz": total_cost_without_ftz,
-        "cta_clicked": "No",
-        "cta_name": "",
-        "cta_company": "",
-        "cta_email": "",
-        "cta_phone": "",
-        "cta_message": "",
-        "chat_question": "",
-    })
-
-    k1,k2,k3,k4 = st.columns(4)
-    k1.markdown(f"<div class='kpi-card'><div>Total Duty</div><div class='kpi-value'>{money(total_duty)}</div></div>", unsafe_allow_html=True)
-    k2.markdown(f"<div class='kpi-card'><div>Cost With FTZ</div><div class='kpi-value'>{money(total_cost_with_ftz)}</div></div>", unsafe_allow_html=True)
-    k3.markdown(f"<div class='kpi-card'><div>Cost Without FTZ</div><div class='kpi-value'>{money(total_cost_without_ftz)}</div></div>", unsafe_allow_html=True)
-    #k4.markdown(f"<div class='kpi-card'><div>Net Savings</div><div class='kpi-value'>{money(net_savings)}</div></div>", unsafe_allow_html=True)
-    color = "#22c55e" if net_savings_to_brand >= 0 else "#ef4444"
-    k4.markdown(f"<div class='kpi-card'><div>Net Savings</div><div class='kpi-value' style='color:{color};'>{money(net_savings_to_brand)}</div></div>", unsafe_allow_html=True)
-
+inputs = {
+    "shipments_per_week": shipments_per_week,
+    "avg_import_value": avg_import_value,
+    "mpf_pct": mpf_pct,
+    "broker_cost": broker_cost,
+    "current_interest_rate": current_interest_rate,
+    "export_pct": export_pct,
+    "offspec_pct": offspec_pct,
+    "hmf_pct": hmf_pct,
+    "duty_pct": duty_pct,
+    "avg_stock_days": avg_stock_days,
+    "ftz_consult": ftz_consult,
+    "ftz_mgmt": ftz_mgmt,
+    "ftz_software": ftz_software,
+    "ftz_bond": ftz_bond,
+    "noftz_consult": noftz_consult,
+    "noftz_mgmt": noftz_mgmt,
+    "noftz_software": noftz_software,
+    "noftz_bond": noftz_bond,
+}
+with span("calc.savings"):
+    results = cached_savings(inputs)
+
+total_duty = results["total_duty"]
+duty_saved_export = results["duty_saved_export"]
+duty_saved_offspec = results["duty_saved_offspec"]
+total_net_duty_no_ftz = results["total_net_duty_no_ftz"]
+total_net_duty_with_ftz = results["total_net_duty_with_ftz"]
+mpf_no_ftz = results["mpf_no_ftz"]
+mpf_with_ftz = results["mpf_with_ftz"]
+broker_hmf_no_ftz = results["broker_hmf_no_ftz"]
+broker_hmf_with_ftz = results["broker_hmf_with_ftz"]
+cost_with_ftz = results["cost_with_ftz"]
+cost_without_ftz = results["cost_without_ftz"]
+total_wc_saving = results["total_wc_saving"]
+total_cost_without_ftz = results["total_cost_without_ftz"]
+total_cost_with_ftz = results["total_cost_with_ftz"]
+net_savings_to_brand = results["net_savings_to_brand"]
 
 
 # =====================================================
-# SMART CTA
+# BUTTONS
 # =====================================================
-# if cta_btn:
-#     st.markdown("---")
-#     with st.form("cta_form"):
-#         name = st.text_input("Full Name *")
-#         company = st.text_input("Company *")
-#         email = st.text_input("Business Email *")
-#         phone = st.text_input("Phone")
-#         message = st.text_area("Message")
-#         submit = st.form_submit_button("Request a Call")
-if "cta_open" not in st.session_state:
-    st.session_state.cta_open = False
-
-cta = b2.button("📞 Smart CTA", use_container_width=True)
-if cta:
-    st.session_state.cta_open = True
-
-if st.session_state.cta_open:
-    st.markdown("---")
-    st.markdown(
-        "<h4 style='color:#0f172a;'>📞 Smart CTA — Request a Consultation</h4>",
-        unsafe_allow_html=True
-    )
-
-    with st.form("smart_cta_form"):
-        c1, c2 = st.columns(2)
-        with c1:
-            name = st.text_input("Full Name *")
-            company = st.text_input("Company *")
-        with c2:
-            email = st.text_input("Business Email *")
-            phone = st.text_input("Phone Number")
-        message = st.text_area("Question", placeholder="Anything specific you'd like us to review before the call?")
-
-        submit = st.form_submit_button("Request a Call")
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Buttons, KPIs and the CTA form rerun as one fragment: clicking through
+# them never re-evaluates the inputs, charts or uploads around them
+@st.fragment
+@traced("ui.results")
+def results_panel(inputs: dict, results: dict):
+    b1,b2,b3 = st.columns(3)
+    calculate = b1.button("📊 Calculate Savings", use_container_width=True)
+    #cta_btn = b2.button("📞 Smart CTA", use_container_width=True)
+    #details = b3.button("📄 Show Details", use_container_width=True)
+
+    # =====================================================
+    # KPI OUTPUT + LOGGING
+    # =====================================================
+    if calculate:
+        # Counted, not logged row by row: the counters flush per-variant totals
+        record_event("calculate", first=not st.session_state.calculated, net_savings=results["net_savings_to_brand"])
+        st.session_state.calculated = True
+
+        k1,k2,k3,k4 = st.columns(4)
+        k1.markdown(f"<div class='kpi-card'><div>Total Duty</div><div class='kpi-value'>{money(results['total_duty'])}</div></div>", unsafe_allow_html=True)
+        k2.markdown(f"<div class='kpi-card'><div>Cost With FTZ</div><div class='kpi-value'>{money(results['total_cost_with_ftz'])}</div></div>", unsafe_allow_html=True)
+        k3.markdown(f"<div class='kpi-card'><div>Cost Without FTZ</div><div class='kpi-value'>{money(results['total_cost_without_ftz'])}</div></div>", unsafe_allow_html=True)
+        #k4.markdown(f"<div class='kpi-card'><div>Net Savings</div><div class='kpi-value'>{money(net_savings)}</div></div>", unsafe_allow_html=True)
+        color = "#22c55e" if results["net_savings_to_brand"] >= 0 else "#ef4444"
+        k4.markdown(f"<div class='kpi-card'><div>Net Savings</div><div class='kpi-value' style='color:{color};'>{money(results['net_savings_to_brand'])}</div></div>", unsafe_allow_html=True)
+
+        # Reports build on the report pool while the page renders; a click
+        # only collects the bytes (and doesn't rerun away the KPIs)
+        report_future("pdf", inputs)
+        report_future("xlsx", inputs)
+        d1, d2, _ = st.columns(3)
+        d1.download_button(
+            "⬇️ PDF Report",
+            lambda: report_bytes("pdf", inputs),
+            "ftz_savings_report.pdf",
+            "application/pdf",
+            on_click="ignore",
+            use_container_width=True,
+        )
+        d2.download_button(
+            "⬇️ Excel Report",
+            lambda: report_bytes("xlsx", inputs),
+            "ftz_savings_report.xlsx",
+            XLSX_MIME,
+            on_click="ignore",
+            use_container_width=True,
+        )
 
+    # =====================================================
+    # SMART CTA
+    # =====================================================
+    # if cta_btn:
+    #     st.markdown("---")
+    #     with st.form("cta_form"):
+    #         name = st.text_input("Full Name *")
+    #         company = st.text_input("Company *")
+    #         email = st.text_input("Business Email *")
+    #         phone = st.text_input("Phone")
+    #         message = st.text_area("Message")
+    #         submit = st.form_submit_button("Request a Call")
+    if "cta_open" not in st.session_state:
+        st.session_state.cta_open = False
+
+    cta = b2.button(CTA_LABELS.get(st.session_state.variant, "📞 Smart CTA"), use_container_width=True)
+    if cta:
+        st.session_state.cta_open = True
+
+    if st.session_state.cta_open:
+        st.markdown("---")
+        st.markdown(
+            "<h4 style='color:#0f172a;'>📞 Smart CTA — Request a Consultation</h4>",
+            unsafe_allow_html=True
+        )
 
-    if submit and name and company and email:
-        if not name or not company or not email:
-            st.error("Please fill in all required fields.")
-        else:
-            log_to_google_sheets({
-                "session_id": st.session_state.session_id,
-                "net_savings": net_savings_to_brand,
-                "cost_with_ftz": total_cost_with_ftz,
-                "cost_without_ftz": total_cost_without_ftz,
-                "cta_clicked": "Yes",
-                "cta_name": name,
-                "cta_company": company,
-                "cta_email": email,
-                "cta_phone": phone,
-                "cta_message": message,
-                "chat_question": "",
-            })
-            st.success("✅ Thank you! Your request has been received.\n\n"
-                "Our FTZ advisory team will contact you shortly.")
+        with st.form("smart_cta_form"):
+            c1, c2 = st.columns(2)
+            with c1:
+                name = st.text_input("Full Name *")
+                company = st.text_input("Company *")
+            with c2:
+                email = st.text_input("Business Email *")
+                phone = st.text_input("Phone Number")
+            message = st.text_area("Question", placeholder="Anything specific you'd like us to review before the call?")
+
+            submit = st.form_submit_button("Request a Call")
+
+
+        if submit and name and company and email:
+            if not name or not company or not email:
+                st.error("Please fill in all required fields.")
+            else:
+                log_to_google_sheets({
+                    "session_id": st.session_state.session_id,
+                    "net_savings": results["net_savings_to_brand"],
+                    "cost_with_ftz": results["total_cost_with_ftz"],
+                    "cost_without_ftz": results["total_cost_without_ftz"],
+                    "cta_clicked": "Yes",
+                    "cta_name": name,
+                    "cta_company": company,
+                    "cta_email": email,
+                    "cta_phone": phone,
+                    "cta_message": message,
+                    "chat_question": "",
+                })
+                record_event("cta", first=not st.session_state.cta_sent, converted=st.session_state.calculated)
+                st.session_state.cta_sent = True
+                st.success("✅ Thank you! Your request has been received.\n\n"
+                    "Our FTZ advisory team will contact you shortly.")
+
+results_panel(inputs, results)
 
 # =====================================================
 # INLINE DETAILS (B-TEST)
@@ -433,131 +539,378 @@ if st.session_state.cta_open:
 
 
 # =====================================================
-# CHATBOT (UNMATCHED LOGGING)
+# SENSITIVITY ANALYSIS
 # =====================================================
-st.markdown("---")
-st.markdown("<h4 style='color:#0f172a;'>FTZ Chatbot Assistant</h4>", unsafe_allow_html=True)
-
-faq = {
-    "ftz-enabled single-sku omnichannel advantages apparel 3pl": 
-    "Think of one, unified inventory heartbeat serving DTC, marketplaces, and retail. "
-    "In our FTZ, that single-SKU pool removes duplicate stock, cuts stockouts, and enables "
-    "two-day promises—while the zone’s duty advantages keep more margin in your pocket. "
-    "It’s the apparel-native system founders wish they had from day one.",
-
-    "direct cash flow savings immediate not deferral": 
-    "You’ll feel savings right away: duties vanish on exports and off-spec goods, MPF fees drop "
-    "when we consolidate entries weekly, and you only part with duty when product enters U.S. commerce. "
-    "It’s immediate cash you can redirect to growth, not just an accounting fiction.",
-
-    "brands benefit most ftz omnichannel": 
-    "Brands that import, move fast, and sell across channels—DTC expanding to wholesale, "
-    "marketplace-heavy, international entrants, seasonal or high-SKU lines—see the biggest lift.",
-
-    "how are numbers calculated": 
-    "The calculator uses your operational inputs—shipments per week, average import value, "
-    "export %, off-spec %, broker fees, and average duty rate. FTZ rules are applied to show "
-    "duty saved on exports, off-spec relief, and MPF savings from weekly consolidation.",
-
-    "numbers unusual outside typical ranges": 
-    "No problem—outliers are fine. The calculator is directional. For unusual flows, "
-    "a consultation unlocks a tuned, custom analysis.",
-
-    "why savings negative": 
-    "Negative savings signal volume, cost structure, or assumption issues. "
-    "Higher consolidation, better HTS averages, and stronger export/off-spec flows "
-    "often flip results positive.",
-
-    "data bring consultation precise analysis": 
-    "Bring HTS mix, channel split, return rates, freight modes, and your cost stack. "
-    "These inputs unlock precision and actionable ROI insights.",
-
-    "how estimate savings exported off spec inputs": 
-    "Using shipments per week, average import value, export %, off-spec %, broker fees, "
-    "and duty rate, the calculator converts flows into duty savings and entry reductions.",
-
-    "what are mpf hmf weekly entry consolidation": 
-    "MPF is capped per entry; HMF applies to ocean freight. Weekly consolidation "
-    "reduces how often fees are paid—so savings compound quickly.",
-
-    "hmf air land freight": 
-    "HMF applies only to ocean freight. If your flow is air or land, it is excluded "
-    "so results reflect reality.",
-
-    "varying duty rates hts season accuracy": 
-    "We start with an average duty rate to show direction. SKU-level precision "
-    "comes during a consult.",
-
-    "entries per shipment vs weekly consolidated entries": 
-    "Non-FTZ assumes one entry per shipment; FTZ assumes one weekly entry. "
-    "Enter shipments per week and the calculator models both automatically.",
-
-    "difference vs global 3pls d2c brokers": 
-    "We combine FTZ economics, apparel-native workflows, and omnichannel execution—"
-    "speed, compliance, and margin in one system.",
-
-    "support retail edi asn marketplace prep": 
-    "Yes. One FTZ inventory pool feeds retail, marketplaces, and DTC—"
-    "eliminating duplicate stock.",
-
-    "how fast pilot go live 60 90 days": 
-    "Our 60–90 day pilot connects systems, activates FTZ inventory, "
-    "and runs live orders quickly.",
-
-    "what not included calculator results": 
-    "We focus on immediate savings. Working capital, inventory days, "
-    "and deeper ROI come in custom models.",
-
-    "quantify working capital inventory days": 
-    "Yes—deferral, inventory pooling, and margin impacts are quantified "
-    "during consultation.",
-
-    "compliance guardrails audit ready apparel": 
-    "Tight inventory controls, auditable entries, and apparel-specific SOPs "
-    "keep operations compliant and scalable.",
-
-    "export off spec ranges validation": 
-    "Exports typically 0–30%; off-spec usually under 5%. "
-    "Outliers are fine but directional.",
-
-    "export share results pdf excel consult": 
-    "Export PDF/Excel directly and use the consult CTA "
-    "to turn estimates into execution."
+OUTPUT_LABELS = {
+    "net_savings_to_brand": "Net Savings",
+    "total_cost_with_ftz": "Cost With FTZ",
+    "total_cost_without_ftz": "Cost Without FTZ",
 }
 
-faq_keys = list(faq.keys())
+# Chart specs are built (and schema-validated by Altair) once per scenario,
+# not on every rerun
+@st.cache_data(max_entries=64, show_spinner=False)
+def tornado_spec(inputs: dict, swing_pct: int, output: str) -> dict:
+    # Altair loads with the first chart built, not with the app
+    import altair as alt
+
+    bars = tornado(inputs, swing_pct / 100, output)
+    bars["label"] = bars["input"].map(INPUT_LABELS)
+    base_value = cached_savings(inputs)[output]
+    chart = alt.Chart(bars).mark_bar().encode(
+        y=alt.Y("label:N", sort=None, title=None),
+        x=alt.X("at_low:Q", title=f"{OUTPUT_LABELS[output]} ($)"),
+        x2="at_high:Q",
+        color=alt.condition("datum.at_high >= datum.at_low", alt.value("#2563eb"), alt.value("#ef4444")),
+        tooltip=[
+            alt.Tooltip("label:N", title="Input"),
+            alt.Tooltip("low_value:Q", title=f"−{swing_pct}%", format=",.2f"),
+            alt.Tooltip("at_low:Q", title="Result at low", format="$,.0f"),
+            alt.Tooltip("high_value:Q", title=f"+{swing_pct}%", format=",.2f"),
+            alt.Tooltip("at_high:Q", title="Result at high", format="$,.0f"),
+        ],
+    ) + alt.Chart(pd.DataFrame({"base": [base_value]})).mark_rule(color="#0f172a").encode(x="base:Q")
+    return chart.to_dict()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def heatmap_spec(inputs: dict, x_input: str, y_input: str, swing_pct: int, output: str) -> dict:
+    import altair as alt
+
+    grid = heatmap(inputs, x_input, y_input, swing_pct / 100)
+    return alt.Chart(grid).mark_rect().encode(
+        x=alt.X(f"{x_input}:O", title=INPUT_LABELS[x_input], axis=alt.Axis(format=",.2f")),
+        y=alt.Y(f"{y_input}:O", title=INPUT_LABELS[y_input], sort="descending", axis=alt.Axis(format=",.2f")),
+        color=alt.Color(f"{output}:Q", title=OUTPUT_LABELS[output], scale=alt.Scale(scheme="redblue", domainMid=0)),
+        tooltip=[
+            alt.Tooltip(f"{x_input}:Q", title=INPUT_LABELS[x_input], format=",.2f"),
+            alt.Tooltip(f"{y_input}:Q", title=INPUT_LABELS[y_input], format=",.2f"),
+            alt.Tooltip(f"{output}:Q", title=OUTPUT_LABELS[output], format="$,.0f"),
+        ],
+    ).to_dict()
+
+# Rendered only while open, like the projection below: building the two
+# charts is the costliest part of a first render
+sensitivity_panel = st.expander(
+    "📈 Sensitivity Analysis — what if the inputs change?", key="sensitivity_panel", on_change="rerun"
+)
+with sensitivity_panel, span("ui.sensitivity"):
+    if sensitivity_panel.open:
+        s1, s2 = st.columns(2)
+        swing_pct = s1.slider("Vary each input by ± %", 5, 50, 20, step=5)
+        output = s2.selectbox("Result", OUTPUTS, format_func=OUTPUT_LABELS.get)
 
-import difflib
+        st.vega_lite_chart(tornado_spec(inputs, swing_pct, output), use_container_width=True)
+        st.caption(f"Bars span {OUTPUT_LABELS[output]} from −{swing_pct}% (blue start) to +{swing_pct}% of each input; "
+                   f"the line is today's {money(results[output])}.")
 
-def match_question(user_question: str):
-    cleaned = user_question.lower().strip()
+        h1, h2 = st.columns(2)
+        x_input = h1.selectbox("Heatmap X", SWEEP_INPUTS, index=SWEEP_INPUTS.index("duty_pct"), format_func=INPUT_LABELS.get)
+        y_options = [name for name in SWEEP_INPUTS if name != x_input]
+        y_input = h2.selectbox("Heatmap Y", y_options, index=y_options.index("shipments_per_week"), format_func=INPUT_LABELS.get)
+
+        st.vega_lite_chart(heatmap_spec(inputs, x_input, y_input, swing_pct, output), use_container_width=True)
+
+
+# =====================================================
+# MONTE CARLO SIMULATION
+# =====================================================
+@st.cache_data(max_entries=32, show_spinner=False)
+def run_simulation(inputs: dict, distributions: dict, scenarios: int, seed: int):
+    return simulate(inputs, distributions, n=scenarios, seed=seed)
+
+# Rendered only while open, like the panels around it: a cache miss here is a
+# million-scenario simulation
+simulation_panel = st.expander(
+    "🎲 Monte Carlo Simulation — how sure are the savings?", key="simulation_panel", on_change="rerun"
+)
+with simulation_panel, span("ui.simulation"):
+    if simulation_panel.open:
+        m1, m2, m3 = st.columns(3)
+        uncertain = m1.multiselect(
+            "Uncertain inputs",
+            SWEEP_INPUTS,
+            default=["export_pct", "offspec_pct", "duty_pct"],
+            format_func=INPUT_LABELS.get,
+        )
+        dist_kind = m2.selectbox("Distribution", ["triangular", "range", "normal"])
+        spread_pct = m3.slider("Spread around current value (± %)", 5, 100, 25, step=5)
+        m4, m5 = st.columns(2)
+        scenarios = m4.selectbox("Scenarios", [100_000, 1_000_000, 5_000_000], index=1, format_func="{:,}".format)
+        seed = m5.number_input("Random seed", 0, value=42)
+
+        if st.button("Run Simulation") and uncertain:
+            # The inputs are kept with the distributions centred on them, so
+            # a later input change can't mix the two
+            st.session_state.simulation_params = (
+                dict(inputs),
+                {name: distribution_around(inputs[name], dist_kind, spread_pct / 100) for name in uncertain},
+                scenarios,
+                seed,
+            )
+
+        if "simulation_params" in st.session_state:
+            sim_inputs, distributions, n, sim_seed = st.session_state.simulation_params
+            with st.spinner(f"Simulating {n:,} scenarios..."):
+                sim = run_simulation(sim_inputs, distributions, n, sim_seed)
+            if sim_inputs != inputs:
+                st.caption("Simulated with the inputs as they were at the last run; run it again to include your changes.")
+
+            q1, q2, q3, q4 = st.columns(4)
+            q1.metric("P5 Net Savings", money(sim["p5"]))
+            q2.metric("P50 Net Savings", money(sim["p50"]))
+            q3.metric("P95 Net Savings", money(sim["p95"]))
+            q4.metric("Chance Savings < $0", f"{sim['prob_negative']:.1%}")
+            curve = pd.DataFrame({"percentile": range(101), "net_savings": sim["quantile_curve"]})
+            import altair as alt
+
+            st.altair_chart(
+                alt.Chart(curve).mark_line().encode(
+                    x=alt.X("net_savings:Q", title="Net Savings ($)"),
+                    y=alt.Y("percentile:Q", title="Cumulative % of scenarios"),
+                ),
+                use_container_width=True,
+            )
+
+
+# =====================================================
+# MULTI-YEAR PROJECTION
+# =====================================================
+@st.cache_data(max_entries=64, show_spinner=False)
+def projection_frame(inputs: dict, years: int, growth_pct: float, escalation_pct: float,
+                     activation_months: int, ramp_months: int, discount_pct: float):
+    import altair as alt
+
+    proj = project_cash_flows(
+        inputs,
+        years=years,
+        growth_pct=growth_pct,
+        cost_escalation_pct=escalation_pct,
+        activation_months=activation_months,
+        ramp_months=ramp_months,
+        discount_rate_pct=discount_pct,
+    )
+    monthly = pd.DataFrame({
+        "month": proj["month"].astype(int),
+        "savings": proj["savings"],
+        "cumulative_savings": proj["cumulative_savings"],
+    })
+    chart = alt.Chart(monthly).mark_line().encode(
+        x=alt.X("month:Q", title="Month"),
+        y=alt.Y("cumulative_savings:Q", title="Cumulative Net Savings ($)"),
+        tooltip=[
+            alt.Tooltip("month:Q", title="Month"),
+            alt.Tooltip("savings:Q", title="Savings this month", format="$,.0f"),
+            alt.Tooltip("cumulative_savings:Q", title="Cumulative", format="$,.0f"),
+        ],
+    )
+    summary = {k: proj[k] for k in ("total_savings", "npv", "irr", "payback_month", "deferred_at_horizon")}
+    # A plain spec: Altair's schema validation stays out of the rerun
+    return summary, chart.to_dict()
+
+# Rendered only while open: the projection and its chart cost more than the
+# rest of an idle rerun
+projection_panel = st.expander(
+    "📅 Multi-Year Projection — monthly cash flow, NPV and payback", key="projection_panel", on_change="rerun"
+)
+with projection_panel, span("ui.projection"):
+    if projection_panel.open:
+        p1, p2, p3 = st.columns(3)
+        years = p1.slider("Horizon (years)", 1, MAX_YEARS, 5)
+        growth_pct = p2.number_input("Import growth (%/yr)", -50.0, 100.0, 0.0, step=1.0)
+        escalation_pct = p3.number_input("Cost escalation (%/yr)", -20.0, 50.0, 0.0, step=0.5)
+        p4, p5, p6 = st.columns(3)
+        activation_months = p4.slider("Zone activation (months)", 0, 24, 3)
+        ramp_months = p5.slider("Ramp-up to full volume (months)", 0, 24, 3)
+        discount_pct = p6.number_input("Discount rate (%/yr)", 0.0, 50.0, float(inputs["current_interest_rate"]), step=0.5)
+
+        summary, projection_spec = projection_frame(inputs, years, growth_pct, escalation_pct, activation_months, ramp_months, discount_pct)
+        r1, r2, r3, r4 = st.columns(4)
+        r1.metric(f"NPV ({years} yr)", money(summary["npv"]))
+        r2.metric("IRR", "n/a" if pd.isna(summary["irr"]) else f"{summary['irr']:.1%}")
+        r3.metric("Payback", "never" if pd.isna(summary["payback_month"]) else f"month {summary['payback_month']:.0f}")
+        r4.metric("Duty still deferred at end", money(summary["deferred_at_horizon"]))
+        st.vega_lite_chart(projection_spec, use_container_width=True)
+        st.caption(
+            "Duty is paid when goods leave the zone, so deferral shows up in the cash flow "
+            "itself; IRR is only shown when the FTZ costs come before the savings."
+        )
+
+
+# =====================================================
+# BREAK-EVEN
+# =====================================================
+@st.cache_data(max_entries=64, show_spinner=False)
+def breakeven_frame(inputs: dict, target: float) -> pd.DataFrame:
+    thresholds = breakeven_table(inputs, SOLVABLE_INPUTS, target)
+    return pd.DataFrame({
+        "Input": [INPUT_LABELS[name] for name in SOLVABLE_INPUTS],
+        "Current": [float(inputs[name]) for name in SOLVABLE_INPUTS],
+        "Break-even": [thresholds[name] for name in SOLVABLE_INPUTS],
+        "Change": [thresholds[name] - float(inputs[name]) for name in SOLVABLE_INPUTS],
+    })
 
-    match = difflib.get_close_matches(
-        cleaned,
-        faq_keys,
-        n=1,
-        cutoff=0.55
+breakeven_panel = st.expander("🎯 Break-Even — how far can each input move?", key="breakeven_panel", on_change="rerun")
+with breakeven_panel, span("ui.breakeven"):
+    if breakeven_panel.open:
+        target_savings = st.number_input("Target net savings ($)", value=0.0, step=10000.0)
+        st.caption("Each row moves one input with everything else as entered above. "
+                   "Blank means no value of that input reaches the target.")
+        st.dataframe(
+            breakeven_frame(inputs, target_savings),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                name: st.column_config.NumberColumn(format="localized")
+                for name in ("Current", "Break-even", "Change")
+            },
+        )
+
+
+# =====================================================
+# PORTFOLIO UPLOAD
+# =====================================================
+with st.expander("📂 Portfolio Pricing — price a list of prospects"), span("ui.portfolio"):
+    st.caption("Upload a CSV or Excel sheet with one prospect per row. Columns you leave out "
+               "use the values entered above.")
+    st.download_button("Download template", template_csv(inputs), "ftz_portfolio_template.csv", "text/csv")
+    uploaded = st.file_uploader("Prospect list", type=["csv", "xlsx"])
+    breakeven_input = st.selectbox(
+        "Break-even column for the top prospects",
+        [None, *SOLVABLE_INPUTS],
+        format_func=lambda name: "None" if name is None else INPUT_LABELS[name],
     )
 
-    if match:
-        return faq[match[0]]
+    if uploaded is not None:
+        portfolio_key = (uploaded.file_id, tuple(inputs.values()), breakeven_input)
+        if st.session_state.get("portfolio_key") != portfolio_key:
+            with st.spinner("Pricing prospects..."):
+                st.session_state.portfolio = summarize_portfolio(
+                    uploaded, uploaded.name, inputs, breakeven_input=breakeven_input
+                )
+            st.session_state.portfolio_key = portfolio_key
+        summary = st.session_state.portfolio
+
+        p1, p2, p3, p4 = st.columns(4)
+        p1.metric("Prospects Priced", f"{summary['priced_rows']:,}")
+        p2.metric("Rows Rejected", f"{summary['invalid_rows']:,}")
+        p3.metric("With Positive Savings", f"{summary['positive_rows']:,}")
+        p4.metric("Total Net Savings", money(summary["total_net_savings"]))
+
+        st.dataframe(
+            summary["top"].style.format(money, subset=summary["top"].columns[2:6]).format("{:,.2f}", subset=summary["top"].columns[6:], na_rep=""),
+            use_container_width=True,
+            hide_index=True,
+        )
+        c1, c2, _ = st.columns(3)
+        c1.download_button(
+            "Download all results (CSV)",
+            lambda: write_results_csv(uploaded, uploaded.name, inputs),
+            "ftz_portfolio_results.csv",
+            "text/csv",
+        )
+        c2.download_button(
+            "Download all results (Excel)",
+            lambda: write_results_xlsx(uploaded, uploaded.name, inputs),
+            "ftz_portfolio_results.xlsx",
+            XLSX_MIME,
+        )
+        if summary["error_count"]:
+            st.warning(f"{summary['error_count']:,} problems found; showing the first {len(summary['errors']):,}.")
+            st.dataframe(summary["errors"], use_container_width=True, hide_index=True)
+
 
-    return None
+# =====================================================
+# SHIPMENT LEDGER
+# =====================================================
+with st.expander("🧾 Shipment Ledger — exact MPF, HMF and broker costs from your entries"), span("ui.ledger"):
+    st.caption("Upload one row per shipment with date, value, mode (ocean/air/truck) and HTS duty rate %. "
+               "Without an FTZ each shipment is an entry; in the FTZ each ISO week is one consolidated entry.")
+    ledger_file = st.file_uploader("Shipment ledger", type=["csv", "xlsx"], key="ledger_file")
+
+    if ledger_file is not None:
+        ledger_key = (ledger_file.file_id, tuple(inputs.values()))
+        if st.session_state.get("ledger_key") != ledger_key:
+            try:
+                with st.spinner("Reading ledger..."):
+                    st.session_state.ledger = weekly_ledger(
+                        ledger_file,
+                        ledger_file.name,
+                        mpf_pct=mpf_pct,
+                        hmf_pct=hmf_pct,
+                        broker_cost=broker_cost,
+                        export_pct=export_pct,
+                        offspec_pct=offspec_pct,
+                        default_duty_pct=duty_pct,
+                    )
+            except ValueError as e:
+                st.session_state.ledger = None
+                st.error(str(e))
+            st.session_state.ledger_key = ledger_key
+
+        if st.session_state.ledger is not None:
+            weeks, skipped = st.session_state.ledger
+            totals = ledger_totals(weeks)
+            l1, l2, l3, l4 = st.columns(4)
+            l1.metric("Shipments / Weeks", f"{totals['shipments']:,.0f} / {totals['weeks']}")
+            l2.metric("MPF Without → With FTZ", f"{money(totals['mpf_no_ftz'])} → {money(totals['mpf_with_ftz'])}")
+            l3.metric("Broker Without → With FTZ", f"{money(totals['broker_no_ftz'])} → {money(totals['broker_with_ftz'])}")
+            l4.metric("Duty + Fee Savings", money(totals["weekly_savings"]))
+            if skipped:
+                st.warning(f"{skipped:,} rows skipped for a missing or unreadable date or value.")
+
+            chart = weeks.assign(week=weeks["iso_year"].astype(str) + "-W" + weeks["iso_week"].astype(str).str.zfill(2))
+            import altair as alt
+
+            st.altair_chart(
+                alt.Chart(chart).transform_fold(["mpf_no_ftz", "mpf_with_ftz"], as_=["line", "mpf"]).mark_line().encode(
+                    x=alt.X("week:O", title="ISO Week"),
+                    y=alt.Y("mpf:Q", title="MPF ($)"),
+                    color=alt.Color("line:N", title=None),
+                ),
+                use_container_width=True,
+            )
+            st.dataframe(chart.drop(columns=["iso_year", "iso_week"]).set_index("week"), use_container_width=True)
 
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
 
-user_q = st.text_input("Ask your question:")
+# =====================================================
+# CHATBOT (UNMATCHED LOGGING)
+# =====================================================
+st.markdown("---")
+st.markdown("<h4 style='color:#0f172a;'>FTZ Chatbot Assistant</h4>", unsafe_allow_html=True)
 
-if st.button("Ask AI") and user_q:
-    if user_q.strip():
+@st.cache_resource
+def get_knowledge_base():
+    # Loaded and indexed once per process; reloads itself when the file changes
+    return KnowledgeBaseStore(FAQ_PATH)
+
+@st.cache_resource
+def get_session_registry():
+    # Chat histories live here rather than in session_state: each is capped,
+    # accounted for, and spilled to disk when its session goes idle
+    return SessionRegistry(ChatSpill(CHAT_SPILL_PATH))
+
+@traced("chat.match")
+def match_question(user_question: str):
+    return get_knowledge_base().matcher().match(user_question)
+
+# Typing and asking only rerun the chat, not the calculator above it
+@st.fragment
+@traced("ui.chat")
+def chat_panel(results: dict):
+    chat = get_session_registry().chat(st.session_state.session_id)
+
+    user_q = st.text_input("Ask your question:")
+
+    if st.button("Ask AI") and user_q.strip():
         response = match_question(user_q)
+        record_event("chat")
         if not response:
+            record_event("unmatched")
             log_to_google_sheets({
                 "session_id": st.session_state.session_id,
-                "net_savings": net_savings_to_brand,
-                "cost_with_ftz": total_cost_with_ftz,
-                "cost_without_ftz": total_cost_without_ftz,
+                "net_savings": results["net_savings_to_brand"],
+                "cost_with_ftz": results["total_cost_with_ftz"],
+                "cost_without_ftz": results["total_cost_without_ftz"],
                 "cta_clicked": "No",
                 "cta_name": "",
                 "cta_company": "",
@@ -568,25 +921,124 @@ if st.button("Ask AI") and user_q:
             })
             response = "Thank you for your question, Your question will be directed to the Customer Success Lead at MAS US Holdings at oscarc@masholdings.com."
 
-    st.session_state.chat_history.append(("You", user_q))
-    st.session_state.chat_history.append(("AI", response))
-
-# for s,m in st.session_state.chat_history:
-#     st.markdown(f"**{s}:** {m}")
-# -------------------------
-# RENDER CHAT HISTORY
-# -------------------------
-for speaker, msg in st.session_state.chat_history:
-    if speaker == "You":
-        st.markdown(
-            f"<div class='chat-user'><strong>You:</strong> {msg}</div>",
-            unsafe_allow_html=True
-        )
-    else:
-        st.markdown(
-            f"<div class='chat-ai'><strong>AI:</strong> {msg}</div>",
-            unsafe_allow_html=True
-        )
+        # Normally the same history; a new one if a sweep evicted it meanwhile
+        chat = chat.append(USER, user_q).append(ASSISTANT, response)
+
+    # for s,m in st.session_state.chat_history:
+    #     st.markdown(f"**{s}:** {m}")
+    # -------------------------
+    # RENDER CHAT HISTORY
+    # -------------------------
+    with span("chat.render"):
+        # Only the last CHAT_MAX_MESSAGES stay in memory; older ones are
+        # read back from disk while this is open
+        if chat.spilled:
+            earlier_panel = st.expander(
+                f"Earlier messages ({chat.spilled:,})", key="chat_earlier_panel", on_change="rerun"
+            )
+            with earlier_panel:
+                if earlier_panel.open:
+                    st.markdown(
+                        "\n\n".join(format_message(s, m) for s, m in chat.earlier()),
+                        unsafe_allow_html=True,
+                    )
+        # The whole conversation is one cached HTML string, one element
+        if len(chat):
+            st.markdown(chat.html(), unsafe_allow_html=True)
+
+chat_panel(results)
 
 st.markdown("---")
 st.markdown("**Disclaimer:** This calculator provides directional estimates only and does not constitute financial, legal, or compliance advice.")
+
+# =====================================================
+# PERFORMANCE (ADMIN)
+# =====================================================
+rerun_ms = rerun_trace.finish()
+if rerun_ms >= SLOW_RERUN_MS:
+    st.session_state.slow_reruns.append(rerun_trace.summary())
+
+# Visible only with ?admin=<FTZ_ADMIN_TOKEN> in the URL
+admin_token = os.environ.get("FTZ_ADMIN_TOKEN", "")
+if admin_token and hmac.compare_digest(st.query_params.get("admin", ""), admin_token):
+    with st.expander("⏱️ Performance (admin)", expanded=True):
+        st.markdown(f"This rerun: **{rerun_ms:,.0f} ms**. Latency per traced section since the process started:")
+        st.dataframe(pd.DataFrame(perf_snapshot()).round(2), use_container_width=True, hide_index=True)
+        if STARTUP_TIMINGS:
+            st.markdown("**Sheet connection (ms)**")
+            st.json({k: round(v, 1) for k, v in STARTUP_TIMINGS.items()})
+        st.markdown("**Chat sessions in memory**")
+        st.json({k: round(v, 2) for k, v in get_session_registry().stats().items()})
+        st.markdown(f"**Slow reruns this session** (≥ {SLOW_RERUN_MS:,.0f} ms)")
+        if st.session_state.slow_reruns:
+            st.dataframe(pd.DataFrame(reversed(st.session_state.slow_reruns)), use_container_width=True, hide_index=True)
+        else:
+            st.caption("None yet.")
+
+    @st.cache_resource
+    def get_analytics():
+        # Cursor and aggregates live on disk; each refresh reads only new sheet rows
+        return AnalyticsCache(ANALYTICS_PATH)
+
+    @st.cache_resource
+    def get_question_clusters():
+        return QuestionClusters(CLUSTER_PATH)
+
+    with st.expander("📈 B-Test Analytics (admin)", expanded=False):
+        analytics = get_analytics()
+        question_clusters = get_question_clusters()
+        if st.button("Fetch new log rows"):
+            with span("analytics.refresh"):
+                fetched = analytics.refresh(get_sheet())
+                fetched += analytics.refresh_aggregates(get_aggregate_sheet())
+            with span("analytics.cluster_questions"):
+                question_clusters.refresh(get_sheet())
+            st.caption(f"{fetched:,} new rows folded in.")
+
+        st.markdown("**Experiment variants** (from the aggregate rows)")
+        variants = analytics.variant_summary()
+        if variants:
+            st.dataframe(pd.DataFrame(variants).round(4), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No aggregate rows yet.")
+        st.caption(f"Not yet flushed from this server: {get_experiment_counters().snapshot() or 'nothing'}")
+
+        st.markdown("**Per-event log rows** (CTAs, unanswered questions, and Calculate clicks logged before the experiment counters)")
+        summary = analytics.summary()
+        a1, a2, a3, a4 = st.columns(4)
+        a1.metric("Sessions", f"{summary['sessions']:,}")
+        a2.metric("Calculations", f"{summary['calculations']:,}")
+        a3.metric("Calculate → CTA", f"{summary['calculate_to_cta']:.1%}")
+        a4.metric("Unmatched questions / session", f"{summary['unmatched_per_session']:.2f}")
+        st.markdown("**Net savings shown on Calculate**")
+        st.bar_chart(pd.DataFrame(analytics.savings_histogram(), columns=["bucket", "calculations"]).set_index("bucket"), sort=False)
+        st.markdown("**Session funnel**")
+        st.dataframe(pd.DataFrame(analytics.funnel(), columns=["stage", "sessions"]), use_container_width=True, hide_index=True)
+        st.caption(f"Read through sheet row {summary['cursor']:,}.")
+
+        st.markdown("**Unanswered question clusters** (paraphrases grouped; suggested FAQ key or new entry)")
+        clusters = question_clusters.clusters(get_knowledge_base().matcher(), limit=15)
+        if clusters:
+            st.dataframe(
+                pd.DataFrame(clusters)[["asked", "distinct_questions", "example", "suggestion", "faq_key", "score", "candidate_key"]],
+                use_container_width=True,
+                hide_index=True,
+                column_config={"score": st.column_config.NumberColumn(format="%.2f")},
+            )
+        else:
+            st.caption("No unanswered questions clustered yet.")
+
+
+# =====================================================
+# BACKGROUND WARM-UP
+# =====================================================
+@st.cache_resource
+def warm_up_sheets():
+    # Once per process, after the first page is out: both writer threads
+    # import the Google client and authorize now, instead of when the
+    # first row is due
+    get_log_writer().warm_up()
+    get_aggregate_writer().warm_up()
+    return True
+
+warm_up_sheets()
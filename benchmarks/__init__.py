@@ -0,0 +1,33 @@
+"""Benchmarks for the FTZ Savings app; see ``benchmarks.run``.
+
+Importing this package points every path the app writes to (log sheet,
+spools, chat spill, analytics and cluster databases) at a throwaway
+directory, overriding anything inherited from the shell. The app modules
+read these once, at import, and every entry point (``python -m
+benchmarks.run``, ``python -m benchmarks.bench_*``, the worker processes
+the rerun and startup suites start) imports this package first, so a
+benchmark never logs to the real sheet or leaves rows in ``var/`` for
+production to flush.
+"""
+
+import os
+import tempfile
+
+# Shared with the worker processes, which inherit the environment
+SANDBOX = os.environ.get("FTZ_BENCH_SANDBOX") or tempfile.mkdtemp(prefix="ftz_bench_")
+
+SANDBOX_ENV = {
+    "FTZ_BENCH_SANDBOX": SANDBOX,
+    "FTZ_LOCAL_SHEET": os.path.join(SANDBOX, "sheet.csv"),
+    "FTZ_LOG_SPOOL": os.path.join(SANDBOX, "log_spool.sqlite3"),
+    "FTZ_AGG_SPOOL": os.path.join(SANDBOX, "aggregate_spool.sqlite3"),
+    "FTZ_CHAT_SPILL": os.path.join(SANDBOX, "chat_spill.sqlite3"),
+    "FTZ_ANALYTICS_DB": os.path.join(SANDBOX, "analytics.sqlite3"),
+    "FTZ_CLUSTER_DB": os.path.join(SANDBOX, "question_clusters.sqlite3"),
+    "FTZ_API_LOG_SPOOL": os.path.join(SANDBOX, "api_log_spool.sqlite3"),
+    # No metrics port or perf dump from a benchmark run
+    "FTZ_METRICS_PORT": "",
+    "FTZ_PERF_JSONL": "",
+}
+
+os.environ.update(SANDBOX_ENV)
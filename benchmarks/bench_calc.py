@@ -0,0 +1,57 @@
+###############################################
+# FTZ Savings – Calculation Benchmark
+###############################################
+"""Cost of pricing one scenario and throughput of vectorized batches.
+
+    python -m benchmarks.bench_calc
+"""
+
+import time
+
+import numpy as np
+
+from calculations import INPUT_DEFAULTS, INPUT_FIELDS, cached_savings, compute_savings
+from projection import project_cash_flows
+
+
+def _best_seconds(func, rounds: int = 1, repeat: int = 5) -> float:
+    """Fastest of ``repeat`` timings of ``rounds`` calls, per call (as timeit advises)."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        best = min(best, (time.perf_counter() - started) / rounds)
+    return best
+
+
+def random_inputs(n: int, seed: int = 0) -> dict:
+    """``n`` plausible scenarios spread around the form defaults."""
+    rng = np.random.default_rng(seed)
+    inputs = {name: np.full(n, float(INPUT_DEFAULTS[name])) for name in INPUT_FIELDS}
+    inputs["shipments_per_week"] = rng.integers(1, 40, n).astype(float)
+    inputs["avg_import_value"] = rng.uniform(5_000, 2_000_000, n)
+    inputs["export_pct"] = rng.uniform(0, 20, n)
+    inputs["offspec_pct"] = rng.uniform(0, 5, n)
+    inputs["duty_pct"] = rng.uniform(0, 35, n)
+    return inputs
+
+
+def run(rounds: int = 2000, batch_sizes=(10_000, 1_000_000)) -> dict:
+    results = {
+        "scalar_compute_us": _best_seconds(lambda: compute_savings(INPUT_DEFAULTS), rounds) * 1e6,
+        "scalar_cached_us": _best_seconds(lambda: cached_savings(INPUT_DEFAULTS), rounds) * 1e6,
+    }
+    for n in batch_sizes:
+        inputs = random_inputs(n)
+        results[f"batch_{n}_rows_per_s"] = n / _best_seconds(lambda: compute_savings(inputs), repeat=3)
+    prospects = random_inputs(10_000, seed=1)
+    results["projection_10k_10y_ms"] = _best_seconds(
+        lambda: project_cash_flows(prospects, years=10, growth_pct=3, activation_months=6, ramp_months=6), repeat=3
+    ) * 1000
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<28}{value:16,.2f}")
@@ -0,0 +1,137 @@
+###############################################
+# FTZ Savings – FAQ Matcher Benchmark
+###############################################
+"""Latency and hit rate of FaqMatcher against the old difflib lookup, and how
+fast unanswered questions are clustered.
+
+    python -m benchmarks.bench_faq
+"""
+
+import difflib
+import os
+import random
+import tempfile
+import time
+
+from faq_matcher import FaqMatcher
+from knowledge_base import load_knowledge_base
+from question_clusters import QuestionClusters
+
+FAQ = dict(load_knowledge_base().faq)
+
+# Paraphrased visitor questions -> the FAQ key that should answer them
+# (None: off-topic, the bot should admit it doesn't know)
+LABELED_QUESTIONS = [
+    ("How are the numbers calculated?", "how are numbers calculated"),
+    ("how do you calculate these numbers", "how are numbers calculated"),
+    ("Why are my savings negative?", "why savings negative"),
+    ("why is the savings number negative", "why savings negative"),
+    ("What are MPF and HMF?", "what are mpf hmf weekly entry consolidation"),
+    ("Does HMF apply to air freight?", "hmf air land freight"),
+    ("Is HMF charged on land freight?", "hmf air land freight"),
+    ("Which brands benefit most from an FTZ?", "brands benefit most ftz omnichannel"),
+    ("How fast can a pilot go live?", "how fast pilot go live 60 90 days"),
+    ("Do you support retail EDI and ASN?", "support retail edi asn marketplace prep"),
+    ("What data should I bring to the consultation?", "data bring consultation precise analysis"),
+    ("What is not included in the calculator results?", "what not included calculator results"),
+    ("Can you quantify working capital and inventory days?", "quantify working capital inventory days"),
+    ("Are you audit ready and compliant for apparel?", "compliance guardrails audit ready apparel"),
+    ("What ranges are valid for export and off spec?", "export off spec ranges validation"),
+    ("Can I export results to PDF or Excel?", "export share results pdf excel consult"),
+    ("How do you differ from global 3PLs and brokers?", "difference vs global 3pls d2c brokers"),
+    ("Are the cash flow savings immediate or just deferral?", "direct cash flow savings immediate not deferral"),
+    ("What about varying duty rates by HTS and season?", "varying duty rates hts season accuracy"),
+    ("entries per shipment vs weekly consolidated entries", "entries per shipment vs weekly consolidated entries"),
+    ("my numbers are unusual and outside typical ranges", "numbers unusual outside typical ranges"),
+    ("What are the omnichannel advantages of a single SKU FTZ 3PL for apparel?",
+     "ftz-enabled single-sku omnichannel advantages apparel 3pl"),
+    ("What's the weather in Paris tomorrow?", None),
+    ("Who won the game last night?", None),
+    ("Can you recommend a good pizza place?", None),
+    ("What is your CEO's favourite colour?", None),
+]
+
+
+def difflib_match(question: str, faq: dict, keys: list):
+    match = difflib.get_close_matches(question.lower().strip(), keys, n=1, cutoff=0.55)
+    return faq[match[0]] if match else None
+
+
+def synthetic_faq(size: int, seed: int = 7) -> dict:
+    """The real FAQ padded with random keys built from its own vocabulary."""
+    rng = random.Random(seed)
+    vocab = sorted({w for k in FAQ for w in k.split()} | {f"term{i}" for i in range(size)})
+    faq = dict(FAQ)
+    while len(faq) < size:
+        faq[" ".join(rng.sample(vocab, rng.randint(3, 8)))] = "synthetic answer"
+    return faq
+
+
+def hit_rate(answer_for) -> float:
+    hits = 0
+    for question, key in LABELED_QUESTIONS:
+        expected = FAQ[key] if key else None
+        hits += answer_for(question) == expected
+    return hits / len(LABELED_QUESTIONS)
+
+
+def time_per_question(answer_for, questions: list) -> float:
+    started = time.perf_counter()
+    for q in questions:
+        answer_for(q)
+    return (time.perf_counter() - started) / len(questions) * 1000
+
+
+def cluster_throughput(questions: int = 20_000, seed: int = 11) -> float:
+    """Questions per second into a fresh ``QuestionClusters``, mostly one-word paraphrases."""
+    rng = random.Random(seed)
+    vocab = sorted({w for k in FAQ for w in k.split()} | {f"term{i}" for i in range(2000)})
+    topics = [rng.sample(vocab, 6) for _ in range(questions // 10)]
+
+    def paraphrase():
+        words = list(rng.choice(topics))
+        words[rng.randrange(len(words))] = rng.choice(vocab)
+        rng.shuffle(words)
+        return " ".join(words)
+
+    batch = [paraphrase() for _ in range(questions)]
+    with tempfile.TemporaryDirectory() as tmp:
+        clusters = QuestionClusters(os.path.join(tmp, "clusters.sqlite3"))
+        started = time.perf_counter()
+        clusters.add(batch)
+        return questions / (time.perf_counter() - started)
+
+
+def run() -> dict:
+    keys = list(FAQ)
+    results = {
+        "hit_rate": {
+            "difflib": hit_rate(lambda q: difflib_match(q, FAQ, keys)),
+            "faq_matcher": hit_rate(FaqMatcher(FAQ).match),
+        },
+        "latency_ms": {},
+    }
+
+    questions = [q for q, _ in LABELED_QUESTIONS]
+    long_question = " ".join(questions) * 20
+    for size in (len(FAQ), 500, 2000, 5000):
+        faq = synthetic_faq(size)
+        faq_keys = list(faq)
+        matcher = FaqMatcher(faq, cache_size=0)
+        results["latency_ms"][size] = {
+            "difflib": time_per_question(lambda q: difflib_match(q, faq, faq_keys), questions[:8]),
+            "faq_matcher": time_per_question(matcher.match, questions),
+            "faq_matcher_long_question": time_per_question(matcher.match, [long_question]),
+        }
+    results["clusters_questions_per_s"] = cluster_throughput()
+    return results
+
+
+if __name__ == "__main__":
+    results = run()
+    print(f"{'hit rate':<12}difflib {results['hit_rate']['difflib']:.0%}   "
+          f"faq_matcher {results['hit_rate']['faq_matcher']:.0%}")
+    for size, row in results["latency_ms"].items():
+        print(f"{size:>5} keys  difflib {row['difflib']:9.3f} ms   faq_matcher {row['faq_matcher']:7.3f} ms   "
+              f"long question {row['faq_matcher_long_question']:7.3f} ms")
+    print(f"question clustering {results['clusters_questions_per_s']:,.0f} questions/s")
@@ -0,0 +1,54 @@
+###############################################
+# FTZ Savings – Logging Benchmark
+###############################################
+"""What a log call costs the rerun, and how fast the writer drains the spool.
+
+    python -m benchmarks.bench_logging
+
+Rows go through the real ``SheetWriter`` and ``LogSpool`` into a
+``LocalSheet`` that sleeps ``latency`` seconds per API call, standing in for
+the Sheets round trip.
+"""
+
+import os
+import statistics
+import tempfile
+import time
+
+from log_spool import LogSpool
+from sheet_logging import LOG_COLUMNS, LocalSheet, SheetWriter, build_row, ensure_header
+
+
+def run(rows: int = 500, latency: float = 0.2, timeout: float = 60.0) -> dict:
+    workdir = tempfile.mkdtemp(prefix="ftz_bench_")
+    sheet = LocalSheet(os.path.join(workdir, "sheet.csv"), latency=latency)
+    ensure_header(sheet)
+    writer = SheetWriter(lambda: sheet, LogSpool(os.path.join(workdir, "spool.sqlite3")), flush_interval=0.5)
+
+    submit_ms = []
+    started = time.perf_counter()
+    for i in range(rows):
+        row = build_row({name: "" for name in LOG_COLUMNS if name not in ("timestamp", "event_id")} | {"session_id": f"bench-{i % 25}"})
+        t = time.perf_counter()
+        writer.submit(row)
+        submit_ms.append((time.perf_counter() - t) * 1000)
+
+    while writer.spool.pending_count() and time.perf_counter() - started < timeout:
+        time.sleep(0.05)
+    drained = time.perf_counter() - started
+    writer.close()
+
+    logged = len(sheet.get_all_values()) - 1
+    if logged != rows:
+        raise RuntimeError(f"Expected {rows} logged rows, found {logged}")
+    submit_ms.sort()
+    return {
+        "submit_p50_ms": statistics.median(submit_ms),
+        "submit_p95_ms": submit_ms[int(len(submit_ms) * 0.95) - 1],
+        "drain_rows_per_s": rows / drained,
+    }
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<22}{value:12.3f}")
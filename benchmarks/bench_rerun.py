@@ -0,0 +1,125 @@
+###############################################
+# FTZ Savings – Rerun Benchmark
+###############################################
+"""Time spent running the app script per rerun, driven headlessly by AppTest.
+
+    python -m benchmarks.bench_rerun
+
+The app runs inside a thin wrapper that times the script body itself, so
+AppTest's own polling is left out. AppTest always replays the whole script:
+these are full-rerun times, and clicks inside the results and chat
+fragments cost less still in the browser. Logging goes to a throwaway
+local sheet in the benchmark sandbox (see ``benchmarks/__init__.py``).
+
+``time_concurrent_sessions`` drives N sessions at once, one AppTest per
+worker process (AppTest patches process-wide runtime state, so sessions
+can't share a process the way they do behind a real server).
+"""
+
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks import SANDBOX
+
+ROUNDS = 15
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+_TIMED_APP = f"""
+import runpy, time
+import streamlit as st
+started = time.perf_counter()
+runpy.run_path({APP_PATH!r})
+st.session_state["_rerun_ms"] = (time.perf_counter() - started) * 1000
+"""
+
+
+def _median_ms(at, step, rounds: int = ROUNDS) -> float:
+    timings = []
+    for i in range(rounds):
+        step(i)
+        timings.append(at.session_state["_rerun_ms"])
+    return statistics.median(timings)
+
+
+def _check_sandbox():
+    # The paths are read once, at import: an app module imported before the
+    # benchmarks package would still point at production
+    from chat_store import CHAT_SPILL_PATH
+    from experiments import AGGREGATE_SPOOL_PATH
+    from sheet_logging import LOCAL_SHEET_PATH, SPOOL_PATH
+
+    for path in (LOCAL_SHEET_PATH, SPOOL_PATH, AGGREGATE_SPOOL_PATH, CHAT_SPILL_PATH):
+        if not path.startswith(SANDBOX):
+            raise RuntimeError(f"{path} is outside the benchmark sandbox; import benchmarks before any app module")
+
+
+def _app_session():
+    _check_sandbox()
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_string(_TIMED_APP, default_timeout=60)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+
+def time_reruns(rounds: int = ROUNDS) -> dict:
+    at = _app_session()
+
+    def idle(_):
+        at.run()
+
+    def change_input(i):
+        next(w for w in at.number_input if w.label == "Export %").set_value(1.0 + i % 2).run()
+
+    def ask(i):
+        next(w for w in at.text_input if w.label == "Ask your question:").set_value(f"What are MPF and HMF? {i}")
+        next(b for b in at.button if b.label == "Ask AI").click().run()
+
+    return {
+        "first_run_ms": at.session_state["_rerun_ms"],
+        "idle_rerun_ms": _median_ms(at, idle, rounds),
+        "input_change_ms": _median_ms(at, change_input, rounds),
+        "chat_question_ms": _median_ms(at, ask, rounds),
+    }
+
+
+def _session_worker(task: tuple) -> list:
+    start_at, rounds = task
+    at = _app_session()
+    # Line every session up so the timed reruns really overlap
+    time.sleep(max(0.0, start_at - time.time()))
+    timings = []
+    for i in range(rounds):
+        next(w for w in at.number_input if w.label == "Export %").set_value(1.0 + i % 5).run()
+        timings.append(at.session_state["_rerun_ms"])
+    return timings
+
+
+def time_concurrent_sessions(sessions: int = 4, rounds: int = ROUNDS) -> dict:
+    """Per-rerun script time while ``sessions`` sessions interact at once."""
+    start_at = time.time() + 20
+    with ProcessPoolExecutor(sessions, mp_context=multiprocessing.get_context("spawn")) as pool:
+        timings = sorted(t for result in pool.map(_session_worker, [(start_at, rounds)] * sessions) for t in result)
+    return {
+        f"sessions_{sessions}_rerun_p50_ms": statistics.median(timings),
+        f"sessions_{sessions}_rerun_p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def run(rounds: int = ROUNDS, sessions: int = 4) -> dict:
+    return {**time_reruns(rounds), **time_concurrent_sessions(sessions, rounds)}
+
+
+if __name__ == "__main__":
+    # Import under the package name: worker processes can't unpickle
+    # functions from __main__ once AppTest has swapped it out
+    from benchmarks.bench_rerun import run as run_benchmark
+
+    for name, value in run_benchmark().items():
+        print(f"{name:<28}{value:10.2f}")
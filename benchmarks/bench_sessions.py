@@ -0,0 +1,84 @@
+###############################################
+# FTZ Savings – Session Memory Benchmark
+###############################################
+"""What many concurrent chat sessions cost in memory and per message.
+
+    python -m benchmarks.bench_sessions
+
+``sessions`` visitors each ask ``questions`` questions (twice the ring
+size by default, so every session has spilled) through the real
+``SessionRegistry`` and ``ChatSpill``. ``session_kb`` is the memory
+tracemalloc sees per session once they are all in, ``accounted_ratio`` how
+close the registry's own accounting comes to it. ``append_us`` and
+``render_us`` are one message and one cached render; ``evict_us`` is one
+session's share of a sweep that spills them all to disk and ``reload_us``
+brings one back.
+"""
+
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from chat_store import ASSISTANT, CHAT_MAX_MESSAGES, USER, ChatSpill, SessionRegistry
+
+ANSWER = (
+    "MPF (Merchandise Processing Fee) and HMF (Harbor Maintenance Fee) are charged on each "
+    "customs entry; inside an FTZ, weekly consolidated entries cap the MPF paid per week."
+)
+
+
+def run(sessions: int = 2000, questions: int = CHAT_MAX_MESSAGES) -> dict:
+    workdir = tempfile.mkdtemp(prefix="ftz_bench_")
+    registry = SessionRegistry(ChatSpill(os.path.join(workdir, "chat_spill.sqlite3")), sweep_interval=float("inf"))
+
+    append_us, render_us = [], []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for s in range(sessions):
+        chat = registry.chat(f"bench-{s}")
+        for q in range(questions):
+            t = time.perf_counter()
+            chat.append(USER, f"What are MPF and HMF on entry {q}?")
+            chat.append(ASSISTANT, ANSWER)
+            append_us.append((time.perf_counter() - t) * 1e6 / 2)
+        t = time.perf_counter()
+        chat.html()
+        render_us.append((time.perf_counter() - t) * 1e6)
+        t = time.perf_counter()
+        chat.html()
+        render_us.append((time.perf_counter() - t) * 1e6)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    accounted = registry.memory_bytes()
+
+    registry.idle_seconds = 0
+    t = time.perf_counter()
+    evicted = registry.sweep()
+    evict_us = (time.perf_counter() - t) * 1e6 / sessions
+    if evicted != sessions:
+        raise RuntimeError(f"Expected {sessions} evicted sessions, got {evicted}")
+
+    reload_us = []
+    for s in range(0, sessions, max(1, sessions // 200)):
+        t = time.perf_counter()
+        chat = registry.chat(f"bench-{s}")
+        reload_us.append((time.perf_counter() - t) * 1e6)
+        if len(chat) != CHAT_MAX_MESSAGES:
+            raise RuntimeError(f"Session bench-{s} reloaded {len(chat)} messages")
+    registry.close()
+
+    return {
+        "session_kb": used / sessions / 1024,
+        "accounted_ratio": accounted / used,
+        "append_us": statistics.median(append_us),
+        "render_us": statistics.median(render_us),
+        "evict_us": evict_us,
+        "reload_us": statistics.median(reload_us),
+    }
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<18}{value:12.3f}")
@@ -0,0 +1,111 @@
+###############################################
+# FTZ Savings – Cold-Start Benchmark
+###############################################
+"""Cold-start cost of the app: import time and time to first render.
+
+    python -m benchmarks.bench_startup
+
+Every sample runs in a fresh interpreter, as a new container would.
+``streamlit_import_ms`` is what the server pays before any session;
+``import_ms`` is importing everything else app.py imports on top of it;
+``first_render_ms`` is a new session's first script run, those imports
+included, timed inside the script as in bench_rerun. ``deferred_loaded``
+counts the ``DEFERRED`` modules already in ``sys.modules`` after the first
+render (they should load on first use only).
+
+``over_budget`` checks the numbers against ``BUDGET``; the runner fails on a
+blown budget the way it does on a regression, and so does this module when
+run on its own. Budgets are absolute, so unlike the baseline they carry
+some headroom for slower machines.
+"""
+
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROUNDS = 5
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+# Loaded on first use (a chart, a report, an upload, a sheet connection)
+DEFERRED = ("altair", "gspread", "google.oauth2", "openpyxl", "fpdf")
+
+BUDGET = {
+    "import_ms": float(os.environ.get("FTZ_IMPORT_BUDGET_MS", "600")),
+    "first_render_ms": float(os.environ.get("FTZ_FIRST_RENDER_BUDGET_MS", "1000")),
+    "deferred_loaded": 0,
+}
+
+_IMPORTS = """
+import importlib, json, sys, time
+started = time.perf_counter()
+import streamlit
+loaded = time.perf_counter()
+for name in {modules!r}:
+    importlib.import_module(name)
+print(json.dumps({{
+    "streamlit_import_ms": (loaded - started) * 1000,
+    "import_ms": (time.perf_counter() - loaded) * 1000,
+}}))
+"""
+
+_FIRST_RENDER = """
+import json, sys
+from benchmarks.bench_rerun import _app_session
+at = _app_session()
+print(json.dumps({{
+    "first_render_ms": at.session_state["_rerun_ms"],
+    "deferred_loaded": sum(name in sys.modules for name in {deferred!r}),
+}}))
+"""
+
+
+def app_imports(path: str = APP_PATH) -> list:
+    """Top-level modules app.py imports, in order, Streamlit excluded."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return [m for m in dict.fromkeys(modules) if m.split(".")[0] != "streamlit"]
+
+
+def _fresh(code: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True, timeout=300
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(rounds: int = ROUNDS) -> dict:
+    imports = [_fresh(_IMPORTS.format(modules=app_imports())) for _ in range(rounds)]
+    renders = [_fresh(_FIRST_RENDER.format(deferred=DEFERRED)) for _ in range(rounds)]
+    return {
+        "streamlit_import_ms": statistics.median(r["streamlit_import_ms"] for r in imports),
+        "import_ms": statistics.median(r["import_ms"] for r in imports),
+        "first_render_ms": statistics.median(r["first_render_ms"] for r in renders),
+        "deferred_loaded": max(r["deferred_loaded"] for r in renders),
+    }
+
+
+def over_budget(results: dict) -> list:
+    """``(metric, budget, value)`` for every number above its budget."""
+    return [(name, limit, results[name]) for name, limit in BUDGET.items() if results.get(name, 0) > limit]
+
+
+if __name__ == "__main__":
+    results = run()
+    for name, value in results.items():
+        limit = BUDGET.get(name)
+        print(f"{name:<24}{value:10.1f}" + (f"   budget {limit:,.0f}" if limit is not None else ""))
+    failures = over_budget(results)
+    for name, limit, value in failures:
+        print(f"OVER BUDGET {name}: {value:,.1f} > {limit:,.1f}")
+    sys.exit(1 if failures else 0)
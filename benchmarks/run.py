@@ -0,0 +1,164 @@
+###############################################
+# FTZ Savings – Benchmark Runner
+###############################################
+"""Run every benchmark, save the numbers as JSON and fail on regressions.
+
+    python -m benchmarks.run                      # full suite vs baseline.json
+    python -m benchmarks.run --quick --only calc,faq
+    python -m benchmarks.run --update-baseline    # accept the current numbers
+
+Each suite's results are flattened to ``suite.metric`` names. Metrics ending
+in ``_per_s`` or holding a hit rate are better when higher; everything else is
+a time. A gated metric more than ``--threshold`` (relative) worse than the
+baseline, and worse by more than timer noise in absolute terms, is a
+regression and the exit status is 1, as it is when a metric exceeds its
+absolute budget (the startup suite's ``BUDGET``). Baselines are
+machine-specific: refresh them with ``--update-baseline`` on the machine that
+runs the comparison.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+RESULTS_PATH = os.path.join(HERE, "results", "latest.json")
+DEFAULT_THRESHOLD = 0.5
+
+# Absolute changes below these are scheduling noise, whatever the ratio
+NOISE_FLOOR = {"_us": 5.0, "_ms": 2.0}
+
+
+def _suites(quick: bool) -> dict:
+    from benchmarks import bench_calc, bench_faq, bench_logging, bench_rerun, bench_sessions, bench_startup
+
+    return {
+        "calc": lambda: bench_calc.run(
+            rounds=500 if quick else 2000,
+            batch_sizes=(10_000, 100_000) if quick else (10_000, 1_000_000),
+        ),
+        "faq": bench_faq.run,
+        "logging": lambda: bench_logging.run(rows=200 if quick else 500),
+        "rerun": lambda: bench_rerun.run(rounds=5 if quick else 15, sessions=2 if quick else 4),
+        "startup": lambda: bench_startup.run(rounds=3 if quick else 5),
+        "sessions": lambda: bench_sessions.run(sessions=500 if quick else 2000),
+    }
+
+
+def budgets() -> dict:
+    from benchmarks.bench_startup import BUDGET
+
+    return {f"startup.{name}": limit for name, limit in BUDGET.items()}
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        else:
+            flat[name] = float(value)
+    return flat
+
+
+def higher_is_better(name: str) -> bool:
+    return name.endswith("_per_s") or ".hit_rate." in name
+
+
+def gated(name: str) -> bool:
+    # The difflib numbers are a reference point, the first run includes
+    # imports and Streamlit's own import time isn't ours; none of them says
+    # anything about a change to this code (the startup budget covers imports);
+    # the sessions suite's accounted_ratio checks the accounting, not speed
+    return "difflib" not in name and not name.endswith(("first_run_ms", "streamlit_import_ms", "accounted_ratio"))
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """``(metric, baseline, current, relative change)`` for every regression."""
+    regressions = []
+    for name, value in sorted(current.items()):
+        base = baseline.get(name)
+        if base is None or not gated(name) or base == 0:
+            continue
+        change = (value - base) / abs(base)
+        worse = -change if higher_is_better(name) else change
+        floor = next((f for suffix, f in NOISE_FLOOR.items() if name.endswith(suffix)), 0.0)
+        if worse > threshold and abs(value - base) > floor:
+            regressions.append((name, base, value, change))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help="comma-separated suites: calc, faq, logging, rerun, startup, sessions")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a fast smoke run")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    suites = _suites(args.quick)
+    selected = args.only.split(",") if args.only else list(suites)
+    unknown = set(selected) - set(suites)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    metrics = {}
+    for suite in selected:
+        started = time.perf_counter()
+        metrics.update(flatten(suites[suite](), suite))
+        print(f"{suite:<10} done in {time.perf_counter() - started:6.1f} s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "metrics": metrics,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)["metrics"]
+        report["metrics"] = {**baseline, **metrics}
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    for name, value in metrics.items():
+        print(f"{name:<48}{value:16,.3f}")
+    over = [(name, limit, metrics[name]) for name, limit in budgets().items() if metrics.get(name, 0) > limit]
+    for name, limit, value in over:
+        print(f"OVER BUDGET {name}: {value:,.3f} > {limit:,.3f}")
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 1 if over else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["metrics"]
+    regressions = compare(metrics, baseline, args.threshold)
+    for name, base, value, change in regressions:
+        print(f"REGRESSION {name}: {base:,.3f} -> {value:,.3f} ({change:+.0%})")
+    if regressions or over:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+###############################################
+# FTZ Savings – Break-Even Solver
+###############################################
+"""How far one input has to move for net savings to reach zero (or a target).
+
+With every other input held fixed, ``net_savings_to_brand`` is piecewise
+linear in any single input: linear outright in the duty, export, off-spec,
+interest, stock-day and cost-line inputs, and linear between the MPF cap
+kinks in shipments per week, average import value and the MPF rate (where
+a per-shipment or weekly entry hits ``MPF_CAP``). ``breakeven`` splits the
+input's range at those kinks, prices two points per piece with one
+vectorized ``compute_savings`` call each and solves every piece exactly.
+Inputs the model doesn't know to be piecewise linear, or ``method="bisect"``,
+go through a vectorized bisection instead.
+
+Every input may be a scalar or an array (one per prospect), so a whole
+prospect list is solved in one call.
+"""
+
+import numpy as np
+
+from calculations import INPUT_BOUNDS, INPUT_DEFAULTS, INPUT_FIELDS, MPF_CAP, compute_savings
+
+# Inputs a prospect can realistically change, in the order the UI offers them
+SOLVABLE_INPUTS = (
+    "shipments_per_week",
+    "avg_import_value",
+    "export_pct",
+    "offspec_pct",
+    "duty_pct",
+    "avg_stock_days",
+    "ftz_consult",
+    "ftz_mgmt",
+    "ftz_software",
+    "ftz_bond",
+)
+
+_BISECT_ITERATIONS = 100
+# Doublings of the upper bracket tried when an input has no maximum
+_BRACKET_DOUBLINGS = 60
+
+
+def _mpf_kinks(name: str, x: dict) -> list:
+    """Values of ``name`` where a per-shipment or weekly MPF hits the cap."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = x["mpf_pct"] / 100
+        if name == "shipments_per_week":
+            return [MPF_CAP / (x["avg_import_value"] * rate)]
+        if name == "avg_import_value":
+            return [MPF_CAP / rate, MPF_CAP / (x["shipments_per_week"] * rate)]
+        if name == "mpf_pct":
+            value = x["avg_import_value"]
+            return [100 * MPF_CAP / value, 100 * MPF_CAP / (x["shipments_per_week"] * value)]
+    return []
+
+
+# Every calculator input is piecewise linear in net savings; these have kinks
+KINKS = {name: _mpf_kinks for name in ("shipments_per_week", "avg_import_value", "mpf_pct")}
+PIECEWISE_LINEAR = frozenset(INPUT_FIELDS)
+
+
+def domain(name: str) -> tuple:
+    """``(low, high)`` the solver searches; inputs without widget bounds are non-negative."""
+    low, high = INPUT_BOUNDS.get(name, (None, None))
+    return (0.0 if low is None else float(low), np.inf if high is None else float(high))
+
+
+def _net(x: dict, name: str, value) -> np.ndarray:
+    return np.asarray(compute_savings({**x, name: value})["net_savings_to_brand"], dtype=np.float64)
+
+
+def _closed_form(x: dict, name: str, target: np.ndarray, current: np.ndarray, n: int) -> np.ndarray:
+    low, high = domain(name)
+    kinks = [np.broadcast_to(k, (n,)) for k in (KINKS[name](name, x) if name in KINKS else [])]
+    edges = np.column_stack([np.full(n, low), *kinks, np.full(n, high)])
+    edges = np.sort(np.clip(np.nan_to_num(edges, nan=high, posinf=high), low, high), axis=1)
+
+    best = np.full(n, np.nan)
+    for j in range(edges.shape[1] - 1):
+        left, right = edges[:, j], edges[:, j + 1]
+        # Two points inside the piece pin down its line exactly
+        probe = np.where(np.isfinite(right), right, left + 1.0)
+        same = probe == left
+        probe = np.where(same, left + 1.0, probe)
+        y0, y1 = _net(x, name, left), _net(x, name, probe)
+        slope = (y1 - y0) / (probe - left)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            root = left + (target - y0) / slope
+        ok = ~same & (slope != 0) & (root >= left) & (root <= right)
+        closer = ok & (np.isnan(best) | (np.abs(root - current) < np.abs(best - current)))
+        best = np.where(closer, root, best)
+    return best
+
+
+def _bisect(x: dict, name: str, target: np.ndarray, n: int) -> np.ndarray:
+    low, high = domain(name)
+    lo = np.full(n, low)
+    f_lo = _net(x, name, lo) - target
+    if np.isfinite(high):
+        hi = np.full(n, high)
+        f_hi = _net(x, name, hi) - target
+    else:
+        # Grow the bracket until the sign flips (or give up)
+        hi = np.full(n, max(low, 1.0))
+        f_hi = _net(x, name, hi) - target
+        for _ in range(_BRACKET_DOUBLINGS):
+            open_ = np.sign(f_hi) == np.sign(f_lo)
+            if not open_.any():
+                break
+            hi = np.where(open_, hi * 2, hi)
+            f_hi = np.where(open_, _net(x, name, hi) - target, f_hi)
+
+    valid = (np.sign(f_lo) != np.sign(f_hi)) | (f_lo == 0)
+    for _ in range(_BISECT_ITERATIONS):
+        mid = (lo + hi) / 2
+        f_mid = _net(x, name, mid) - target
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo, f_lo = np.where(left, mid, lo), np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+    return np.where(valid, (lo + hi) / 2, np.nan)
+
+
+def breakeven(inputs=None, name: str = "shipments_per_week", target=0.0, method: str = "auto"):
+    """Value of ``name`` at which net savings equal ``target``, others held fixed.
+
+    Searches ``domain(name)``; where the line crosses more than once, the
+    crossing nearest the current value wins (bisection returns whichever it
+    brackets). NaN where no value reaches the target. Scalar inputs give a
+    float, anything else an array with one threshold per prospect.
+    """
+    if name not in INPUT_FIELDS:
+        raise ValueError(f"Unknown input {name!r}")
+    if method not in ("auto", "closed_form", "bisect"):
+        raise ValueError(f"Unknown method {method!r}")
+    values = {**INPUT_DEFAULTS, **(inputs or {})}
+    x = {k: np.asarray(values[k], dtype=np.float64) for k in INPUT_FIELDS}
+    target = np.asarray(target, dtype=np.float64)
+    shape = np.broadcast_shapes(target.shape, *(v.shape for v in x.values()))
+    n = int(np.prod(shape)) if shape else 1
+    x = {k: np.broadcast_to(v, shape).reshape(n) for k, v in x.items()}
+    target = np.broadcast_to(target, shape).reshape(n)
+
+    if method == "bisect" or (method == "auto" and name not in PIECEWISE_LINEAR):
+        result = _bisect(x, name, target, n)
+    else:
+        result = _closed_form(x, name, target, x[name], n)
+    return float(result[0]) if shape == () else result.reshape(shape)
+
+
+def breakeven_table(inputs=None, names=SOLVABLE_INPUTS, target=0.0) -> dict:
+    """``name -> threshold`` for several inputs of the same scenario(s)."""
+    return {name: breakeven(inputs, name, target) for name in names}
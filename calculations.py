@@ -0,0 +1,212 @@
+###############################################
+# FTZ Savings – Calculation Engine
+###############################################
+"""Savings formulas behind the calculator, usable outside the Streamlit UI.
+
+Every input can be a Python scalar or a NumPy/pandas column; the same code
+path evaluates one scenario or millions of them in a single vectorized pass
+and reproduces the calculator's numbers exactly.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Distinct scenarios kept by ``cached_savings`` (shared by every session)
+SAVINGS_CACHE_SIZE = 4096
+
+# Per-entry Merchandise Processing Fee ceiling and floor ($)
+MPF_CAP = 634.62
+MPF_MIN = 32.71
+
+# Inputs in the order the calculator asks for them, with the form defaults
+INPUT_DEFAULTS = {
+    "shipments_per_week": 2,
+    "avg_import_value": 500000,
+    "mpf_pct": 0.35,
+    "broker_cost": 125.0,
+    "current_interest_rate": 6.5,
+    "export_pct": 1.0,
+    "offspec_pct": 0.25,
+    "hmf_pct": 0.13,
+    "duty_pct": 30.0,
+    "avg_stock_days": 45,
+    "ftz_consult": 50000,
+    "ftz_mgmt": 150000,
+    "ftz_software": 40000,
+    "ftz_bond": 1000,
+    "noftz_consult": 0,
+    "noftz_mgmt": 0,
+    "noftz_software": 0,
+    "noftz_bond": 0,
+}
+
+INPUT_FIELDS = tuple(INPUT_DEFAULTS)
+
+# Widget labels, for tables and charts that show inputs to people
+INPUT_LABELS = {
+    "shipments_per_week": "Shipments / Week",
+    "avg_import_value": "Avg Import Value ($)",
+    "mpf_pct": "MPF %",
+    "broker_cost": "Broker Cost ($/entry)",
+    "current_interest_rate": "Current Interest Rate (%)",
+    "export_pct": "Export %",
+    "offspec_pct": "Off-Spec %",
+    "hmf_pct": "HMF %",
+    "duty_pct": "Avg Duty %",
+    "avg_stock_days": "Avg # Stock Holding Days",
+    "ftz_consult": "FTZ Consulting",
+    "ftz_mgmt": "FTZ Management",
+    "ftz_software": "FTZ Software Fee",
+    "ftz_bond": "FTZ Operator Bond",
+    "noftz_consult": "Consulting (No FTZ)",
+    "noftz_mgmt": "Management (No FTZ)",
+    "noftz_software": "Software (No FTZ)",
+    "noftz_bond": "Operator Bond (No FTZ)",
+}
+
+# (min, max) the number_input widgets enforce; None means unbounded
+INPUT_BOUNDS = {
+    "shipments_per_week": (1, None),
+    "avg_import_value": (1000, None),
+    "export_pct": (0.0, 100.0),
+    "offspec_pct": (0.0, 100.0),
+    "duty_pct": (0.0, 100.0),
+}
+
+# Every intermediate line item, in the order the CALCULATIONS block derives them
+LINE_ITEMS = (
+    "total_import_value",
+    "entries_per_year",
+    "total_duty",
+    "duty_saved_export",
+    "duty_saved_offspec",
+    "total_net_duty_no_ftz",
+    "total_net_duty_with_ftz",
+    "per_entry_mpf",
+    "mpf_no_ftz",
+    "mpf_with_ftz",
+    "broker_hmf_no_ftz",
+    "broker_hmf_with_ftz",
+    "cost_with_ftz",
+    "cost_without_ftz",
+    "total_wc_saving",
+    "total_cost_without_ftz",
+    "total_cost_with_ftz",
+    "net_savings_to_brand",
+)
+
+
+def compute_savings(inputs=None, **overrides) -> dict:
+    """Return every line item for one scenario or a batch of scenarios.
+
+    ``inputs`` maps input names to scalars or array-likes (missing names fall
+    back to ``INPUT_DEFAULTS``). Scalar inputs give plain floats; any array
+    input broadcasts and every line item comes back as a NumPy array.
+    """
+    values = {**INPUT_DEFAULTS, **(inputs or {}), **overrides}
+    x = {name: np.asarray(values[name], dtype=np.float64) for name in INPUT_FIELDS}
+
+    export_sales = x["export_pct"] / 100
+    off_spec = x["offspec_pct"] / 100
+    avg_duty = x["duty_pct"] / 100
+    mpf_rate = x["mpf_pct"] / 100
+    hmf_rate = x["hmf_pct"] / 100
+
+    shipments_per_week = x["shipments_per_week"]
+    avg_import_value = x["avg_import_value"]
+    broker_cost = x["broker_cost"]
+
+    total_import_value = shipments_per_week * avg_import_value * 52
+    entries_per_year = shipments_per_week * 52
+
+    total_duty = total_import_value * avg_duty
+    duty_saved_export = total_import_value * export_sales * avg_duty
+    duty_saved_offspec = total_import_value * off_spec * avg_duty
+
+    total_net_duty_no_ftz = total_duty
+    total_net_duty_with_ftz = total_duty - duty_saved_export - duty_saved_offspec
+
+    per_entry_mpf = np.minimum(avg_import_value * mpf_rate, MPF_CAP)
+    mpf_no_ftz = per_entry_mpf * entries_per_year
+    mpf_with_ftz = np.minimum(shipments_per_week * avg_import_value * mpf_rate, MPF_CAP) * 52
+
+    broker_hmf_no_ftz = entries_per_year * broker_cost + shipments_per_week * avg_import_value * hmf_rate
+    broker_hmf_with_ftz = 52 * broker_cost + shipments_per_week * avg_import_value * hmf_rate
+
+    cost_with_ftz = x["ftz_consult"] + x["ftz_mgmt"] + x["ftz_software"] + x["ftz_bond"]
+    cost_without_ftz = x["noftz_consult"] + x["noftz_mgmt"] + x["noftz_software"] + x["noftz_bond"]
+
+    interest_rate = x["current_interest_rate"] / 100
+    total_wc_saving = total_net_duty_with_ftz * interest_rate * (x["avg_stock_days"] / 365)
+
+    total_cost_without_ftz = total_net_duty_no_ftz + mpf_no_ftz + broker_hmf_no_ftz + cost_without_ftz
+    total_cost_with_ftz = total_net_duty_with_ftz + mpf_with_ftz + broker_hmf_with_ftz + cost_with_ftz - total_wc_saving
+
+    net_savings_to_brand = total_cost_without_ftz - total_cost_with_ftz
+
+    results = {
+        "total_import_value": total_import_value,
+        "entries_per_year": entries_per_year,
+        "total_duty": total_duty,
+        "duty_saved_export": duty_saved_export,
+        "duty_saved_offspec": duty_saved_offspec,
+        "total_net_duty_no_ftz": total_net_duty_no_ftz,
+        "total_net_duty_with_ftz": total_net_duty_with_ftz,
+        "per_entry_mpf": per_entry_mpf,
+        "mpf_no_ftz": mpf_no_ftz,
+        "mpf_with_ftz": mpf_with_ftz,
+        "broker_hmf_no_ftz": broker_hmf_no_ftz,
+        "broker_hmf_with_ftz": broker_hmf_with_ftz,
+        "cost_with_ftz": cost_with_ftz,
+        "cost_without_ftz": cost_without_ftz,
+        "total_wc_saving": total_wc_saving,
+        "total_cost_without_ftz": total_cost_without_ftz,
+        "total_cost_with_ftz": total_cost_with_ftz,
+        "net_savings_to_brand": net_savings_to_brand,
+    }
+
+    shape = np.broadcast_shapes(*(v.shape for v in x.values()))
+    if shape == ():
+        return {name: float(v) for name, v in results.items()}
+    return {name: np.broadcast_to(v, shape) for name, v in results.items()}
+
+
+def input_key(inputs=None, **overrides) -> tuple:
+    """Canonical, hashable form of one scenario: every input as a float, in ``INPUT_FIELDS`` order."""
+    values = {**INPUT_DEFAULTS, **(inputs or {}), **overrides}
+    return tuple(float(values[name]) for name in INPUT_FIELDS)
+
+
+@lru_cache(maxsize=SAVINGS_CACHE_SIZE)
+def _cached_savings(key: tuple) -> tuple:
+    results = compute_savings(dict(zip(INPUT_FIELDS, key)))
+    return tuple(results[name] for name in LINE_ITEMS)
+
+
+def cached_savings(inputs=None, **overrides) -> dict:
+    """``compute_savings`` for one scalar scenario, memoized process-wide.
+
+    Results are kept in a bounded LRU keyed by ``input_key``, so a rerun with
+    inputs any session has already priced skips the arithmetic entirely.
+    """
+    return dict(zip(LINE_ITEMS, _cached_savings(input_key(inputs, **overrides))))
+
+
+def savings_frame(df, defaults=None):
+    """Price every row of ``df`` and return its inputs plus all line items.
+
+    Columns named after ``INPUT_FIELDS`` are used as-is; any that are missing
+    take their value from ``defaults`` (or ``INPUT_DEFAULTS``).
+    """
+    base = {**INPUT_DEFAULTS, **(defaults or {})}
+    inputs = {
+        name: df[name].to_numpy(dtype=np.float64) if name in df.columns else base[name]
+        for name in INPUT_FIELDS
+    }
+    results = compute_savings(inputs)
+    n = len(df)
+    columns = {name: np.broadcast_to(np.asarray(inputs[name], dtype=np.float64), (n,)) for name in INPUT_FIELDS}
+    columns.update({name: np.broadcast_to(results[name], (n,)) for name in LINE_ITEMS})
+    return pd.DataFrame(columns, index=df.index)
@@ -0,0 +1,288 @@
+###############################################
+# FTZ Savings – Chat History Store
+###############################################
+"""Bounded per-session chat history and idle-session eviction.
+
+Each session's chat lives in a ``ChatHistory``: a ring buffer of the last
+``CHAT_MAX_MESSAGES`` messages, each formatted to HTML once when it is
+added, so a rerun renders the whole conversation with one ``st.markdown``
+of a cached string however long the chat has run. Messages pushed out of
+the ring are spilled to a local SQLite ``ChatSpill`` and can still be paged
+back in.
+
+``SessionRegistry`` holds every session's history for the process and
+accounts for their memory. At most once per ``sweep_interval`` it evicts
+sessions idle for ``SESSION_IDLE_SECONDS`` and, past
+``SESSION_MEMORY_BUDGET_MB``, the least recently used ones until back under
+budget. An evicted session's messages are spilled first, so a visitor who
+returns finds their chat reloaded from disk.
+"""
+
+import html
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+CHAT_MAX_MESSAGES = int(os.environ.get("FTZ_CHAT_MAX_MESSAGES", "40"))
+CHAT_SPILL_PATH = os.environ.get("FTZ_CHAT_SPILL", "var/chat_spill.sqlite3")
+SESSION_IDLE_SECONDS = float(os.environ.get("FTZ_SESSION_IDLE_SECONDS", "1800"))
+SESSION_MEMORY_BUDGET_MB = float(os.environ.get("FTZ_SESSION_MEMORY_MB", "256"))
+
+# Longer questions are cut here before they are stored or shown
+MAX_MESSAGE_CHARS = 2000
+
+# Spilled messages are kept for a week, then purged
+SPILL_RETENTION_SECONDS = 7 * 24 * 3600
+
+USER, ASSISTANT = "You", "AI"
+
+# Bytes a stored message costs beyond its two strings: the tuple, the
+# deque slot and the int sequence number
+_MESSAGE_OVERHEAD = sys.getsizeof((0, "", "", "")) + 8 + sys.getsizeof(0)
+_HISTORY_OVERHEAD = sys.getsizeof(deque(maxlen=1)) + 512
+
+
+def format_message(speaker: str, message: str) -> str:
+    """One message as the chat's HTML; what visitors type is escaped, answers are ours."""
+    if speaker == USER:
+        return f"<div class='chat-user'><strong>You:</strong> {html.escape(message)}</div>"
+    return f"<div class='chat-ai'><strong>AI:</strong> {message}</div>"
+
+
+class ChatSpill:
+    """Messages that no longer fit in memory, on local disk."""
+
+    def __init__(self, path: str = CHAT_SPILL_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Losing the last spilled messages in a power cut is acceptable
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                speaker TEXT NOT NULL,
+                message TEXT NOT NULL,
+                spilled_at REAL NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_spilled ON messages (spilled_at)")
+
+    def write(self, rows: list):
+        """Store ``(session_id, seq, speaker, message)`` rows; rows already stored are kept as they are."""
+        if not rows:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            # One transaction per call, not one per row
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?)",
+                [(*row, now) for row in rows],
+            )
+
+    def read(self, session_id: str, before: int = None, limit: int = CHAT_MAX_MESSAGES) -> list:
+        """Up to ``limit`` ``(seq, speaker, message)`` rows before ``before``, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, speaker, message FROM messages WHERE session_id = ? AND seq < ?"
+                " ORDER BY seq DESC LIMIT ?",
+                (session_id, before if before is not None else sys.maxsize, limit),
+            ).fetchall()
+        return rows[::-1]
+
+    def count(self, session_id: str, before: int = None) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ? AND seq < ?",
+                (session_id, before if before is not None else sys.maxsize),
+            ).fetchone()[0]
+
+    def purge(self, older_than: float = SPILL_RETENTION_SECONDS):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE spilled_at < ?", (time.time() - older_than,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ChatHistory:
+    """The last ``max_messages`` messages of one session, and their rendered HTML."""
+
+    def __init__(self, session_id: str, spill: ChatSpill, max_messages: int = CHAT_MAX_MESSAGES, revive=None):
+        self.session_id = session_id
+        self.spill = spill
+        # Called for the session's current history if this one was evicted
+        self._revive = revive
+        self.evicted = False
+        self._lock = threading.Lock()
+        # (seq, speaker, message, html)
+        self._messages = deque(maxlen=max_messages)
+        self._html = None
+        self.nbytes = _HISTORY_OVERHEAD
+        self.last_seen = time.monotonic()
+        # A returning session picks up where its spilled chat left off,
+        # numbering on from the highest spilled seq
+        restored = spill.read(session_id, limit=max_messages)
+        for seq, speaker, message in restored:
+            self._keep(seq, speaker, message)
+        self._next_seq = restored[-1][0] + 1 if restored else 0
+        self.spilled = spill.count(session_id, self.first_seq)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest message in memory (None when empty)."""
+        return self._messages[0][0] if self._messages else None
+
+    def append(self, speaker: str, message: str) -> "ChatHistory":
+        """Add a message; returns the history that took it (see ``evicted``)."""
+        message = message[:MAX_MESSAGE_CHARS]
+        with self._lock:
+            if not self.evicted:
+                if len(self._messages) == self._messages.maxlen:
+                    seq, old_speaker, old_message, old_html = self._messages[0]
+                    self.spill.write([(self.session_id, seq, old_speaker, old_message)])
+                    self.nbytes -= _message_bytes(old_message, old_html)
+                    self.spilled += 1
+                self._keep(self._next_seq, speaker, message)
+                self._next_seq += 1
+                return self
+        # Swept between the rerun's chat() and this append: the session's
+        # messages are on disk and it gets a fresh history from there
+        return self._revive().append(speaker, message)
+
+    def html(self) -> str:
+        """The whole conversation in memory as one HTML string, built once per change."""
+        with self._lock:
+            if self._html is None:
+                self._html = "\n\n".join(m[3] for m in self._messages)
+                self.nbytes += sys.getsizeof(self._html)
+            return self._html
+
+    def earlier(self, limit: int = CHAT_MAX_MESSAGES) -> list:
+        """The ``limit`` spilled ``(speaker, message)`` pairs just before the ones in memory."""
+        return [(speaker, message) for _, speaker, message in self.spill.read(self.session_id, self.first_seq, limit)]
+
+    def evict(self) -> list:
+        """Stop taking messages; returns every message in memory as a ``ChatSpill`` row."""
+        with self._lock:
+            self.evicted = True
+            return [(self.session_id, *m[:3]) for m in self._messages]
+
+    def _keep(self, seq: int, speaker: str, message: str):
+        formatted = format_message(speaker, message)
+        self._messages.append((seq, speaker, message, formatted))
+        self.nbytes += _message_bytes(message, formatted)
+        if self._html is not None:
+            self.nbytes -= sys.getsizeof(self._html)
+            self._html = None
+
+
+def _message_bytes(message: str, formatted: str) -> int:
+    return sys.getsizeof(message) + sys.getsizeof(formatted) + _MESSAGE_OVERHEAD
+
+
+class SessionRegistry:
+    """Process-wide chat histories with idle and memory-budget eviction."""
+
+    def __init__(
+        self,
+        spill: ChatSpill,
+        max_messages: int = CHAT_MAX_MESSAGES,
+        idle_seconds: float = SESSION_IDLE_SECONDS,
+        memory_budget_mb: float = SESSION_MEMORY_BUDGET_MB,
+        sweep_interval: float = 30.0,
+    ):
+        self.spill = spill
+        self.max_messages = max_messages
+        self.idle_seconds = idle_seconds
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        # session_id -> ChatHistory, least recently seen first
+        self._sessions = OrderedDict()
+        self._swept_at = time.monotonic()
+        self._purged_at = 0.0
+        self.evicted_idle = 0
+        self.evicted_for_memory = 0
+
+    def chat(self, session_id: str) -> ChatHistory:
+        """The session's history, restored from disk if it was evicted; marks it active."""
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                history = self._sessions[session_id] = ChatHistory(
+                    session_id, self.spill, self.max_messages, revive=lambda: self.chat(session_id)
+                )
+            else:
+                self._sessions.move_to_end(session_id)
+            history.last_seen = time.monotonic()
+        if time.monotonic() - self._swept_at >= self.sweep_interval:
+            self.sweep()
+        return history
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(h.nbytes for h in self._sessions.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes = [h.nbytes for h in self._sessions.values()]
+        return {
+            "sessions": len(sizes),
+            "memory_mb": sum(sizes) / 1024 / 1024,
+            "largest_session_kb": max(sizes, default=0) / 1024,
+            "memory_budget_mb": self.memory_budget / 1024 / 1024,
+            "evicted_idle": self.evicted_idle,
+            "evicted_for_memory": self.evicted_for_memory,
+        }
+
+    def sweep(self) -> int:
+        """Evict idle sessions, then the least recently seen until under budget; returns how many."""
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            self._swept_at = now
+            rows = []
+            total = sum(h.nbytes for h in self._sessions.values())
+            for session_id, history in list(self._sessions.items()):
+                idle = now - history.last_seen >= self.idle_seconds
+                if not idle and total <= self.memory_budget:
+                    # Ordered by last seen: nobody after this one is idle either
+                    break
+                del self._sessions[session_id]
+                total -= history.nbytes
+                rows.extend(history.evict())
+                evicted += 1
+                if idle:
+                    self.evicted_idle += 1
+                else:
+                    self.evicted_for_memory += 1
+            # One write for every evicted session, before the lock is let go:
+            # a session coming straight back must find all of its messages
+            self.spill.write(rows)
+        if now - self._purged_at > 3600:
+            self.spill.purge()
+            self._purged_at = now
+        return evicted
+
+    def close(self):
+        """Spill every session, e.g. on shutdown."""
+        with self._lock:
+            self.spill.write([row for history in self._sessions.values() for row in history.evict()])
+            self._sessions.clear()
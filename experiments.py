@@ -0,0 +1,300 @@
+###############################################
+# FTZ Savings – Experiments
+###############################################
+"""Variant assignment and pre-aggregated experiment counters.
+
+Sessions are assigned to a variant by hashing the experiment name with the
+session id, so the same session always sees the same variant, on any
+server, with nothing stored. Exposure, Calculate, CTA and chat events are
+counted in memory per variant (net savings go into a t-digest) and every
+``AGGREGATE_FLUSH_SECONDS`` each active variant becomes one aggregate row on
+the sheet's ``AGGREGATE_WORKSHEET``, delivered through its own spool. That
+replaces one Sheets row per Calculate click with a handful of rows per
+process per window.
+
+Session counts (``calculating_sessions``, ``converted_sessions``, ...) are
+recorded once per session, when the caller says it is the session's first
+such event, so summing them over every row and process is exact.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+EXPERIMENT_NAME = os.environ.get("FTZ_EXPERIMENT", "cta_copy")
+# "A,B" splits evenly; "A:3,B:1" weights them
+EXPERIMENT_VARIANTS = os.environ.get("FTZ_VARIANTS", "A,B")
+AGGREGATE_FLUSH_SECONDS = float(os.environ.get("FTZ_AGG_FLUSH_SECONDS", "60"))
+AGGREGATE_SPOOL_PATH = os.environ.get("FTZ_AGG_SPOOL", "var/aggregate_spool.sqlite3")
+AGGREGATE_WORKSHEET = "aggregates"
+
+# Smart CTA button copy under test
+CTA_LABELS = {
+    "A": "📞 Smart CTA",
+    "B": "📞 Talk to an FTZ Advisor",
+}
+
+COUNTERS = (
+    "exposures",
+    "calculations",
+    "calculating_sessions",
+    "ctas",
+    "cta_sessions",
+    "converted_sessions",
+    "chat_questions",
+    "unmatched_questions",
+)
+
+AGGREGATE_COLUMNS = [
+    "window_start",
+    "window_end",
+    "host",
+    "experiment",
+    "variant",
+    *COUNTERS,
+    "net_savings_mean",
+    "net_savings_p10",
+    "net_savings_p50",
+    "net_savings_p90",
+    "net_savings_digest",
+    "event_id",
+]
+
+AGGREGATE_EVENT_ID_INDEX = AGGREGATE_COLUMNS.index("event_id")
+
+# t-digest compression: at most ~2x this many centroids are kept
+DIGEST_COMPRESSION = 100
+
+
+class TDigest:
+    """Merging t-digest (Dunning) for streaming quantiles of net savings.
+
+    Centroids near the tails stay small, so p10/p90 remain accurate with a
+    couple of hundred centroids however many values are added; digests from
+    different windows or processes merge by re-adding their centroids.
+    """
+
+    def __init__(self, compression: float = DIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.count = 0.0
+        self.total = 0.0
+        self._buffer = []
+
+    def add(self, value: float, weight: float = 1.0):
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.total += value * weight
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, centroids):
+        for mean, weight in centroids:
+            self.add(mean, weight)
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted([*zip(self.means, self.weights), *self._buffer])
+        self._buffer = []
+        total = sum(w for _, w in points)
+        means, weights = [], []
+        seen = 0.0
+        mean, weight = points[0]
+        k_low = self._k(0.0)
+        for m, w in points[1:]:
+            if self._k((seen + weight + w) / total) - k_low <= 1:
+                mean += (m - mean) * w / (weight + w)
+                weight += w
+            else:
+                means.append(mean)
+                weights.append(weight)
+                seen += weight
+                k_low = self._k(seen / total)
+                mean, weight = m, w
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float) -> float:
+        self._compress()
+        if not self.means:
+            return math.nan
+        if len(self.means) == 1:
+            return self.means[0]
+        # Interpolate between centroid centres placed at their cumulative midpoints
+        centres = []
+        seen = 0.0
+        for w in self.weights:
+            centres.append(seen + w / 2)
+            seen += w
+        rank = q * seen
+        i = bisect_left(centres, rank)
+        if i == 0:
+            return self.means[0]
+        if i == len(centres):
+            return self.means[-1]
+        span = centres[i] - centres[i - 1]
+        return self.means[i - 1] + (self.means[i] - self.means[i - 1]) * (rank - centres[i - 1]) / span
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def centroids(self) -> list:
+        self._compress()
+        return [[round(m, 2), w] for m, w in zip(self.means, self.weights)]
+
+
+def parse_variants(spec: str = EXPERIMENT_VARIANTS) -> tuple:
+    """``"A:3,B:1"`` -> ``(("A", 0.75), ("B", 1.0))``: cumulative weights."""
+    pairs = []
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition(":")
+        pairs.append((name, float(weight or 1)))
+    total = sum(w for _, w in pairs)
+    cumulative = 0.0
+    variants = []
+    for name, weight in pairs:
+        cumulative += weight / total
+        variants.append((name, cumulative))
+    return tuple(variants)
+
+
+VARIANTS = parse_variants()
+
+
+def assign_variant(session_id: str, experiment: str = EXPERIMENT_NAME, variants: tuple = VARIANTS) -> str:
+    """Stable variant for a session: the same id always lands in the same bucket."""
+    digest = hashlib.sha256(f"{experiment}:{session_id}".encode()).digest()
+    point = int.from_bytes(digest[:8], "big") / 2 ** 64
+    for name, upper in variants:
+        if point < upper:
+            return name
+    return variants[-1][0]
+
+
+class _VariantStats:
+    __slots__ = ("counts", "savings")
+
+    def __init__(self):
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.savings = TDigest()
+
+
+class ExperimentCounters:
+    """Lock-protected per-variant counters, flushed as aggregate rows.
+
+    ``submit`` receives each ordered row (``AGGREGATE_COLUMNS``); the app hands
+    in ``SheetWriter.submit`` so rows are spooled and shipped like any other.
+    """
+
+    def __init__(self, submit, experiment: str = EXPERIMENT_NAME, flush_interval: float = AGGREGATE_FLUSH_SECONDS):
+        self.experiment = experiment
+        self.flush_interval = flush_interval
+        self._submit = submit
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._window_start = time.time()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="experiment-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, variant: str, event: str, first: bool = False, net_savings: float = None, converted: bool = False):
+        """Count one ``exposure``, ``calculate``, ``cta``, ``chat`` or ``unmatched`` event.
+
+        ``first`` marks the session's first event of that kind; ``converted``
+        marks a first CTA from a session that had already calculated.
+        """
+        with self._lock:
+            stats = self._stats.get(variant)
+            if stats is None:
+                stats = self._stats[variant] = _VariantStats()
+            counts = stats.counts
+            if event == "exposure":
+                counts["exposures"] += 1
+            elif event == "calculate":
+                counts["calculations"] += 1
+                counts["calculating_sessions"] += first
+                if net_savings is not None:
+                    stats.savings.add(float(net_savings))
+            elif event == "cta":
+                counts["ctas"] += 1
+                counts["cta_sessions"] += first
+                counts["converted_sessions"] += first and converted
+            elif event == "chat":
+                counts["chat_questions"] += 1
+            elif event == "unmatched":
+                counts["unmatched_questions"] += 1
+            else:
+                raise ValueError(f"Unknown experiment event {event!r}")
+
+    def snapshot(self) -> dict:
+        """Counts for the current (unflushed) window, per variant."""
+        with self._lock:
+            return {variant: dict(stats.counts) for variant, stats in self._stats.items()}
+
+    def flush(self) -> int:
+        """Hand one aggregate row per active variant to ``submit``; returns how many."""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+            window_start, self._window_start = self._window_start, time.time()
+        window_end = self._window_start
+        rows = [self._row(variant, s, window_start, window_end) for variant, s in sorted(stats.items())]
+        for row in rows:
+            self._submit(row)
+        return len(rows)
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join(5.0)
+        self.flush()
+
+    def _row(self, variant: str, stats: _VariantStats, window_start: float, window_end: float) -> list:
+        digest = stats.savings
+        has_savings = digest.count > 0
+
+        def stamp(ts):
+            return datetime.fromtimestamp(ts, ZoneInfo("America/New_York")).strftime("%Y-%m-%d %H:%M:%S %Z")
+
+        row = {
+            "window_start": stamp(window_start),
+            "window_end": stamp(window_end),
+            "host": f"{socket.gethostname()}:{os.getpid()}",
+            "experiment": self.experiment,
+            "variant": variant,
+            **stats.counts,
+            "net_savings_mean": round(digest.mean(), 2) if has_savings else "",
+            "net_savings_p10": round(digest.quantile(0.10), 2) if has_savings else "",
+            "net_savings_p50": round(digest.quantile(0.50), 2) if has_savings else "",
+            "net_savings_p90": round(digest.quantile(0.90), 2) if has_savings else "",
+            "net_savings_digest": json.dumps(digest.centroids(), separators=(",", ":")) if has_savings else "",
+            "event_id": uuid.uuid4().hex,
+        }
+        return [row[name] for name in AGGREGATE_COLUMNS]
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Counters for the window are lost, but the next one still flushes
+                logger.exception("Experiment aggregate flush failed")
@@ -0,0 +1,156 @@
+###############################################
+# FTZ Savings – FAQ Matcher
+###############################################
+"""TF-IDF retrieval over the chatbot's FAQ keys.
+
+Keys are tokenized and stemmed once into an inverted index; a question only
+touches the postings of its own terms, so lookups stay fast with thousands of
+entries. Scores are cosine similarities in [0, 1], compared against a
+confidence threshold instead of difflib's character-level cutoff.
+"""
+
+import math
+import os
+import re
+from collections import OrderedDict, defaultdict
+from threading import Lock
+
+# Minimum cosine similarity for a question to count as answered
+DEFAULT_THRESHOLD = float(os.environ.get("FTZ_FAQ_THRESHOLD", 0.3))
+
+STOPWORDS = frozenset(
+    "a about an and are as at be but by can could do does for from get have how "
+    "i if in is it its me my of on or our should so than that the their them "
+    "there these this to us was we what when where which who why will with "
+    "would you your".split()
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# (suffix, replacement), tried longest first; a light Porter-style stemmer
+_SUFFIXES = (
+    ("ational", "ate"),
+    ("ations", "ate"),
+    ("ation", "ate"),
+    ("ments", ""),
+    ("ment", ""),
+    ("ness", ""),
+    ("ings", ""),
+    ("ing", ""),
+    ("ies", "y"),
+    ("ied", "y"),
+    ("ed", ""),
+    ("es", ""),
+    ("ly", ""),
+    ("s", ""),
+)
+
+
+def stem(word: str) -> str:
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[: -len(suffix)] + replacement
+            break
+    # "consolidate"/"consolidated" and "rate"/"rates" land on the same stem
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+def tokenize(text: str) -> list:
+    return [stem(t) for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class FaqMatcher:
+    """Inverted-index TF-IDF matcher with an LRU cache of recent questions.
+
+    ``faq`` maps match keys to answers and ``aliases`` optionally maps a key
+    to extra phrasings of it. ``match`` returns the best answer or ``None``
+    when no key or alias reaches ``threshold``.
+    """
+
+    def __init__(
+        self,
+        faq: dict,
+        aliases: dict = None,
+        threshold: float = DEFAULT_THRESHOLD,
+        cache_size: int = 2048,
+    ):
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self._keys = list(faq)
+        self._answers = [faq[k] for k in self._keys]
+        self._cache = OrderedDict()
+        self._cache_lock = Lock()
+
+        # Each key and alias is its own document pointing back at its entry
+        texts = []
+        self._doc_entry = []
+        for entry_id, key in enumerate(self._keys):
+            for text in (key, *(aliases or {}).get(key, ())):
+                texts.append(text)
+                self._doc_entry.append(entry_id)
+        docs = [tokenize(t) for t in texts]
+        df = defaultdict(int)
+        for tokens in docs:
+            for term in set(tokens):
+                df[term] += 1
+        n = len(docs)
+        self._idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+        # Words no key uses still dilute a question, as if they were the rarest term
+        self._unknown_idf = math.log(1 + n) + 1
+
+        # term -> [(doc id, normalized weight)]
+        self._postings = defaultdict(list)
+        for doc_id, tokens in enumerate(docs):
+            weights = self._weigh(tokens)
+            for term, weight in weights.items():
+                self._postings[term].append((doc_id, weight))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def best(self, question: str):
+        """Return ``(key, score)`` of the closest FAQ key, or ``(None, 0.0)``."""
+        entry_id, score = self._lookup(question)
+        return (self._keys[entry_id], score) if entry_id >= 0 else (None, 0.0)
+
+    def match(self, question: str):
+        entry_id, score = self._lookup(question)
+        if entry_id < 0 or score < self.threshold:
+            return None
+        return self._answers[entry_id]
+
+    def _lookup(self, question: str):
+        cleaned = " ".join(question.lower().split())
+        with self._cache_lock:
+            if cleaned in self._cache:
+                self._cache.move_to_end(cleaned)
+                return self._cache[cleaned]
+
+        result = self._search(cleaned)
+
+        with self._cache_lock:
+            self._cache[cleaned] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _weigh(self, tokens: list) -> dict:
+        tf = defaultdict(int)
+        for term in tokens:
+            tf[term] += 1
+        weights = {t: (1 + math.log(c)) * self._idf.get(t, self._unknown_idf) for t, c in tf.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {t: w / norm for t, w in weights.items()} if norm else {}
+
+    def _search(self, cleaned: str):
+        query = self._weigh(tokenize(cleaned))
+        scores = defaultdict(float)
+        for term, q_weight in query.items():
+            for doc_id, d_weight in self._postings.get(term, ()):
+                scores[doc_id] += q_weight * d_weight
+        if not scores:
+            return -1, 0.0
+        doc_id = max(scores, key=scores.get)
+        return self._doc_entry[doc_id], scores[doc_id]
@@ -0,0 +1,141 @@
+###############################################
+# FTZ Savings – Chatbot Knowledge Base
+###############################################
+"""FAQ entries for the chatbot, loaded from a versioned data file.
+
+The file (JSON, YAML or Parquet) holds ``version`` plus a list of entries,
+each with a match ``key``, an ``answer`` and optional ``aliases``.
+``KnowledgeBaseStore`` keeps one immutable copy and its match index per
+process and rebuilds both only when the file actually changes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+
+from faq_matcher import FaqMatcher
+
+FAQ_PATH = os.environ.get("FTZ_FAQ_PATH", "data/faq.json")
+
+logger = logging.getLogger(__name__)
+
+
+class FaqEntry(NamedTuple):
+    key: str
+    answer: str
+    aliases: tuple = ()
+
+
+class KnowledgeBase(NamedTuple):
+    version: int
+    entries: tuple
+    digest: str
+
+    @property
+    def faq(self):
+        """Read-only ``key -> answer`` view, the shape the chatbot always used."""
+        return MappingProxyType({e.key: e.answer for e in self.entries})
+
+    @property
+    def aliases(self):
+        return MappingProxyType({e.key: e.aliases for e in self.entries if e.aliases})
+
+
+def _parse(path: str, raw: bytes) -> dict:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        return json.loads(raw)
+    if ext in (".yaml", ".yml"):
+        import yaml
+
+        return yaml.safe_load(raw)
+    if ext == ".parquet":
+        import io
+
+        import pandas as pd
+
+        df = pd.read_parquet(io.BytesIO(raw))
+        version = int(df.attrs.get("version", 1))
+        return {"version": version, "entries": df.to_dict("records")}
+    raise ValueError(f"Unsupported knowledge base format: {path}")
+
+
+def load_knowledge_base(path: str = FAQ_PATH) -> KnowledgeBase:
+    with open(path, "rb") as f:
+        raw = f.read()
+    return _from_bytes(path, raw)
+
+
+def _from_bytes(path: str, raw: bytes) -> KnowledgeBase:
+    data = _parse(path, raw)
+    entries = []
+    for item in data["entries"]:
+        aliases = item.get("aliases")
+        entries.append(FaqEntry(
+            key=str(item["key"]),
+            answer=str(item["answer"]),
+            aliases=tuple(str(a) for a in aliases) if aliases is not None else (),
+        ))
+    return KnowledgeBase(
+        version=int(data.get("version", 1)),
+        entries=tuple(entries),
+        digest=hashlib.sha256(raw).hexdigest(),
+    )
+
+
+class KnowledgeBaseStore:
+    """Process-wide knowledge base with hot reload on file change.
+
+    The file is stat'ed at most once per ``check_interval`` seconds; only a
+    changed mtime/size triggers a read, and only changed content (by hash)
+    triggers a rebuild of the match index.
+    """
+
+    def __init__(self, path: str = FAQ_PATH, check_interval: float = 2.0, **matcher_options):
+        self.path = path
+        self.check_interval = check_interval
+        self._matcher_options = matcher_options
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        self.knowledge_base = None
+        self._matcher = None
+        self._refresh()
+
+    def matcher(self) -> FaqMatcher:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._refresh()
+        return self._matcher
+
+    def _refresh(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if signature == self._signature:
+                    return
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+                if self.knowledge_base and hashlib.sha256(raw).hexdigest() == self.knowledge_base.digest:
+                    self._signature = signature
+                    return
+                kb = _from_bytes(self.path, raw)
+            except Exception as exc:
+                if self._matcher is None:
+                    raise
+                # A bad edit or a read mid-replace: keep answering from the
+                # last good file and try again at the next check
+                logger.warning(
+                    "Could not reload knowledge base %s, keeping version %s: %s",
+                    self.path, self.knowledge_base.version, exc,
+                )
+                return
+            self._matcher = FaqMatcher(kb.faq, aliases=kb.aliases, **self._matcher_options)
+            self.knowledge_base = kb
+            self._signature = signature
@@ -0,0 +1,140 @@
+###############################################
+# FTZ Savings – Shipment Ledger
+###############################################
+"""Exact fees from entry-level shipment data instead of an average shipment.
+
+Without an FTZ every shipment is its own entry, so MPF is floored and capped
+per shipment. In the zone, the week's shipments go out on one consolidated
+entry: MPF is floored and capped once on the ISO week's total value. HMF is
+charged on ocean shipments only. The ledger is streamed in chunks and folded
+into per-week partial sums, so memory depends on the number of weeks, not
+the number of rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from calculations import MPF_CAP, MPF_MIN
+from portfolio import normalize_header, read_chunks
+
+CHUNK_ROWS = 250000
+
+LEDGER_ALIASES = {
+    "date": "date",
+    "entrydate": "date",
+    "shipdate": "date",
+    "arrivaldate": "date",
+    "value": "value",
+    "enteredvalue": "value",
+    "importvalue": "value",
+    "mode": "mode",
+    "transportmode": "mode",
+    "modeoftransport": "mode",
+    "dutypct": "duty_pct",
+    "dutyrate": "duty_pct",
+    "htsdutyrate": "duty_pct",
+    "htsrate": "duty_pct",
+}
+
+OCEAN_MODES = {"ocean", "sea", "vessel", "ship", "oceanfreight"}
+
+# Per-week sums carried between chunks
+_SUMS = ["shipments", "value", "ocean_value", "duty", "mpf_no_ftz"]
+
+
+def _prepare(chunk: pd.DataFrame, default_duty_pct: float):
+    columns = {}
+    for column in chunk.columns:
+        name = LEDGER_ALIASES.get(normalize_header(column))
+        if name and name not in columns:
+            columns[name] = chunk[column]
+    missing = {"date", "value"} - set(columns)
+    if missing:
+        raise ValueError(f"Ledger is missing required column(s): {', '.join(sorted(missing))}")
+
+    dates = pd.to_datetime(columns["date"], errors="coerce")
+    value = pd.to_numeric(columns["value"], errors="coerce")
+    valid = dates.notna() & value.notna() & (value >= 0)
+
+    if "duty_pct" in columns:
+        duty_pct = pd.to_numeric(columns["duty_pct"], errors="coerce").fillna(default_duty_pct)
+    else:
+        duty_pct = pd.Series(default_duty_pct, index=chunk.index)
+    if "mode" in columns:
+        mode = columns["mode"].astype(str).str.lower().str.replace(r"[^a-z]", "", regex=True)
+        ocean = mode.isin(OCEAN_MODES)
+    else:
+        ocean = pd.Series(True, index=chunk.index)
+
+    iso = dates[valid].dt.isocalendar()
+    frame = pd.DataFrame({
+        "iso_year": iso["year"].astype(np.int32),
+        "iso_week": iso["week"].astype(np.int32),
+        "value": value[valid].to_numpy(dtype=np.float64),
+        "duty_pct": duty_pct[valid].to_numpy(dtype=np.float64),
+        "ocean": ocean[valid].to_numpy(),
+    })
+    return frame, int((~valid).sum())
+
+
+def weekly_ledger(
+    source,
+    filename: str,
+    mpf_pct: float,
+    hmf_pct: float,
+    broker_cost: float,
+    export_pct: float = 0.0,
+    offspec_pct: float = 0.0,
+    default_duty_pct: float = 0.0,
+    chunk_rows: int = CHUNK_ROWS,
+):
+    """Return ``(weekly line items, rows skipped)`` for a shipment ledger.
+
+    Rows without a parseable date or value are skipped and counted. A missing
+    duty rate falls back to ``default_duty_pct``; a missing mode counts as
+    ocean, matching the calculator's assumption that HMF always applies.
+    """
+    mpf_rate = mpf_pct / 100
+    hmf_rate = hmf_pct / 100
+    totals = None
+    skipped = 0
+
+    for chunk in read_chunks(source, filename, chunk_rows):
+        frame, bad = _prepare(chunk, default_duty_pct)
+        skipped += bad
+        frame["shipments"] = 1
+        frame["ocean_value"] = np.where(frame["ocean"], frame["value"], 0.0)
+        frame["duty"] = frame["value"] * frame["duty_pct"] / 100
+        frame["mpf_no_ftz"] = np.clip(frame["value"] * mpf_rate, MPF_MIN, MPF_CAP)
+        partial = frame.groupby(["iso_year", "iso_week"])[_SUMS].sum()
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    if totals is None:
+        # No rows at all: derive the same columns from zero weeks
+        index = pd.MultiIndex.from_arrays([[], []], names=["iso_year", "iso_week"])
+        totals = pd.DataFrame({name: pd.Series(dtype=np.float64) for name in _SUMS}, index=index)
+
+    weeks = totals.sort_index().reset_index()
+    duty_kept = 1 - export_pct / 100 - offspec_pct / 100
+    weeks["shipments"] = weeks["shipments"].astype(np.int64)
+    weeks["duty_with_ftz"] = weeks["duty"] * duty_kept
+    weeks["mpf_with_ftz"] = np.clip(weeks["value"] * mpf_rate, MPF_MIN, MPF_CAP)
+    weeks["hmf"] = weeks["ocean_value"] * hmf_rate
+    weeks["broker_no_ftz"] = weeks["shipments"] * broker_cost
+    weeks["broker_with_ftz"] = broker_cost
+    weeks["cost_no_ftz"] = weeks["duty"] + weeks["mpf_no_ftz"] + weeks["hmf"] + weeks["broker_no_ftz"]
+    weeks["cost_with_ftz"] = weeks["duty_with_ftz"] + weeks["mpf_with_ftz"] + weeks["hmf"] + weeks["broker_with_ftz"]
+    weeks["weekly_savings"] = weeks["cost_no_ftz"] - weeks["cost_with_ftz"]
+    weeks = weeks.rename(columns={"duty": "duty_no_ftz"})
+    return weeks, skipped
+
+
+def ledger_totals(weeks: pd.DataFrame) -> dict:
+    """Sum weekly line items into totals comparable to the calculator's."""
+    columns = [
+        "shipments", "value", "duty_no_ftz", "duty_with_ftz", "mpf_no_ftz", "mpf_with_ftz",
+        "hmf", "broker_no_ftz", "broker_with_ftz", "cost_no_ftz", "cost_with_ftz", "weekly_savings",
+    ]
+    totals = {name: float(weeks[name].sum()) for name in columns}
+    totals["weeks"] = len(weeks)
+    return totals
@@ -0,0 +1,145 @@
+###############################################
+# FTZ Savings – Durable Log Spool
+###############################################
+"""Write-ahead spool for sheet log rows, backed by SQLite on local disk.
+
+Every row is committed here before anything talks to Google, so a slow or
+unavailable Sheets API never loses a Calculate click, CTA lead or chatbot
+question. Rows move through three states: pending -> sending -> delivered.
+A row the sheet keeps rejecting as malformed is set aside as dead instead,
+so it can't hold up every row behind it; dead rows are kept for inspection.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PENDING = 0
+SENDING = 1
+DELIVERED = 2
+DEAD = 3
+
+# Delivered rows are kept for a week so a replay can be audited, then purged
+DELIVERED_RETENTION_SECONDS = 7 * 24 * 3600
+
+
+class LogSpool:
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Leads are the one thing we cannot lose: fsync every commit
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id TEXT NOT NULL UNIQUE,
+                queued_at REAL NOT NULL,
+                payload TEXT NOT NULL,
+                state INTEGER NOT NULL DEFAULT 0,
+                delivered_at REAL
+            )
+            """
+        )
+        # Spools created before dead-lettering have no attempts column
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(spool)")}
+        if "attempts" not in columns:
+            self._conn.execute("ALTER TABLE spool ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS spool_state ON spool (state, id)")
+
+    def append(self, event_id: str, row: list):
+        """Durably record an ordered row; re-appending an event is a no-op."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO spool (event_id, queued_at, payload) VALUES (?, ?, ?)",
+                (event_id, time.time(), json.dumps(row)),
+            )
+
+    def pending(self, limit: int) -> list:
+        """Oldest undelivered rows as ``(id, event_id, queued_at, row)``."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT id, event_id, queued_at, payload FROM spool WHERE state < ? ORDER BY id LIMIT ?",
+                (DELIVERED, limit),
+            )
+            return [(i, e, q, json.loads(p)) for i, e, q, p in cur.fetchall()]
+
+    def in_flight(self) -> list:
+        """Rows that were being sent when the process last stopped."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT id, event_id FROM spool WHERE state = ? ORDER BY id", (SENDING,)
+            )
+            return cur.fetchall()
+
+    def mark_sending(self, ids: list):
+        self._set_state(ids, SENDING)
+
+    def mark_pending(self, ids: list):
+        self._set_state(ids, PENDING)
+
+    def mark_delivered(self, ids: list):
+        self._set_state(ids, DELIVERED, delivered_at=time.time())
+
+    def mark_dead(self, ids: list):
+        self._set_state(ids, DEAD)
+
+    def record_failure(self, ids: list) -> int:
+        """Count a rejected send against each row; returns the most attempts among them."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("UPDATE spool SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in ids])
+                placeholders = ",".join("?" * len(ids))
+                attempts = self._conn.execute(
+                    f"SELECT MAX(attempts) FROM spool WHERE id IN ({placeholders})", ids
+                ).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return attempts or 0
+
+    def dead_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spool WHERE state = ?", (DEAD,)).fetchone()[0]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM spool WHERE state < ?", (DELIVERED,)
+            ).fetchone()[0]
+
+    def purge_delivered(self, older_than: float = DELIVERED_RETENTION_SECONDS):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM spool WHERE state = ? AND delivered_at < ?",
+                (DELIVERED, time.time() - older_than),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _set_state(self, ids: list, state: int, delivered_at=None):
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE spool SET state = ?, delivered_at = ? WHERE id = ?",
+                    [(state, delivered_at, i) for i in ids],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                # Leave the shared connection usable for the next BEGIN
+                self._conn.execute("ROLLBACK")
+                raise
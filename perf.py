@@ -0,0 +1,250 @@
+###############################################
+# FTZ Savings – Performance Tracing
+###############################################
+"""Lightweight spans and per-process latency histograms.
+
+    with span("chat.match"):
+        ...
+
+    @traced("calc.savings")
+    def f(...): ...
+
+Every span lands in a fixed-bucket histogram (geometric buckets, ~10%
+resolution), so recording is a ``bisect`` and an increment under a lock and
+costs a couple of microseconds; p50/p95/p99 are read from the buckets.
+Spans also join the current thread's ``RerunTrace`` when one is open, which
+is how the app builds its per-session slow-rerun log: Streamlit runs each
+rerun on the session's script thread.
+
+Histograms are exported as Prometheus text (``render_prometheus``, served by
+``start_metrics_server``) and/or appended to a JSONL file periodically by
+``start_jsonl_export``.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.environ.get("FTZ_METRICS_PORT", "0") or 0)
+PERF_JSONL_PATH = os.environ.get("FTZ_PERF_JSONL", "")
+PERF_JSONL_INTERVAL = float(os.environ.get("FTZ_PERF_INTERVAL", "60"))
+SLOW_RERUN_MS = float(os.environ.get("FTZ_SLOW_RERUN_MS", "500"))
+
+# Bucket upper bounds in ms: 10 µs to ~2 minutes, each 10% wider than the last
+BUCKET_BOUNDS_MS = tuple(0.01 * 1.1 ** i for i in range(172))
+
+# The coarser, fixed ``le`` bounds (seconds) published to Prometheus
+PROMETHEUS_BOUNDS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float):
+        i = bisect_left(BUCKET_BOUNDS_MS, ms)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def quantile(self, q: float) -> float:
+        """Approximate ``q`` quantile in ms, interpolated inside its bucket."""
+        with self._lock:
+            counts = list(self.counts)
+            count, max_ms = self.count, self.max_ms
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                low = BUCKET_BOUNDS_MS[i - 1] if i else 0.0
+                high = BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else max_ms
+                return min(low + (high - low) * (rank - seen) / n, max_ms)
+            seen += n
+        return max_ms
+
+    def snapshot(self) -> dict:
+        return {
+            "span": self.name,
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": self.max_ms,
+        }
+
+
+_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name: str) -> Histogram:
+    hist = _histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(name, Histogram(name))
+    return hist
+
+
+class Span:
+    """Times from creation until ``stop()`` (or the end of a ``with`` block)."""
+
+    __slots__ = ("name", "started", "ms")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.ms = None
+        self.started = time.perf_counter()
+
+    def stop(self) -> float:
+        if self.ms is None:
+            self.ms = (time.perf_counter() - self.started) * 1000
+            histogram(self.name).observe(self.ms)
+            trace = getattr(_local, "trace", None)
+            if trace is not None:
+                trace.spans.append((self.name, self.ms))
+        return self.ms
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def span(name: str) -> Span:
+    return Span(name)
+
+
+def traced(name: str):
+    """Decorator: every call of the function is a span called ``name``."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class RerunTrace:
+    """Spans recorded on this thread from ``start_rerun()`` until ``finish()``."""
+
+    def __init__(self):
+        self.spans = []
+        self.total_ms = None
+        self.started = time.perf_counter()
+        self.wall_time = time.time()
+
+    def finish(self) -> float:
+        if getattr(_local, "trace", None) is self:
+            _local.trace = None
+        if self.total_ms is None:
+            self.total_ms = (time.perf_counter() - self.started) * 1000
+            histogram("rerun").observe(self.total_ms)
+        return self.total_ms
+
+    def summary(self, top: int = 5) -> dict:
+        """Total time and the ``top`` slowest spans, for the slow-rerun log."""
+        slowest = sorted(self.spans, key=lambda s: -s[1])[:top]
+        return {
+            "at": time.strftime("%H:%M:%S", time.localtime(self.wall_time)),
+            "total_ms": round(self.total_ms or 0.0, 1),
+            "slowest_spans": ", ".join(f"{name} {ms:,.1f} ms" for name, ms in slowest),
+        }
+
+
+def start_rerun() -> RerunTrace:
+    trace = RerunTrace()
+    _local.trace = trace
+    return trace
+
+
+def snapshot() -> list:
+    """Summary row per span, sorted by name."""
+    with _registry_lock:
+        hists = sorted(_histograms.values(), key=lambda h: h.name)
+    return [h.snapshot() for h in hists]
+
+
+def render_prometheus() -> str:
+    """Every histogram in the Prometheus text exposition format (seconds)."""
+    lines = [
+        "# HELP ftz_span_duration_seconds Time spent in traced sections of the FTZ app.",
+        "# TYPE ftz_span_duration_seconds histogram",
+    ]
+    with _registry_lock:
+        hists = sorted(_histograms.values(), key=lambda h: h.name)
+    for hist in hists:
+        with hist._lock:
+            counts, count, total_ms = list(hist.counts), hist.count, hist.total_ms
+        label = hist.name.replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = i = 0
+        for bound_s in PROMETHEUS_BOUNDS_S:
+            # Fine buckets that end inside this bound; never over-counts
+            while i < len(BUCKET_BOUNDS_MS) and BUCKET_BOUNDS_MS[i] <= bound_s * 1000:
+                cumulative += counts[i]
+                i += 1
+            lines.append(f'ftz_span_duration_seconds_bucket{{span="{label}",le="{bound_s:g}"}} {cumulative}')
+        lines.append(f'ftz_span_duration_seconds_bucket{{span="{label}",le="+Inf"}} {count}')
+        lines.append(f'ftz_span_duration_seconds_sum{{span="{label}"}} {total_ms / 1000:.6f}')
+        lines.append(f'ftz_span_duration_seconds_count{{span="{label}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> ThreadingHTTPServer:
+    """Serve ``/metrics`` for Prometheus on a daemon thread."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="ftz-metrics", daemon=True).start()
+    return server
+
+
+def start_jsonl_export(path: str = PERF_JSONL_PATH, interval: float = PERF_JSONL_INTERVAL) -> threading.Thread:
+    """Append one line per span to ``path`` every ``interval`` seconds."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    def export():
+        while True:
+            time.sleep(interval)
+            stamp = time.time()
+            rows = [{"ts": stamp, "pid": os.getpid(), **row} for row in snapshot()]
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(row) + "\n" for row in rows)
+
+    thread = threading.Thread(target=export, name="ftz-perf-export", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,215 @@
+###############################################
+# FTZ Savings – Portfolio Pricing
+###############################################
+"""Price a CSV/XLSX of many prospects in streaming chunks.
+
+Rows are read ``CHUNK_ROWS`` at a time, validated against the same ranges
+the calculator's widgets enforce, and priced with one vectorized
+``compute_savings`` call per chunk. Only a ranked top-N table, a summary and
+a sample of row errors are kept in memory; the full result file is written
+by a second streaming pass when it is actually downloaded.
+"""
+
+import io
+import re
+
+import numpy as np
+import pandas as pd
+
+from breakeven import breakeven
+from calculations import INPUT_BOUNDS, INPUT_FIELDS, INPUT_LABELS, LINE_ITEMS, savings_frame
+
+CHUNK_ROWS = 20000
+
+# Row errors kept for display; every error is still counted
+MAX_ERRORS = 500
+
+ID_COLUMN = "prospect"
+
+
+def normalize_header(header) -> str:
+    return re.sub(r"[^a-z0-9]+", "", str(header).lower())
+
+
+# Normalized header -> input field: field names, widget labels and a few
+# spellings the sales team's spreadsheets use
+COLUMN_ALIASES = {
+    **{normalize_header(name): name for name in INPUT_FIELDS},
+    **{normalize_header(label): name for name, label in INPUT_LABELS.items()},
+    "shipmentsweek": "shipments_per_week",
+    "shipmentsperweek": "shipments_per_week",
+    "avgimportvalue": "avg_import_value",
+    "importvalue": "avg_import_value",
+    "exportpct": "export_pct",
+    "export": "export_pct",
+    "offspec": "offspec_pct",
+    "dutypct": "duty_pct",
+    "duty": "duty_pct",
+    "avgduty": "duty_pct",
+    "interestrate": "current_interest_rate",
+    "stockdays": "avg_stock_days",
+    "brokercost": "broker_cost",
+    **{alias: ID_COLUMN for alias in ("prospect", "company", "importer", "customer", "name", "id")},
+}
+
+TEMPLATE_COLUMNS = [ID_COLUMN, *INPUT_FIELDS]
+
+
+def template_csv(defaults: dict) -> bytes:
+    """A one-row CSV showing the expected columns."""
+    row = {ID_COLUMN: "Example Importer", **{name: defaults[name] for name in INPUT_FIELDS}}
+    return pd.DataFrame([row], columns=TEMPLATE_COLUMNS).to_csv(index=False).encode()
+
+
+def read_chunks(source, filename: str, chunk_rows: int = CHUNK_ROWS):
+    """Yield DataFrames of at most ``chunk_rows`` raw rows from CSV or XLSX."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        yield from _xlsx_chunks(source, chunk_rows)
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_rows, dtype=str, skipinitialspace=True)
+
+
+def _xlsx_chunks(source, chunk_rows: int):
+    # openpyxl loads on the first XLSX upload, not with the app
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h) if h is not None else "" for h in next(rows, ())]
+        buffer = []
+        yielded = False
+        for row in rows:
+            if any(v is not None for v in row):
+                buffer.append(row[:len(header)])
+            if len(buffer) == chunk_rows:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+                yielded = True
+        # A header with no rows still yields one (empty) chunk, as read_csv
+        # does, so callers can check the columns
+        if buffer or not yielded:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+def _numeric(raw: pd.Series) -> pd.Series:
+    if not pd.api.types.is_numeric_dtype(raw):
+        raw = raw.astype(str).str.replace(r"[$,%\s]", "", regex=True).replace({"": None, "nan": None, "None": None})
+    return pd.to_numeric(raw, errors="coerce")
+
+
+def validate(chunk: pd.DataFrame, defaults: dict, first_row: int):
+    """Split a raw chunk into clean inputs and ``(row, message)`` errors.
+
+    ``first_row`` is the spreadsheet row number of the chunk's first record.
+    Missing columns and blank cells take the value from ``defaults``.
+    """
+    mapped = {}
+    for column in chunk.columns:
+        name = COLUMN_ALIASES.get(normalize_header(column))
+        if name and name not in mapped:
+            mapped[name] = chunk[column]
+
+    n = len(chunk)
+    rows = np.arange(first_row, first_row + n)
+    bad = np.zeros(n, dtype=bool)
+    errors = []
+    clean = pd.DataFrame(index=chunk.index)
+    clean[ID_COLUMN] = mapped[ID_COLUMN].astype(str).to_numpy() if ID_COLUMN in mapped else rows.astype(str)
+
+    for name in INPUT_FIELDS:
+        if name not in mapped:
+            clean[name] = float(defaults[name])
+            continue
+        raw = mapped[name]
+        values = _numeric(raw)
+        blank = raw.isna().to_numpy() | (raw.astype(str).str.strip() == "").to_numpy()
+        invalid = values.isna().to_numpy() & ~blank
+        values = values.fillna(float(defaults[name])).to_numpy(dtype=np.float64)
+
+        label = INPUT_LABELS[name]
+        for i in np.flatnonzero(invalid):
+            errors.append((rows[i], f"{label}: {raw.iloc[i]!r} is not a number"))
+        # "inf" and "1e400" parse; priced, they would drop out of the totals
+        infinite = ~invalid & ~np.isfinite(values)
+        for i in np.flatnonzero(infinite):
+            errors.append((rows[i], f"{label}: {raw.iloc[i]!r} is not a finite number"))
+        invalid |= infinite
+        low, high = INPUT_BOUNDS.get(name, (None, None))
+        if low is not None:
+            for i in np.flatnonzero(~invalid & (values < low)):
+                errors.append((rows[i], f"{label}: {values[i]:g} is below the minimum {low:g}"))
+            invalid |= values < low
+        if high is not None:
+            for i in np.flatnonzero(~invalid & (values > high)):
+                errors.append((rows[i], f"{label}: {values[i]:g} is above the maximum {high:g}"))
+            invalid |= values > high
+        bad |= invalid
+        clean[name] = values
+
+    clean.insert(0, "row", rows)
+    return clean[~bad], errors
+
+
+def price_chunks(source, filename: str, defaults: dict, chunk_rows: int = CHUNK_ROWS):
+    """Yield ``(priced rows, errors)`` per chunk; priced rows carry every line item."""
+    first_row = 2  # row 1 is the header
+    for chunk in read_chunks(source, filename, chunk_rows):
+        clean, errors = validate(chunk, defaults, first_row)
+        first_row += len(chunk)
+        priced = savings_frame(clean, defaults)
+        priced.insert(0, ID_COLUMN, clean[ID_COLUMN])
+        priced.insert(0, "row", clean["row"])
+        yield priced, errors
+
+
+def summarize_portfolio(source, filename: str, defaults: dict, top_n: int = 200, breakeven_input: str = None) -> dict:
+    """One streaming pass: ranked top-N by net savings, totals and errors.
+
+    With ``breakeven_input``, the top-N table also gets the value of that
+    input at which each prospect's net savings reach zero.
+    """
+    top = None
+    errors = []
+    error_count = invalid_rows = priced_rows = positive = 0
+    total_savings = 0.0
+    for priced, chunk_errors in price_chunks(source, filename, defaults):
+        error_count += len(chunk_errors)
+        invalid_rows += len({row for row, _ in chunk_errors})
+        errors.extend(chunk_errors[:MAX_ERRORS - len(errors)])
+        priced_rows += len(priced)
+        net = priced["net_savings_to_brand"]
+        positive += int((net > 0).sum())
+        total_savings += float(net.sum())
+        candidates = priced if top is None else pd.concat([top, priced])
+        top = candidates.nlargest(top_n, "net_savings_to_brand")
+
+    columns = ["row", ID_COLUMN, "total_duty", "total_cost_without_ftz", "total_cost_with_ftz", "net_savings_to_brand"]
+    if breakeven_input:
+        column = f"breakeven_{breakeven_input}"
+        if top is not None:
+            top[column] = breakeven({name: top[name].to_numpy() for name in INPUT_FIELDS}, breakeven_input)
+        columns.append(column)
+    return {
+        "priced_rows": priced_rows,
+        "invalid_rows": invalid_rows,
+        "error_count": error_count,
+        "positive_rows": positive,
+        "total_net_savings": total_savings,
+        "top": top[columns].reset_index(drop=True) if top is not None else pd.DataFrame(columns=columns),
+        "errors": pd.DataFrame(errors, columns=["row", "error"]),
+    }
+
+
+def write_results_csv(source, filename: str, defaults: dict) -> bytes:
+    """Second streaming pass: every valid row with all inputs and line items."""
+    buffer = io.BytesIO()
+    header = True
+    for priced, _ in price_chunks(source, filename, defaults):
+        priced[["row", ID_COLUMN, *INPUT_FIELDS, *LINE_ITEMS]].to_csv(buffer, index=False, header=header)
+        header = False
+    return buffer.getvalue()
@@ -0,0 +1,217 @@
+###############################################
+# FTZ Savings – Multi-Year Cash-Flow Projection
+###############################################
+"""Month-by-month cash flows of running an FTZ versus not, with NPV, IRR and payback.
+
+The calculator prices one steady-state year and values duty deferral with a
+single closed-form line. Here the same cost lines are laid out per month
+over a 1–10 year horizon:
+
+- Duty is paid at entry without a zone. With one, duty on the goods that
+  enter commerce is paid ``avg_stock_days`` later (split across the two
+  months either side), and export / off-spec goods never pay it. The zone
+  is treated as a going concern: duty still deferred at the horizon is
+  reported as ``deferred_at_horizon``, not paid.
+- MPF is per shipment without a zone and one weekly consolidated entry with
+  it, each capped as in ``compute_savings``; broker and HMF likewise.
+- Import value grows ``growth_pct`` a year and the operating cost lines
+  escalate ``cost_escalation_pct`` a year, both compounded monthly.
+- For the first ``activation_months`` the FTZ cost lines are paid but no
+  goods go through the zone; over the next ``ramp_months`` the share that
+  does ramps linearly up to all of them.
+
+The deferral benefit comes out of discounting (at ``discount_rate_pct``,
+default the current interest rate) rather than ``total_wc_saving``. With no
+growth, activation, ramp or escalation, one year's undiscounted savings less
+``deferred_at_horizon`` equal ``net_savings_to_brand - total_wc_saving``.
+
+Every input may be a scalar or an array (one entry per prospect); all months
+of all prospects are evaluated as ``(prospects, months)`` arrays.
+"""
+
+import numpy as np
+
+from calculations import INPUT_DEFAULTS, INPUT_FIELDS, MPF_CAP
+
+MAX_YEARS = 10
+
+PROJECTION_DEFAULTS = {
+    "years": 5,
+    "growth_pct": 0.0,
+    "cost_escalation_pct": 0.0,
+    "activation_months": 0,
+    "ramp_months": 0,
+    "discount_rate_pct": None,
+}
+
+# Monthly IRR is searched between these rates (-99% to +1000% a month)
+_IRR_BRACKET = (-0.99, 10.0)
+_IRR_ITERATIONS = 60
+
+
+def _column(values: dict, name: str) -> np.ndarray:
+    return np.asarray(values[name], dtype=np.float64).reshape(-1, 1)
+
+
+def _deferred(amounts: np.ndarray, lag_months: np.ndarray) -> tuple:
+    """Move each month's amount ``lag_months`` later, splitting fractional lags.
+
+    Returns the shifted ``(n, months)`` amounts and, per row, the total
+    pushed past the horizon.
+    """
+    n, months = amounts.shape
+    whole = np.floor(lag_months).astype(np.int64)
+    frac = lag_months - whole
+    month = np.arange(months)
+    # One spare slot per row collects whatever falls after the last month
+    rows = np.arange(n).reshape(-1, 1) * (months + 1)
+    early = rows + np.minimum(month + whole, months)
+    late = rows + np.minimum(month + whole + 1, months)
+    size = n * (months + 1)
+    paid = np.bincount(early.ravel(), (amounts * (1 - frac)).ravel(), minlength=size)
+    paid += np.bincount(late.ravel(), (amounts * frac).ravel(), minlength=size)
+    paid = paid.reshape(n, months + 1)
+    return paid[:, :months], paid[:, months]
+
+
+def _npv(cash_flows: np.ndarray, monthly_rate: np.ndarray) -> np.ndarray:
+    """NPV of month-end flows (month 1 discounted once), by Horner's rule per row."""
+    v = 1 / (1 + monthly_rate)
+    total = np.zeros(cash_flows.shape[0])
+    for m in range(cash_flows.shape[1] - 1, -1, -1):
+        total = (total + cash_flows[:, m]) * v
+    return total
+
+
+def _conventional(cash_flows: np.ndarray) -> np.ndarray:
+    """Rows whose first non-zero flow is negative and whose sign changes once."""
+    signs = np.sign(cash_flows)
+    # Carry the last non-zero sign forward over zero months
+    last = np.maximum.accumulate(np.where(signs != 0, np.arange(signs.shape[1]), 0), axis=1)
+    signs = np.take_along_axis(signs, last, axis=1)
+    changes = (np.diff(signs, axis=1) != 0).sum(axis=1) - (signs[:, 0] == 0)
+    first = signs[np.arange(len(signs)), np.argmax(signs != 0, axis=1)]
+    return (first < 0) & (changes == 1)
+
+
+def irr(cash_flows: np.ndarray) -> np.ndarray:
+    """Annualized IRR per row of monthly flows.
+
+    Only a conventional profile, an outlay followed by returns (one change
+    of sign, negative first), has a single meaningful IRR; every other row
+    gets NaN. The root is found by bisection on the monthly rate.
+    """
+    cash_flows = np.atleast_2d(cash_flows)
+    n = cash_flows.shape[0]
+    low = np.full(n, _IRR_BRACKET[0])
+    high = np.full(n, _IRR_BRACKET[1])
+    npv_low = _npv(cash_flows, low)
+    npv_high = _npv(cash_flows, high)
+    valid = _conventional(cash_flows) & (np.sign(npv_low) != np.sign(npv_high))
+    for _ in range(_IRR_ITERATIONS):
+        mid = (low + high) / 2
+        npv_mid = _npv(cash_flows, mid)
+        same = np.sign(npv_mid) == np.sign(npv_low)
+        low = np.where(same, mid, low)
+        npv_low = np.where(same, npv_mid, npv_low)
+        high = np.where(same, high, mid)
+    monthly = (low + high) / 2
+    return np.where(valid, (1 + monthly) ** 12 - 1, np.nan)
+
+
+def project_cash_flows(
+    inputs=None,
+    years: int = PROJECTION_DEFAULTS["years"],
+    growth_pct=PROJECTION_DEFAULTS["growth_pct"],
+    cost_escalation_pct=PROJECTION_DEFAULTS["cost_escalation_pct"],
+    activation_months=PROJECTION_DEFAULTS["activation_months"],
+    ramp_months=PROJECTION_DEFAULTS["ramp_months"],
+    discount_rate_pct=PROJECTION_DEFAULTS["discount_rate_pct"],
+) -> dict:
+    """Monthly costs with and without an FTZ, net savings and their NPV, IRR and payback.
+
+    ``inputs`` is the calculator's (scalars or per-prospect arrays, defaults
+    filled in). The projection knobs may also be per-prospect arrays; only
+    ``years`` is shared. Series come back as ``(prospects, months)`` arrays
+    and the summary figures as ``(prospects,)``; with all-scalar inputs they
+    are 1-D series and plain floats. ``payback_month`` is the first month
+    cumulative savings reach zero, NaN if they never do.
+    """
+    if not 1 <= years <= MAX_YEARS:
+        raise ValueError(f"years must be between 1 and {MAX_YEARS}")
+    values = {**INPUT_DEFAULTS, **(inputs or {})}
+    if discount_rate_pct is None:
+        discount_rate_pct = values["current_interest_rate"]
+    scalar = all(np.ndim(values[name]) == 0 for name in INPUT_FIELDS) and all(
+        np.ndim(v) == 0 for v in (growth_pct, cost_escalation_pct, activation_months, ramp_months, discount_rate_pct)
+    )
+
+    x = {name: _column(values, name) for name in INPUT_FIELDS}
+    growth = np.asarray(growth_pct, dtype=np.float64).reshape(-1, 1) / 100
+    escalation = np.asarray(cost_escalation_pct, dtype=np.float64).reshape(-1, 1) / 100
+    activation_months = np.asarray(activation_months, dtype=np.float64).reshape(-1, 1)
+    ramp_months = np.asarray(ramp_months, dtype=np.float64).reshape(-1, 1)
+    discount = np.asarray(discount_rate_pct, dtype=np.float64).reshape(-1) / 100
+
+    months = 12 * int(years)
+    columns = (*x.values(), growth, escalation, activation_months, ramp_months, discount)
+    n = np.broadcast_shapes(*(v.shape[:1] for v in columns))[0]
+    month = np.arange(1, months + 1, dtype=np.float64)
+    elapsed_years = (month - 1) / 12
+
+    shipments = x["shipments_per_week"]
+    shipment_value = x["avg_import_value"] * (1 + growth) ** elapsed_years
+    shipments_per_month = shipments * 52 / 12
+    import_value = shipments_per_month * shipment_value
+    mpf_rate = x["mpf_pct"] / 100
+    # HMF on one week's imports a year, exactly as the calculator charges it
+    hmf = shipments * shipment_value * x["hmf_pct"] / 100 / 12
+    in_zone = np.clip((month - activation_months) / np.maximum(ramp_months, 1), 0, 1)
+    in_zone = np.broadcast_to(in_zone, (n, months))
+    escalator = (1 + escalation) ** elapsed_years
+
+    # Without a zone: duty at entry, MPF and a broker fee per shipment
+    duty_no_ftz = np.broadcast_to(import_value * x["duty_pct"] / 100, (n, months))
+    mpf_no_ftz = np.minimum(shipment_value * mpf_rate, MPF_CAP) * shipments_per_month
+    broker_hmf_no_ftz = shipments_per_month * x["broker_cost"] + hmf
+    ops_no_ftz = (x["noftz_consult"] + x["noftz_mgmt"] + x["noftz_software"] + x["noftz_bond"]) / 12 * escalator
+    cost_without_ftz = duty_no_ftz + mpf_no_ftz + broker_hmf_no_ftz + ops_no_ftz
+
+    # Through the zone: duty deferred until goods enter commerce, one weekly entry
+    duty_free = (x["export_pct"] + x["offspec_pct"]) / 100
+    zone_duty, deferred_at_horizon = _deferred(duty_no_ftz * in_zone * (1 - duty_free), np.broadcast_to(x["avg_stock_days"] * 12 / 365, (n, 1)))
+    duty_with_ftz = zone_duty + duty_no_ftz * (1 - in_zone)
+    mpf_weekly = np.minimum(shipments * shipment_value * mpf_rate, MPF_CAP) * 52 / 12
+    mpf_with_ftz = in_zone * mpf_weekly + (1 - in_zone) * mpf_no_ftz
+    broker_hmf_with_ftz = in_zone * (52 / 12 * x["broker_cost"] + hmf) + (1 - in_zone) * broker_hmf_no_ftz
+    ops_with_ftz = (x["ftz_consult"] + x["ftz_mgmt"] + x["ftz_software"] + x["ftz_bond"]) / 12 * escalator
+    cost_with_ftz = duty_with_ftz + mpf_with_ftz + broker_hmf_with_ftz + ops_with_ftz
+
+    savings = cost_without_ftz - cost_with_ftz
+    cumulative = np.cumsum(savings, axis=1)
+    monthly_rate = np.broadcast_to((1 + discount) ** (1 / 12) - 1, (n,))
+    paid_back = cumulative >= 0
+    payback = np.where(paid_back.any(axis=1), paid_back.argmax(axis=1) + 1.0, np.nan)
+
+    results = {
+        "month": month,
+        "cost_without_ftz": cost_without_ftz,
+        "cost_with_ftz": cost_with_ftz,
+        "duty_no_ftz": duty_no_ftz,
+        "duty_with_ftz": duty_with_ftz,
+        "mpf_no_ftz": np.broadcast_to(mpf_no_ftz, (n, months)),
+        "mpf_with_ftz": mpf_with_ftz,
+        "savings": savings,
+        "cumulative_savings": cumulative,
+        "total_savings": cumulative[:, -1],
+        "deferred_at_horizon": deferred_at_horizon,
+        "npv": _npv(savings, monthly_rate),
+        "irr": irr(savings),
+        "payback_month": payback,
+    }
+    if scalar:
+        return {
+            name: value if name == "month" else (float(value[0]) if value.ndim == 1 else value[0])
+            for name, value in results.items()
+        }
+    return results
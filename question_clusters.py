@@ -0,0 +1,427 @@
+###############################################
+# FTZ Savings – Unanswered Question Clusters
+###############################################
+"""Group paraphrased unanswered chatbot questions with MinHash LSH.
+
+Every question the FAQ can't answer is logged as its own ``chat_question``
+row. ``QuestionClusters`` folds those rows into clusters of near-duplicates
+so they can be reviewed a cluster at a time:
+
+- A question's shingles are its stemmed, stop-word-free tokens (the FAQ
+  matcher's ``tokenize``), so "How do I activate an FTZ?" and "how to
+  activate ftz" are the same set. Exact repeats only bump a count.
+- Each new question gets a ``NUM_PERM``-value MinHash signature and is
+  hashed into ``BANDS`` LSH buckets. A question sharing a bucket with an
+  earlier one becomes a candidate pair; candidates whose signatures agree on
+  at least ``SIMILARITY`` of their values (estimated Jaccard) are merged.
+  Nothing is ever compared with the whole set, so the cost per question is
+  constant however many are stored.
+- Questions, signatures, buckets (one representative question per bucket)
+  and cluster membership live in SQLite; only one batch of ``BATCH_SIZE``
+  questions is held in memory, so a backfill of millions of questions runs
+  in bounded memory on one machine.
+
+Like ``AnalyticsCache``, ``refresh`` reads only the log rows appended since
+its cursor. ``clusters`` lists the biggest clusters with a suggestion for
+each: the FAQ key it is closest to (add the questions as aliases) or a
+candidate key for a new entry.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from analytics import PAGE_ROWS, column_letter
+from faq_matcher import STOPWORDS, stem
+
+CLUSTER_PATH = os.environ.get("FTZ_CLUSTER_DB", "var/question_clusters.sqlite3")
+
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs around 0.5 Jaccard and up become candidates
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+# Minimum share of equal signature values for a candidate pair to merge
+SIMILARITY = 0.5
+BATCH_SIZE = 10_000
+# SQLite page cache; with one batch in memory this is most of the job's footprint
+CACHE_MB = 64
+
+# A cluster whose best FAQ score reaches this is probably a missing alias
+ALIAS_SCORE = 0.15
+
+_RNG = np.random.default_rng(20240611)
+# Multiply-shift hashes over 64-bit token hashes; the odd multipliers keep them universal
+_MULTIPLIERS = _RNG.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _RNG.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _RNG.integers(1, 2 ** 63, ROWS_PER_BAND, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+# The matcher's tokens: runs of lowercase letters and digits
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+@lru_cache(maxsize=1 << 16)
+def _token_hash(token: str) -> int:
+    # Stable across processes, unlike hash(), so stored signatures stay valid
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+
+
+# Questions repeat the same few hundred words; stem each once
+_stem = lru_cache(maxsize=1 << 16)(stem)
+
+
+def shingles(question: str) -> set:
+    """The question's ``tokenize`` terms, as a set."""
+    return {_stem(t) for t in _WORD.findall(question.lower()) if t not in STOPWORDS}
+
+
+def signatures(shingle_sets: list) -> np.ndarray:
+    """``(len(shingle_sets), NUM_PERM)`` uint32 MinHash signatures; every set must be non-empty."""
+    sizes = np.fromiter((len(s) for s in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+    hashes = np.fromiter(
+        (_token_hash(t) for s in shingle_sets for t in s), dtype=np.uint64, count=int(sizes.sum())
+    )
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    with np.errstate(over="ignore"):
+        permuted = (hashes[:, None] * _MULTIPLIERS + _OFFSETS) >> np.uint64(32)
+    return np.minimum.reduceat(permuted, starts, axis=0).astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray) -> np.ndarray:
+    """``(n, BANDS)`` int64 bucket keys, one per band of ``ROWS_PER_BAND`` values."""
+    rows = signature.astype(np.uint64).reshape(len(signature), BANDS, ROWS_PER_BAND)
+    with np.errstate(over="ignore"):
+        keys = (rows * _BAND_MIX).sum(axis=2, dtype=np.uint64)
+    return keys.view(np.int64)
+
+
+def candidate_key(question: str) -> str:
+    """A key in the FAQ's style: the question's words without stop words."""
+    words = [w for w in _WORD.findall(question.lower()) if w not in STOPWORDS and (len(w) > 1 or w.isdigit())]
+    return " ".join(words) or normalize(question)
+
+
+class QuestionClusters:
+    def __init__(self, path: str = CLUSTER_PATH, batch_size: int = BATCH_SIZE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Everything here can be rebuilt from the sheet, so a lost commit is cheap
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA cache_size=-{CACHE_MB * 1024}")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                text TEXT NOT NULL UNIQUE,
+                asked INTEGER NOT NULL,
+                cluster INTEGER NOT NULL,
+                signature BLOB
+            );
+            CREATE INDEX IF NOT EXISTS questions_cluster ON questions (cluster);
+            CREATE TABLE IF NOT EXISTS clusters (
+                id INTEGER PRIMARY KEY,
+                size INTEGER NOT NULL,
+                asked INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS clusters_asked ON clusters (asked);
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                question INTEGER NOT NULL,
+                PRIMARY KEY (band, key)
+            ) WITHOUT ROWID;
+            CREATE TEMP TABLE batch (text TEXT PRIMARY KEY, asked INTEGER NOT NULL);
+            CREATE TEMP TABLE probe (band INTEGER, key INTEGER, question INTEGER);
+            CREATE TEMP TABLE moves (old INTEGER PRIMARY KEY, new INTEGER);
+            CREATE INDEX temp.moves_new ON moves (new);
+            """
+        )
+
+    # -----------------------------
+    # INGESTING
+    # -----------------------------
+    def cursor(self) -> int:
+        """Last log sheet row already clustered (1 is the header)."""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'cursor'").fetchone()
+        return int(row[0]) if row else 1
+
+    def refresh(self, sheet, page_rows: int = PAGE_ROWS) -> int:
+        """Cluster the unanswered questions logged since the last refresh; returns how many."""
+        header = [cell or "" for cell in sheet.row_values(1)]
+        if "chat_question" not in header:
+            raise ValueError("Sheet has no chat_question column")
+        question_at = header.index("chat_question")
+        cta_at = header.index("cta_clicked") if "cta_clicked" in header else None
+        last_column = column_letter(len(header))
+
+        added = 0
+        with self._lock:
+            while True:
+                start = self.cursor() + 1
+                rows = sheet.get(f"A{start}:{last_column}{start + page_rows - 1}")
+                questions = [
+                    row[question_at] for row in rows
+                    if question_at < len(row) and row[question_at]
+                    and (cta_at is None or cta_at >= len(row) or row[cta_at] != "Yes")
+                ]
+                added += self._add(questions, cursor=start + len(rows) - 1 if rows else None)
+                if len(rows) < page_rows:
+                    return added
+
+    def add(self, questions) -> int:
+        """Cluster questions from any iterable (a backfill file, say); returns how many."""
+        added = 0
+        batch = []
+        with self._lock:
+            for question in questions:
+                batch.append(question)
+                if len(batch) == self.batch_size:
+                    added += self._add(batch)
+                    batch = []
+            return added + self._add(batch)
+
+    def reset(self):
+        """Forget every question; the next refresh re-reads the sheet from row 2."""
+        with self._lock:
+            self._conn.executescript(
+                "BEGIN; DELETE FROM meta; DELETE FROM questions; DELETE FROM clusters;"
+                " DELETE FROM buckets; COMMIT;"
+            )
+
+    def _add(self, questions: list, cursor: int = None) -> int:
+        # Pages from the sheet can exceed a batch; split them so memory stays bounded
+        starts = range(0, len(questions), self.batch_size) or [0]
+        for start in starts:
+            last = start == starts[-1]
+            self._add_batch(questions[start:start + self.batch_size], cursor if last else None)
+        return len(questions)
+
+    def _add_batch(self, questions: list, cursor: int = None):
+        counts = Counter(text for text in map(normalize, questions) if text)
+        conn = self._conn
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM batch")
+            conn.executemany("INSERT INTO batch VALUES (?, ?)", counts.items())
+            # Repeats of stored questions just count again
+            repeats = conn.execute(
+                "SELECT q.id, q.cluster, q.text, b.asked FROM batch b JOIN questions q ON q.text = b.text"
+            ).fetchall()
+            if repeats:
+                conn.executemany("UPDATE questions SET asked = asked + ? WHERE id = ?", [(a, q) for q, _, _, a in repeats])
+                conn.executemany("UPDATE clusters SET asked = asked + ? WHERE id = ?", [(a, c) for _, c, _, a in repeats])
+                for _, _, text, _ in repeats:
+                    del counts[text]
+            new = list(counts.items())
+            if new:
+                self._insert(new)
+            if cursor is not None:
+                conn.execute(
+                    "INSERT INTO meta VALUES ('cursor', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (cursor,),
+                )
+
+    def _insert(self, new: list):
+        conn = self._conn
+        sets = [shingles(text) for text, _ in new]
+        hashed = [i for i, s in enumerate(sets) if s]
+        sig = np.zeros((len(new), NUM_PERM), dtype=np.uint32)
+        if hashed:
+            sig[hashed] = signatures([sets[i] for i in hashed])
+
+        first = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]) + 1
+        ids = np.arange(first, first + len(new))
+        conn.executemany(
+            "INSERT INTO questions VALUES (?, ?, ?, ?, ?)",
+            [
+                (int(qid), text, asked, int(qid), sig[i].tobytes() if sets[i] else None)
+                for i, (qid, (text, asked)) in enumerate(zip(ids, new))
+            ],
+        )
+        conn.executemany("INSERT INTO clusters VALUES (?, 1, ?)", [(int(q), a) for q, (_, a) in zip(ids, new)])
+        if not hashed:
+            return
+
+        # The first question into a bucket represents it; later ones are candidates against it
+        keys = band_keys(sig[hashed])
+        probe_ids = np.repeat(ids[hashed], BANDS)
+        probe = list(zip(np.tile(np.arange(BANDS), len(hashed)).tolist(), keys.ravel().tolist(), probe_ids.tolist()))
+        conn.execute("DELETE FROM probe")
+        conn.executemany("INSERT INTO probe VALUES (?, ?, ?)", probe)
+        conn.execute("INSERT OR IGNORE INTO buckets SELECT band, key, question FROM probe ORDER BY band, key, question")
+        pairs = conn.execute(
+            "SELECT p.question, q.cluster, q.signature FROM"
+            " (SELECT DISTINCT p.question, b.question AS rep FROM probe p"
+            "  JOIN buckets b ON b.band = p.band AND b.key = p.key WHERE b.question <> p.question) p"
+            " JOIN questions q ON q.id = p.rep"
+        ).fetchall()
+        if not pairs:
+            return
+
+        questions, rep_clusters, rep_signatures = zip(*pairs)
+        own = sig[np.asarray(questions) - first]
+        reps = np.frombuffer(b"".join(rep_signatures), dtype=np.uint32).reshape(len(pairs), NUM_PERM)
+        agree = (own == reps).mean(axis=1) >= SIMILARITY
+        # A question inserted this batch is still its own cluster
+        self._merge([(q, c) for q, c, ok in zip(questions, rep_clusters, agree.tolist()) if ok])
+
+    def _merge(self, merges: list):
+        """Union the two clusters of each ``(cluster, cluster)`` pair, smaller into larger."""
+        if not merges:
+            return
+        conn = self._conn
+        parent = {}
+
+        def find(x):
+            root = x
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while x != root:
+                parent[x], x = root, parent.get(x, x)
+            return root
+
+        for a, b in merges:
+            a, b = find(a), find(b)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+        members = {*parent, *map(find, parent)}
+        conn.execute("DELETE FROM moves")
+        conn.executemany("INSERT INTO moves (old) VALUES (?)", [(c,) for c in members])
+        groups = {}
+        for cluster, size in conn.execute("SELECT id, size FROM clusters WHERE id IN (SELECT old FROM moves)"):
+            groups.setdefault(find(cluster), []).append((size, -cluster))
+        # Each group keeps its biggest cluster's id, so the fewest questions move
+        keep = {root: -max(members)[1] for root, members in groups.items()}
+        conn.executemany(
+            "UPDATE moves SET new = ? WHERE old = ?", [(keep[find(c)], c) for c in members]
+        )
+        conn.execute("DELETE FROM moves WHERE old = new")
+        conn.execute(
+            "UPDATE questions SET cluster = (SELECT new FROM moves WHERE old = questions.cluster)"
+            " WHERE cluster IN (SELECT old FROM moves)"
+        )
+        conn.execute(
+            "UPDATE clusters SET"
+            " size = size + (SELECT SUM(c.size) FROM moves m JOIN clusters c ON c.id = m.old WHERE m.new = clusters.id),"
+            " asked = asked + (SELECT SUM(c.asked) FROM moves m JOIN clusters c ON c.id = m.old WHERE m.new = clusters.id)"
+            " WHERE id IN (SELECT new FROM moves)"
+        )
+        conn.execute("DELETE FROM clusters WHERE id IN (SELECT old FROM moves)")
+
+    # -----------------------------
+    # REVIEW
+    # -----------------------------
+    def stats(self) -> dict:
+        questions, asked = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(asked), 0) FROM questions").fetchone()
+        clusters, multi = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size > 1), 0) FROM clusters").fetchone()
+        return {
+            "questions_asked": asked,
+            "distinct_questions": questions,
+            "clusters": clusters,
+            "clusters_with_paraphrases": multi,
+            "cursor": self.cursor(),
+        }
+
+    def members(self, cluster: int, limit: int = 10) -> list:
+        """``(question, times asked)`` in a cluster, most asked first."""
+        return self._conn.execute(
+            "SELECT text, asked FROM questions WHERE cluster = ? ORDER BY asked DESC, id LIMIT ?", (cluster, limit)
+        ).fetchall()
+
+    def clusters(self, matcher=None, limit: int = 20, examples: int = 5) -> list:
+        """The ``limit`` most-asked clusters, each with a suggestion from ``matcher``.
+
+        Each of the cluster's top ``examples`` questions votes for its closest
+        FAQ key (``FaqMatcher.best``) with its score; the winner's mean score
+        over the examples decides the suggestion: ``"answered"`` if it now
+        clears the matcher's threshold, ``"alias"`` if it reaches
+        ``ALIAS_SCORE``, otherwise ``"new"`` with ``candidate_key`` built from
+        the most-asked question.
+        """
+        rows = self._conn.execute(
+            "SELECT id, size, asked FROM clusters ORDER BY asked DESC, size DESC, id LIMIT ?", (limit,)
+        ).fetchall()
+        result = []
+        for cluster, size, asked in rows:
+            top = self.members(cluster, examples)
+            suggestion = {"suggestion": "new", "faq_key": None, "score": 0.0}
+            if matcher is not None:
+                # Keys only one paraphrase happens to brush against are averaged away
+                votes = Counter()
+                for text, _ in top:
+                    key, score = matcher.best(text)
+                    if key is not None:
+                        votes[key] += score / len(top)
+                key, score = votes.most_common(1)[0] if votes else (None, 0.0)
+                if key is not None and score >= ALIAS_SCORE:
+                    status = "answered" if score >= matcher.threshold else "alias"
+                    suggestion = {"suggestion": status, "faq_key": key, "score": score}
+            result.append({
+                "cluster": cluster,
+                "asked": asked,
+                "distinct_questions": size,
+                "example": top[0][0],
+                "others": [text for text, _ in top[1:]],
+                **suggestion,
+                "candidate_key": candidate_key(top[0][0]),
+            })
+        return result
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    from knowledge_base import FAQ_PATH, KnowledgeBaseStore
+    from sheet_logging import LOCAL_SHEET_PATH, LocalSheet
+
+    parser = argparse.ArgumentParser(description="Cluster unanswered chatbot questions.")
+    parser.add_argument("--db", default=CLUSTER_PATH)
+    parser.add_argument("--csv", default=LOCAL_SHEET_PATH, help="log sheet exported as CSV (default: the live sheet)")
+    parser.add_argument("--questions", help="text file with one question per line to backfill")
+    parser.add_argument("--faq", default=FAQ_PATH)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--reset", action="store_true", help="forget stored questions first")
+    args = parser.parse_args(argv)
+
+    clusters = QuestionClusters(args.db)
+    if args.reset:
+        clusters.reset()
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            added = clusters.add(line.rstrip("\n") for line in f)
+    else:
+        if args.csv:
+            sheet = LocalSheet(args.csv)
+        else:
+            from api import open_log_sheet
+
+            sheet = open_log_sheet()
+        added = clusters.refresh(sheet)
+    print(f"{added:,} questions added; {json.dumps(clusters.stats())}")
+
+    matcher = KnowledgeBaseStore(args.faq).matcher()
+    for c in clusters.clusters(matcher, limit=args.top):
+        target = c["faq_key"] if c["suggestion"] != "new" else c["candidate_key"]
+        print(f"{c['asked']:>6,}  {c['distinct_questions']:>5,}  {c['suggestion']:<8} {target!r:<45} {c['example']}")
+
+
+if __name__ == "__main__":
+    main()
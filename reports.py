@@ -0,0 +1,349 @@
+###############################################
+# FTZ Savings – PDF / Excel Reports
+###############################################
+"""Downloadable savings reports, built in memory on a small worker pool.
+
+A report holds the KPI cards, the full line-item comparison (with / without
+FTZ, line by line) and the assumptions behind it. Builds run on a shared
+thread pool and are cached by report kind and ``input_key``, so the app can
+start them as soon as results are on screen and a download just collects the
+bytes. The portfolio export streams priced chunks into a write-only workbook,
+so its memory doesn't grow with the number of rows.
+"""
+
+import io
+import math
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from calculations import INPUT_FIELDS, INPUT_LABELS, LINE_ITEMS, cached_savings, input_key
+from portfolio import ID_COLUMN, price_chunks
+
+REPORT_WORKERS = 2
+REPORT_CACHE_SIZE = 64
+
+TITLE = "FTZ Savings - Agentic AI Calculator"
+DISCLAIMER = ("This calculator provides directional estimates only and does not constitute "
+              "financial, legal, or compliance advice.")
+
+MONEY_FORMAT = '"$"#,##0;("$"#,##0)'
+
+# Control characters an XLSX cell can't hold (openpyxl's ILLEGAL_CHARACTERS_RE)
+ILLEGAL_CHARACTERS_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+_pool = None
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _money(x: float) -> str:
+    return f"(${abs(x):,.0f})" if x < 0 else f"${x:,.0f}"
+
+
+def kpis(results: dict) -> list:
+    return [
+        ("Total Duty", results["total_duty"]),
+        ("Cost With FTZ", results["total_cost_with_ftz"]),
+        ("Cost Without FTZ", results["total_cost_without_ftz"]),
+        ("Net Savings", results["net_savings_to_brand"]),
+    ]
+
+
+def comparison_rows(inputs: dict, results: dict) -> list:
+    """``(category, without FTZ, with FTZ, FTZ savings)`` for every line item."""
+    r = results
+    fees_no_ftz = r["total_net_duty_no_ftz"] + r["mpf_no_ftz"] + r["broker_hmf_no_ftz"]
+    fees_with_ftz = r["total_net_duty_with_ftz"] + r["mpf_with_ftz"] + r["broker_hmf_with_ftz"]
+    operating_with_ftz = r["cost_with_ftz"] - r["total_wc_saving"]
+    rows = [
+        ("Total Duty", r["total_duty"], r["total_duty"], 0.0),
+        ("Duty Saved of Exported Goods", 0.0, -r["duty_saved_export"], r["duty_saved_export"]),
+        ("Duty Saved on Non-Spec Goods", 0.0, -r["duty_saved_offspec"], r["duty_saved_offspec"]),
+        ("Total Net Duty", r["total_net_duty_no_ftz"], r["total_net_duty_with_ftz"],
+         r["total_net_duty_no_ftz"] - r["total_net_duty_with_ftz"]),
+        ("Total MPF", r["mpf_no_ftz"], r["mpf_with_ftz"], r["mpf_no_ftz"] - r["mpf_with_ftz"]),
+        ("Total Broker Costs + HMF", r["broker_hmf_no_ftz"], r["broker_hmf_with_ftz"],
+         r["broker_hmf_no_ftz"] - r["broker_hmf_with_ftz"]),
+        ("Totals", fees_no_ftz, fees_with_ftz, fees_no_ftz - fees_with_ftz),
+    ]
+    for label, without, with_ in (
+        ("FTZ Consulting", "noftz_consult", "ftz_consult"),
+        ("FTZ Management", "noftz_mgmt", "ftz_mgmt"),
+        ("FTZ Software Fee", "noftz_software", "ftz_software"),
+        ("FTZ Operator Bond", "noftz_bond", "ftz_bond"),
+    ):
+        rows.append((label, float(inputs[without]), float(inputs[with_]), float(inputs[without]) - float(inputs[with_])))
+    rows += [
+        ("Total Operating Costs", r["cost_without_ftz"], operating_with_ftz, r["cost_without_ftz"] - operating_with_ftz),
+        ("Net Savings to Brand", r["total_cost_without_ftz"], r["total_cost_with_ftz"], r["net_savings_to_brand"]),
+    ]
+    return rows
+
+
+def assumptions(inputs: dict) -> list:
+    return [(INPUT_LABELS[name], float(inputs[name])) for name in INPUT_FIELDS]
+
+
+# -----------------------------
+# BUILDERS
+# -----------------------------
+def build_pdf(inputs: dict) -> bytes:
+    # fpdf and openpyxl load on the first report, not with the app
+    from fpdf import FPDF
+
+    results = cached_savings(inputs)
+    pdf = FPDF(format="Letter")
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    width = pdf.w - pdf.l_margin - pdf.r_margin
+
+    pdf.set_font("Arial", "B", 15)
+    pdf.cell(0, 9, TITLE, ln=1, align="C")
+    pdf.set_font("Arial", "", 9)
+    pdf.set_text_color(71, 85, 105)
+    pdf.cell(0, 5, f"Generated {datetime.now():%Y-%m-%d %H:%M}", ln=1, align="C")
+    pdf.ln(4)
+
+    card = width / 4
+    pdf.set_fill_color(15, 23, 42)
+    pdf.set_text_color(255, 255, 255)
+    pdf.set_font("Arial", "", 9)
+    for label, _ in kpis(results):
+        pdf.cell(card, 7, label, align="C", fill=True)
+    pdf.ln()
+    pdf.set_font("Arial", "B", 12)
+    for label, value in kpis(results):
+        if label == "Net Savings":
+            pdf.set_text_color(*((34, 197, 94) if value >= 0 else (239, 68, 68)))
+        pdf.cell(card, 9, _money(value), align="C", fill=True)
+    pdf.ln(14)
+
+    pdf.set_text_color(15, 23, 42)
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 7, "FTZ Cost Comparison", ln=1)
+    columns = (width * 0.40, width * 0.20, width * 0.20, width * 0.20)
+    pdf.set_font("Arial", "B", 9)
+    pdf.set_fill_color(226, 232, 240)
+    for w, heading in zip(columns, ("Category", "Without FTZ ($)", "With FTZ ($)", "FTZ Savings ($)")):
+        pdf.cell(w, 7, heading, border=1, align="L" if heading == "Category" else "R", fill=True)
+    pdf.ln()
+    for category, *values in comparison_rows(inputs, results):
+        bold = category in ("Totals", "Total Operating Costs", "Net Savings to Brand")
+        pdf.set_font("Arial", "B" if bold else "", 9)
+        pdf.cell(columns[0], 6, category, border=1)
+        for w, value in zip(columns[1:], values):
+            pdf.cell(w, 6, _money(value), border=1, align="R")
+        pdf.ln()
+    pdf.ln(6)
+
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 7, "Assumptions", ln=1)
+    pdf.set_font("Arial", "", 9)
+    for label, value in assumptions(inputs):
+        pdf.cell(width * 0.6, 6, label, border=1)
+        pdf.cell(width * 0.4, 6, f"{value:,.2f}".rstrip("0").rstrip("."), border=1, align="R", ln=1)
+    pdf.ln(6)
+
+    pdf.set_font("Arial", "I", 8)
+    pdf.set_text_color(71, 85, 105)
+    pdf.multi_cell(0, 4, f"Disclaimer: {DISCLAIMER}")
+    # fpdf 1.7 returns the document as a latin-1 str
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def _cell(sheet, value, bold: bool = False, money: bool = False, fill: bool = False):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+
+    cell = WriteOnlyCell(sheet, value=value)
+    if bold:
+        cell.font = Font(bold=True)
+    if money:
+        cell.number_format = MONEY_FORMAT
+    if fill:
+        cell.fill = PatternFill("solid", fgColor="E2E8F0")
+    return cell
+
+
+def build_xlsx(inputs: dict) -> bytes:
+    from openpyxl import Workbook
+
+    results = cached_savings(inputs)
+    workbook = Workbook(write_only=True)
+
+    summary = workbook.create_sheet("Summary")
+    summary.column_dimensions["A"].width = 24
+    summary.column_dimensions["B"].width = 18
+    summary.append([_cell(summary, TITLE, bold=True)])
+    summary.append([f"Generated {datetime.now():%Y-%m-%d %H:%M}"])
+    summary.append([])
+    for label, value in kpis(results):
+        summary.append([_cell(summary, label, bold=True), _cell(summary, value, money=True)])
+    summary.append([])
+    summary.append([DISCLAIMER])
+
+    comparison = workbook.create_sheet("Comparison")
+    comparison.column_dimensions["A"].width = 32
+    for column in "BCD":
+        comparison.column_dimensions[column].width = 18
+    comparison.append([_cell(comparison, h, bold=True, fill=True)
+                       for h in ("Category", "Without FTZ ($)", "With FTZ ($)", "FTZ Savings ($)")])
+    for category, *values in comparison_rows(inputs, results):
+        comparison.append([_cell(comparison, category)] + [_cell(comparison, v, money=True) for v in values])
+
+    sheet = workbook.create_sheet("Assumptions")
+    sheet.column_dimensions["A"].width = 32
+    sheet.append([_cell(sheet, "Input", bold=True, fill=True), _cell(sheet, "Value", bold=True, fill=True)])
+    for label, value in assumptions(inputs):
+        sheet.append([label, value])
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+BUILDERS = {"pdf": build_pdf, "xlsx": build_xlsx}
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    # Style 1 is the bold header
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+
+# SpreadsheetML has no literal for infinity; Excel shows an overflow as #NUM!
+_NUM_ERROR = '<c t="e"><v>#NUM!</v></c>'
+
+
+def _text_cell(value, style: str = "") -> str:
+    text = escape(ILLEGAL_CHARACTERS_RE.sub("", str(value)))
+    return f'<c t="inlineStr"{style}><is><t>{text}</t></is></c>'
+
+
+def _column_cells(column: pd.Series) -> list:
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return [
+            f"<c><v>{v!r}</v></c>" if math.isfinite(v) else _NUM_ERROR if v == v else "<c/>"
+            for v in column.to_numpy(dtype=np.float64).tolist()
+        ]
+    return [_text_cell(v) for v in column.tolist()]
+
+
+def stream_xlsx(columns: list, frames, sheet_name: str = "Sheet1") -> bytes:
+    """One-sheet workbook from an iterable of DataFrames, written as it goes.
+
+    openpyxl spends ~8 µs per cell even in write-only mode; a portfolio
+    export is millions of cells, so the sheet XML is produced here a chunk
+    at a time, one vectorized pass per column, straight into the zip.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in _XLSX_PARTS.items():
+            archive.writestr(name, xml)
+        archive.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        with archive.open("xl/worksheets/sheet1.xml", "w") as raw:
+            sheet = io.TextIOWrapper(raw, encoding="utf-8")
+            sheet.write(_SHEET_START)
+            sheet.write("<row>" + "".join(_text_cell(c, ' s="1"') for c in columns) + "</row>")
+            for frame in frames:
+                cells = [_column_cells(frame[c]) for c in columns]
+                sheet.write("".join(f"<row>{''.join(row)}</row>" for row in zip(*cells)))
+            sheet.write("</sheetData></worksheet>")
+            sheet.flush()
+            sheet.detach()
+    return buffer.getvalue()
+
+
+def write_results_xlsx(source, filename: str, defaults: dict) -> bytes:
+    """Every valid portfolio row with inputs and line items, streamed chunk by chunk."""
+    columns = ["row", ID_COLUMN, *INPUT_FIELDS, *LINE_ITEMS]
+    return stream_xlsx(columns, (priced for priced, _ in price_chunks(source, filename, defaults)), "Portfolio")
+
+
+# -----------------------------
+# WORKER POOL + CACHE
+# -----------------------------
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="ftz-report")
+    return _pool
+
+
+def report_future(kind: str, inputs: dict):
+    """Future for the ``kind`` report of ``inputs``; identical inputs share one build."""
+    key = (kind, input_key(inputs))
+    with _lock:
+        future = _cache.get(key)
+        if future is not None and not (future.done() and future.exception() is not None):
+            _cache.move_to_end(key)
+            return future
+        future = _executor().submit(BUILDERS[kind], dict(zip(INPUT_FIELDS, key[1])))
+        _cache[key] = future
+        while len(_cache) > REPORT_CACHE_SIZE:
+            _cache.popitem(last=False)
+        return future
+
+
+def report_bytes(kind: str, inputs: dict, timeout: float = 60.0) -> bytes:
+    return report_future(kind, inputs).result(timeout)
@@ -0,0 +1,110 @@
+###############################################
+# FTZ Savings – Sensitivity Analysis
+###############################################
+"""What-if sweeps around the current inputs, evaluated in one vectorized pass.
+
+Each swept input is moved from ``-swing`` to ``+swing`` (relative to its
+current value) while everything else stays put; every scenario in the grid
+goes through ``compute_savings`` together. Grids are memoized by the input
+tuple, so flipping between settings never recomputes a grid already seen.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from calculations import INPUT_BOUNDS, INPUT_FIELDS, compute_savings, input_key
+
+SWEEP_INPUTS = (
+    "shipments_per_week",
+    "avg_import_value",
+    "export_pct",
+    "offspec_pct",
+    "duty_pct",
+    "broker_cost",
+    "current_interest_rate",
+    "avg_stock_days",
+    "ftz_consult",
+    "ftz_mgmt",
+    "ftz_software",
+    "ftz_bond",
+)
+
+OUTPUTS = ("net_savings_to_brand", "total_cost_with_ftz", "total_cost_without_ftz")
+
+
+def _clip(name: str, values: np.ndarray) -> np.ndarray:
+    low, high = INPUT_BOUNDS.get(name, (None, None))
+    return np.clip(values, low, high) if low is not None or high is not None else values
+
+
+def _evaluate(base: dict, columns: dict, n: int) -> pd.DataFrame:
+    """Run ``n`` scenarios that override ``columns`` on top of ``base``."""
+    inputs = {name: np.full(n, base[name]) for name in INPUT_FIELDS}
+    inputs.update(columns)
+    results = compute_savings(inputs)
+    return pd.DataFrame({name: results[name] for name in OUTPUTS})
+
+
+@lru_cache(maxsize=64)
+def _sweep(key: tuple, swing: float, steps: int) -> pd.DataFrame:
+    base = dict(zip(INPUT_FIELDS, key))
+    factors = np.linspace(-swing, swing, steps)
+    n = len(SWEEP_INPUTS) * steps
+
+    columns = {}
+    values = np.empty(n)
+    for i, name in enumerate(SWEEP_INPUTS):
+        rows = slice(i * steps, (i + 1) * steps)
+        column = np.full(n, base[name])
+        column[rows] = values[rows] = _clip(name, base[name] * (1 + factors))
+        columns[name] = column
+
+    grid = _evaluate(base, columns, n)
+    grid.insert(0, "input", np.repeat(SWEEP_INPUTS, steps))
+    grid.insert(1, "change_pct", np.tile(factors * 100, len(SWEEP_INPUTS)))
+    grid.insert(2, "value", values)
+    return grid
+
+
+def sensitivity_grid(inputs: dict, swing: float = 0.2, steps: int = 9) -> pd.DataFrame:
+    """One row per (swept input, step) with the three headline outputs."""
+    return _sweep(input_key(inputs), float(swing), int(steps)).copy()
+
+
+def tornado(inputs: dict, swing: float = 0.2, output: str = "net_savings_to_brand") -> pd.DataFrame:
+    """Low/high ``output`` per input, widest swing first."""
+    grid = _sweep(input_key(inputs), float(swing), 3)
+    low = grid.groupby("input", sort=False).nth(0).set_index("input")
+    high = grid.groupby("input", sort=False).nth(-1).set_index("input")
+    table = pd.DataFrame({
+        "low_value": low["value"],
+        "high_value": high["value"],
+        "at_low": low[output],
+        "at_high": high[output],
+    })
+    table["spread"] = (table["at_high"] - table["at_low"]).abs()
+    return table.sort_values("spread", ascending=False).reset_index()
+
+
+@lru_cache(maxsize=64)
+def _pair(key: tuple, x: str, y: str, swing: float, steps: int) -> pd.DataFrame:
+    base = dict(zip(INPUT_FIELDS, key))
+    factors = np.linspace(-swing, swing, steps)
+    xs = _clip(x, base[x] * (1 + factors))
+    ys = _clip(y, base[y] * (1 + factors))
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    n = grid_x.size
+
+    grid = _evaluate(base, {x: grid_x.ravel(), y: grid_y.ravel()}, n)
+    grid.insert(0, x, grid_x.ravel())
+    grid.insert(1, y, grid_y.ravel())
+    return grid
+
+
+def heatmap(inputs: dict, x: str, y: str, swing: float = 0.2, steps: int = 15) -> pd.DataFrame:
+    """Long-form ``steps x steps`` grid of outputs over two inputs."""
+    if x == y:
+        raise ValueError("Heatmap needs two different inputs")
+    return _pair(input_key(inputs), x, y, float(swing), int(steps)).copy()
@@ -0,0 +1,416 @@
+###############################################
+# FTZ Savings – Google Sheets Logging
+###############################################
+"""Log rows for the B-test sheet and the background writer that ships them.
+
+UI handlers hand a row to ``SheetWriter.submit``, which commits it to the
+local ``LogSpool`` and returns immediately; a daemon thread replays the spool
+to the sheet in order, one ``append_rows`` call per size or time window,
+retrying with backoff until every row is delivered exactly once.
+"""
+
+import atexit
+import csv
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from log_spool import LogSpool
+from perf import span
+
+logger = logging.getLogger(__name__)
+
+SHEET_NAME = "FTZ_App_B_Test_Log"
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+LOG_COLUMNS = [
+    "timestamp",
+    "session_id",
+    "net_savings",
+    "cost_with_ftz",
+    "cost_without_ftz",
+    "cta_clicked",
+    "cta_name",
+    "cta_company",
+    "cta_email",
+    "cta_phone",
+    "cta_message",
+    "chat_question",
+    "event_id",
+    "variant",
+]
+
+# Where rows wait for delivery, and an optional CSV stand-in for the real sheet
+SPOOL_PATH = os.environ.get("FTZ_LOG_SPOOL", "var/log_spool.sqlite3")
+LOCAL_SHEET_PATH = os.environ.get("FTZ_LOCAL_SHEET", "")
+
+EVENT_ID_INDEX = LOG_COLUMNS.index("event_id")
+
+# Sheets API statuses worth retrying: quota exhaustion and server-side errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SheetSchemaError(ValueError):
+    """The sheet's header row can't be reconciled with ``LOG_COLUMNS``."""
+
+
+# Wall-clock cost of the last sheet connection, in milliseconds per phase
+STARTUP_TIMINGS = {}
+
+
+def open_sheet(service_account_info: dict, worksheet: str = None, columns: list = LOG_COLUMNS):
+    """The log sheet, or the named worksheet of the same spreadsheet (created if missing).
+
+    The Google client is imported here, on the first connection, so a cold
+    start never pays for it before the page is up.
+    """
+    started = time.perf_counter()
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    imported = time.perf_counter()
+    creds = Credentials.from_service_account_info(
+        service_account_info,
+        scopes=SCOPES
+    )
+    client = gspread.authorize(creds)
+    authorized = time.perf_counter()
+    spreadsheet = client.open(SHEET_NAME)
+    if worksheet is None:
+        sheet = spreadsheet.sheet1
+    else:
+        try:
+            sheet = spreadsheet.worksheet(worksheet)
+        except gspread.exceptions.WorksheetNotFound:
+            sheet = spreadsheet.add_worksheet(worksheet, rows=1000, cols=len(columns))
+    opened = time.perf_counter()
+
+    STARTUP_TIMINGS["import_ms"] = (imported - started) * 1000
+    STARTUP_TIMINGS["authorize_ms"] = (authorized - imported) * 1000
+    STARTUP_TIMINGS["open_ms"] = (opened - authorized) * 1000
+    ensure_header(sheet, columns)
+    STARTUP_TIMINGS["total_ms"] = (time.perf_counter() - started) * 1000
+    logger.info(
+        "Log sheet ready in %.0f ms (import %.0f, authorize %.0f, open %.0f, header %.0f)",
+        STARTUP_TIMINGS["total_ms"],
+        STARTUP_TIMINGS["import_ms"],
+        STARTUP_TIMINGS["authorize_ms"],
+        STARTUP_TIMINGS["open_ms"],
+        STARTUP_TIMINGS["header_ms"],
+    )
+    return sheet
+
+
+def ensure_header(sheet, columns: list = LOG_COLUMNS):
+    """Create or migrate the header row, reading nothing but row 1.
+
+    A header that is an older prefix of ``columns`` gets the new columns
+    added in place; anything else raises ``SheetSchemaError`` so rows stay
+    spooled rather than landing under the wrong headings.
+    """
+    started = time.perf_counter()
+    header = [cell or "" for cell in sheet.row_values(1)]
+    while header and not header[-1]:
+        header.pop()
+
+    if header != columns:
+        if header != columns[:len(header)]:
+            raise SheetSchemaError(
+                f"Sheet header {header} does not match the expected columns {columns}"
+            )
+        if sheet.col_count < len(columns):
+            sheet.add_cols(len(columns) - sheet.col_count)
+        sheet.update(values=[columns], range_name="A1")
+        if header:
+            logger.info("Added log columns %s", columns[len(header):])
+
+    STARTUP_TIMINGS["header_ms"] = (time.perf_counter() - started) * 1000
+    return sheet
+
+
+def build_row(row: dict) -> list:
+    # Force EST timestamp
+    row["timestamp"] = datetime.now(
+        ZoneInfo("America/New_York")
+    ).strftime("%Y-%m-%d %H:%M:%S %Z")
+
+    # Unique per event so a replay after a crash never duplicates the row
+    row.setdefault("event_id", uuid.uuid4().hex)
+
+    # Build row strictly by column order
+    return [row.get(col, "") for col in LOG_COLUMNS]
+
+
+def _is_retryable(exc: Exception) -> bool:
+    # An APIError can only come from gspread once something has imported it
+    gspread = sys.modules.get("gspread")
+    if gspread is not None and isinstance(exc, gspread.exceptions.APIError):
+        return exc.response.status_code in RETRY_STATUSES
+    # Dropped connections and timeouts from the HTTP layer
+    return isinstance(exc, OSError)
+
+
+class LocalSheet:
+    """CSV-backed stand-in for a gspread worksheet, for offline runs and tests.
+
+    ``latency`` (seconds) is slept on every call to mimic the real API.
+    """
+
+    def __init__(self, path: str, latency: float = 0.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.latency = latency
+        self._lock = threading.Lock()
+        if not os.path.exists(path):
+            open(path, "w", newline="").close()
+
+    @property
+    def row_count(self) -> int:
+        return len(self.get_all_values())
+
+    @property
+    def col_count(self) -> int:
+        return max((len(r) for r in self.get_all_values()), default=0)
+
+    def get_all_values(self) -> list:
+        self._wait()
+        with self._lock, open(self.path, newline="") as f:
+            return [row for row in csv.reader(f)]
+
+    def row_values(self, index: int) -> list:
+        self._wait()
+        with self._lock, open(self.path, newline="") as f:
+            for number, row in enumerate(csv.reader(f), start=1):
+                if number == index:
+                    return row
+        return []
+
+    def get(self, range_name: str) -> list:
+        # Only whole-row ranges like "A2:M501", which is all the analytics read
+        start, end = (int(n) for n in re.findall(r"\d+", range_name))
+        return self.get_all_values()[start - 1:end]
+
+    def col_values(self, index: int) -> list:
+        return [r[index - 1] if index <= len(r) else "" for r in self.get_all_values()]
+
+    def append_row(self, values: list, value_input_option=None):
+        self.append_rows([values], value_input_option)
+
+    def update(self, values: list, range_name: str = "A1", **kwargs):
+        # Only whole rows anchored in column A, which is all the logger needs
+        start = int(range_name.lstrip("Aa")) - 1
+        rows = self.get_all_values()
+        rows.extend([] for _ in range(start + len(values) - len(rows)))
+        for offset, row in enumerate(values):
+            rows[start + offset] = [_cell(v) for v in row]
+        with self._lock, open(self.path, "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+
+    def add_cols(self, cols: int):
+        # A CSV file has no fixed grid to grow
+        pass
+
+    def append_rows(self, values: list, value_input_option=None):
+        self._wait()
+        with self._lock, open(self.path, "a", newline="") as f:
+            csv.writer(f).writerows([[_cell(v) for v in row] for row in values])
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value)
+
+
+class SheetWriter:
+    """Process-wide replayer that drains the log spool to the sheet.
+
+    ``sheet_factory`` is called lazily on the writer thread (at the first
+    delivery, or as soon as ``warm_up`` asks), so authorizing with Google
+    never happens on the request path either. Rows stay in the
+    spool until ``append_rows`` succeeds; after any failed send the sheet's
+    ``event_id`` column (at ``event_id_index``) is checked before retrying,
+    so a batch that landed despite an error (or just before a crash) is never
+    written twice.
+
+    A batch the sheet rejects outright (not a timeout or 429/5xx) is resent
+    one row at a time to find the culprit; a row rejected ``max_attempts``
+    times goes to the spool's dead letters. No error, spool errors included,
+    ends the replayer thread: it logs, backs off and tries again.
+    """
+
+    def __init__(
+        self,
+        sheet_factory,
+        spool: LogSpool,
+        batch_size: int = 200,
+        flush_interval: float = 2.0,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+        event_id_index: int = EVENT_ID_INDEX,
+        max_attempts: int = 5,
+    ):
+        self._sheet_factory = sheet_factory
+        self._sheet = None
+        self.spool = spool
+        self.event_id_index = event_id_index
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_attempts = max_attempts
+
+        self._reconciled = False
+        # Rows still to send one at a time after a rejected batch
+        self._isolate = 0
+        self._failures = 0
+        self._warm = False
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row: list) -> bool:
+        """Spool an ordered row to disk without waiting on the Sheets API."""
+        try:
+            self.spool.append(row[self.event_id_index], row)
+        except sqlite3.Error:
+            logger.exception("Could not spool log row %s", row[self.event_id_index])
+            return False
+        self._wake.set()
+        return True
+
+    def warm_up(self):
+        """Connect on the writer thread now instead of when the first row is due."""
+        self._warm = True
+        self._wake.set()
+
+    def close(self, timeout: float = 10.0):
+        """Make a last delivery attempt; anything unsent stays spooled."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    # -----------------------------
+    # REPLAYER THREAD
+    # -----------------------------
+    def _run(self):
+        self._last_purge = 0.0
+        while True:
+            closing = self._closed.is_set()
+            try:
+                outcome = self._step(closing)
+            except Exception:
+                # A spool error (disk full, locked database) must not end the
+                # thread, or rows would only pile up from here on
+                logger.exception("Log writer error, retrying")
+                outcome = False
+            if outcome is None:
+                return
+            if outcome:
+                self._failures = 0
+            elif closing:
+                return
+            else:
+                self._backoff()
+
+    def _step(self, closing: bool):
+        """One pass of the replayer: True if it made progress, False to back off, None when done."""
+        batch = self.spool.pending(1 if self._isolate else self.batch_size)
+        if not batch:
+            if closing:
+                return None
+            if self._warm and self._sheet is None:
+                self._connect()
+            if time.monotonic() - self._last_purge > 3600:
+                self.spool.purge_delivered()
+                self._last_purge = time.monotonic()
+            self._sleep(1.0)
+            return True
+
+        # Hold a partial batch until its oldest row has waited one window
+        remaining = batch[0][2] + self.flush_interval - time.time()
+        if len(batch) < self.batch_size and not self._isolate and remaining > 0 and not closing:
+            self._sleep(remaining)
+            return True
+        return self._deliver(batch)
+
+    def _backoff(self):
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** self._failures)
+        self._failures += 1
+        self._closed.wait(delay * random.uniform(0.5, 1.0))
+
+    def _sleep(self, timeout: float):
+        self._wake.wait(timeout)
+        self._wake.clear()
+
+    def _connect(self):
+        # One early attempt; if it fails, the first delivery retries as usual
+        self._warm = False
+        try:
+            self._sheet = self._sheet_factory()
+        except Exception as exc:
+            logger.warning("Early sheet connection failed, will retry on first delivery: %s", exc)
+
+    def _deliver(self, batch: list) -> bool:
+        ids = [b[0] for b in batch]
+        appending = False
+        try:
+            if self._sheet is None:
+                self._sheet = self._sheet_factory()
+            if not self._reconciled and self._reconcile():
+                # Some of this batch was re-labelled; fetch it again
+                return True
+            self.spool.mark_sending(ids)
+            appending = True
+            with span("sheet.append_rows"):
+                self._sheet.append_rows([b[3] for b in batch], value_input_option="USER_ENTERED")
+        except Exception as exc:
+            # The rows may or may not have landed; check before the next send
+            self._reconciled = False
+            if _is_retryable(exc) or not appending:
+                # Connection and auth trouble is never the rows' fault
+                logger.warning("Sheet append failed, %d rows kept in spool: %s", len(ids), exc)
+                return False
+            logger.error("Sheet append rejected, %d rows kept in spool: %s", len(ids), exc)
+            if len(batch) > 1:
+                # One bad row fails the whole append; send these singly to find it
+                self._isolate = len(batch)
+            elif self.spool.record_failure(ids) >= self.max_attempts:
+                self.spool.mark_dead(ids)
+                self._isolate = max(0, self._isolate - 1)
+                logger.error("Log row %s rejected %d times, moved to dead letters", batch[0][1], self.max_attempts)
+                return True
+            return False
+        self.spool.mark_delivered(ids)
+        self._isolate = max(0, self._isolate - 1)
+        return True
+
+    def _reconcile(self) -> bool:
+        """Settle rows left in ``sending``; True if any were found."""
+        in_flight = self.spool.in_flight()
+        if in_flight:
+            logged = set(self._sheet.col_values(self.event_id_index + 1))
+            self.spool.mark_delivered([i for i, event_id in in_flight if event_id in logged])
+            self.spool.mark_pending([i for i, event_id in in_flight if event_id not in logged])
+        self._reconciled = True
+        return bool(in_flight)
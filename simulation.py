@@ -0,0 +1,184 @@
+###############################################
+# FTZ Savings – Monte Carlo Simulation
+###############################################
+"""Distribution of net savings when inputs are uncertain.
+
+Any input can be given a distribution instead of a point value:
+
+    ("range", low, high)              uniform between low and high
+    ("triangular", low, mode, high)
+    ("normal", mean, sd)
+
+Scenarios are drawn in fixed-size chunks on a process pool and each chunk is
+reduced to a small summary (counts, moments and a quantile sketch) before it
+comes back, so memory stays flat no matter how many scenarios are run.
+Every chunk gets its own child of one ``SeedSequence``: the same seed gives
+the same answer regardless of worker count.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from calculations import INPUT_BOUNDS, INPUT_DEFAULTS, INPUT_FIELDS, compute_savings
+
+CHUNK_SIZE = 65536
+
+# Per-chunk quantile sketch resolution; merged sketches are compacted back to it
+SKETCH_POINTS = 4097
+
+# Merge this many chunk sketches before compacting the pool of points
+_COMPACT_EVERY = 64
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ProcessPoolExecutor:
+    """Shared worker pool, started on first use and reused across runs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: never fork a server process that has live threads
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def distribution_around(value: float, kind: str, spread: float) -> tuple:
+    """A ``kind`` distribution centred on ``value``, ±``spread`` (fraction) wide.
+
+    For "normal" the spread is two standard deviations, so roughly 95% of
+    draws land inside the same band as the other two kinds.
+    """
+    low, high = sorted((value * (1 - spread), value * (1 + spread)))
+    if kind == "range":
+        return ("range", low, high)
+    if kind == "triangular":
+        return ("triangular", low, value, high)
+    if kind == "normal":
+        return ("normal", value, abs(value) * spread / 2)
+    raise ValueError(f"Unknown distribution {kind!r}")
+
+
+def _draw(rng: np.random.Generator, name: str, spec: tuple, n: int) -> np.ndarray:
+    kind, *params = spec
+    if kind == "range":
+        low, high = params
+        values = rng.uniform(low, high, n)
+    elif kind == "triangular":
+        low, mode, high = params
+        values = rng.triangular(low, mode, high, n) if high > low else np.full(n, float(mode))
+    elif kind == "normal":
+        mean, sd = params
+        values = rng.normal(mean, sd, n)
+    else:
+        raise ValueError(f"Unknown distribution {kind!r} for {name}")
+
+    low, high = INPUT_BOUNDS.get(name, (None, None))
+    if low is not None or high is not None:
+        values = np.clip(values, low, high)
+    return values
+
+
+def _run_chunk(task: tuple) -> tuple:
+    base, distributions, seed, n = task
+    rng = np.random.default_rng(seed)
+    inputs = dict(base)
+    for name in INPUT_FIELDS:
+        if name in distributions:
+            inputs[name] = _draw(rng, name, distributions[name], n)
+    net = np.broadcast_to(compute_savings(inputs)["net_savings_to_brand"], (n,))
+
+    sketch = np.quantile(net, np.linspace(0, 1, SKETCH_POINTS))
+    return n, int((net < 0).sum()), float(net.sum()), float(np.square(net).sum()), sketch
+
+
+def _weighted_quantiles(points: np.ndarray, weights: np.ndarray, q: np.ndarray) -> np.ndarray:
+    order = np.argsort(points)
+    points, weights = points[order], weights[order]
+    cumulative = (np.cumsum(weights) - 0.5 * weights) / weights.sum()
+    return np.interp(q, cumulative, points)
+
+
+class _Sketch:
+    """Weighted quantile points merged from chunk sketches, compacted as it grows."""
+
+    def __init__(self):
+        self.points = []
+        self.weights = []
+
+    def add(self, points: np.ndarray, count: int):
+        self.points.append(points)
+        self.weights.append(np.full(len(points), count / len(points)))
+        if len(self.points) >= _COMPACT_EVERY:
+            self._compact()
+
+    def quantiles(self, q) -> np.ndarray:
+        return _weighted_quantiles(np.concatenate(self.points), np.concatenate(self.weights), np.asarray(q))
+
+    def _compact(self):
+        total = sum(w.sum() for w in self.weights)
+        points = self.quantiles(np.linspace(0, 1, SKETCH_POINTS))
+        self.points = [points]
+        self.weights = [np.full(SKETCH_POINTS, total / SKETCH_POINTS)]
+
+
+def simulate(
+    inputs: dict,
+    distributions: dict,
+    n: int = 1_000_000,
+    seed: int = 0,
+    chunk_size: int = CHUNK_SIZE,
+    parallel: bool = True,
+) -> dict:
+    """Simulate ``n`` scenarios and summarize net savings to the brand.
+
+    ``inputs`` are the point values for everything not in ``distributions``.
+    Chunks run on the shared process pool when ``parallel`` is set and there
+    is more than one core to use.
+    Returns P5/P50/P95, mean, standard deviation, the probability savings are
+    negative, and a 101-point quantile curve for charting.
+    """
+    base = {**INPUT_DEFAULTS, **inputs}
+    base = {name: float(base[name]) for name in INPUT_FIELDS}
+    distributions = {name: tuple(spec) for name, spec in distributions.items()}
+
+    sizes = [chunk_size] * (n // chunk_size) + ([n % chunk_size] if n % chunk_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(base, distributions, s, size) for s, size in zip(seeds, sizes)]
+
+    if parallel and len(tasks) > 1 and (os.cpu_count() or 1) > 1:
+        summaries = _executor().map(_run_chunk, tasks)
+    else:
+        summaries = map(_run_chunk, tasks)
+
+    total = negative = 0
+    total_sum = total_sq = 0.0
+    sketch = _Sketch()
+    for count, below_zero, chunk_sum, chunk_sq, points in summaries:
+        total += count
+        negative += below_zero
+        total_sum += chunk_sum
+        total_sq += chunk_sq
+        sketch.add(points, count)
+
+    mean = total_sum / total
+    p5, p50, p95 = sketch.quantiles([0.05, 0.50, 0.95])
+    return {
+        "scenarios": total,
+        "p5": float(p5),
+        "p50": float(p50),
+        "p95": float(p95),
+        "mean": mean,
+        "std": float(np.sqrt(max(total_sq / total - mean * mean, 0.0))),
+        "prob_negative": negative / total,
+        "quantile_curve": sketch.quantiles(np.linspace(0, 1, 101)),
+    }
@@ -0,0 +1,222 @@
+###############################################
+# FTZ Savings – HTS Duty Engine
+###############################################
+"""Duty from a SKU/HTS mix using a precompiled tariff rate table.
+
+The tariff CSV (``hts_code``, ``general_rate_pct``) is compiled once into a
+sorted NumPy record file of ``uint64`` codes and ``float64`` rates. Loading
+it is a memory map, so opening even a full tariff schedule costs nothing,
+and lookups are vectorized binary searches. Codes are compared as 10-digit
+numbers; a 10-digit code with no exact line falls back to its 8- and then
+6-digit heading.
+
+Next to the record file, ``<compiled>.json`` names the CSV it was compiled
+from with that file's size, mtime and SHA-256. The table is recompiled when
+it was built from another CSV or the CSV's content changed; a CSV that was
+only touched or copied over with the same bytes keeps the compiled table.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from portfolio import normalize_header, read_chunks
+
+TARIFF_CSV = os.environ.get("FTZ_TARIFF_TABLE", "data/hts_rates.csv")
+TARIFF_COMPILED = os.environ.get("FTZ_TARIFF_COMPILED", "var/hts_rates.npy")
+
+TABLE_DTYPE = np.dtype([("code", "<u8"), ("rate", "<f8")])
+
+# Divisors that truncate a 10-digit code to its 8- and 6-digit heading
+_FALLBACKS = (100, 10000)
+
+MIX_ALIASES = {
+    "hts": "hts_code",
+    "htscode": "hts_code",
+    "htsnumber": "hts_code",
+    "tariffcode": "hts_code",
+    "value": "value",
+    "importvalue": "value",
+    "annualvalue": "value",
+    "share": "value",
+    "sharepct": "value",
+    "sku": "sku",
+}
+
+
+def normalize_codes(codes) -> np.ndarray:
+    """HTS strings like ``6109.10.00`` -> 10-digit ``uint64`` (0 if unreadable)."""
+    out = np.zeros(len(codes), dtype=np.uint64)
+    for i, code in enumerate(codes):
+        digits = re.sub(r"\D", "", str(code))[:10]
+        if digits:
+            out[i] = int(digits.ljust(10, "0"))
+    return out
+
+
+def _stamp_path(out_path: str) -> str:
+    return out_path + ".json"
+
+
+def _source_stamp(csv_path: str) -> tuple:
+    """``(stamp, raw bytes)`` of the CSV: what identifies the file a table was compiled from."""
+    # Stat before reading: an edit landing in between leaves the stamp stale
+    # rather than pairing the new mtime with the old bytes
+    stat = os.stat(csv_path)
+    with open(csv_path, "rb") as f:
+        raw = f.read()
+    stamp = {
+        "source": os.path.abspath(csv_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hashlib.sha256(raw).hexdigest(),
+    }
+    return stamp, raw
+
+
+def _write_stamp(out_path: str, stamp: dict):
+    tmp_path = _stamp_path(out_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stamp, f)
+    os.replace(tmp_path, _stamp_path(out_path))
+
+
+def is_compiled(csv_path: str = TARIFF_CSV, out_path: str = TARIFF_COMPILED) -> bool:
+    """Whether ``out_path`` holds the table for the current content of ``csv_path``.
+
+    Only hashes the CSV when its size or mtime moved; if the bytes turn out
+    to be the same, the stamp is refreshed so the next check is a stat again.
+    """
+    try:
+        with open(_stamp_path(out_path), encoding="utf-8") as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not os.path.exists(out_path) or stamp.get("source") != os.path.abspath(csv_path):
+        return False
+    stat = os.stat(csv_path)
+    if stamp.get("size") == stat.st_size and stamp.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    current, _ = _source_stamp(csv_path)
+    if current["sha256"] != stamp.get("sha256"):
+        return False
+    _write_stamp(out_path, current)
+    return True
+
+
+def compile_tariff_table(csv_path: str = TARIFF_CSV, out_path: str = TARIFF_COMPILED) -> str:
+    """Sort and pack the tariff CSV into the record file ``TariffTable`` maps, and stamp it."""
+    stamp, raw = _source_stamp(csv_path)
+    source = pd.read_csv(io.BytesIO(raw), dtype={"hts_code": str})
+    table = np.empty(len(source), dtype=TABLE_DTYPE)
+    table["code"] = normalize_codes(source["hts_code"])
+    table["rate"] = source["general_rate_pct"].astype(np.float64)
+    table = table[table["code"] > 0]
+    table.sort(order="code")
+    if len(table) > 1 and (np.diff(table["code"].astype(np.int64)) == 0).any():
+        raise ValueError(f"Duplicate HTS codes in {csv_path}")
+
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = out_path + ".tmp.npy"
+    np.save(tmp_path, table)
+    os.replace(tmp_path, out_path)
+    _write_stamp(out_path, stamp)
+    return out_path
+
+
+class TariffTable:
+    def __init__(self, compiled_path: str = TARIFF_COMPILED):
+        table = np.load(compiled_path, mmap_mode="r")
+        self.codes = table["code"]
+        self.rates = table["rate"]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def lookup(self, codes) -> np.ndarray:
+        """Duty rate (%) per code, NaN where neither the code nor its heading is listed."""
+        wanted = normalize_codes(codes)
+        rates = np.full(len(wanted), np.nan)
+        pending = wanted > 0
+        for divisor in (1, *_FALLBACKS):
+            if not pending.any() or len(self.codes) == 0:
+                break
+            keys = wanted[pending] // divisor * divisor
+            pos = np.minimum(np.searchsorted(self.codes, keys), len(self.codes) - 1)
+            found = self.codes[pos] == keys
+            idx = np.flatnonzero(pending)
+            rates[idx[found]] = self.rates[pos[found]]
+            pending[idx[found]] = False
+        return rates
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_tariff_table() -> TariffTable:
+    """Process-wide table, recompiled only when the CSV's path or content changed (see ``is_compiled``)."""
+    global _table
+    with _table_lock:
+        if not is_compiled():
+            compile_tariff_table()
+            _table = None
+        if _table is None:
+            _table = TariffTable()
+        return _table
+
+
+def read_mix(source, filename: str) -> pd.DataFrame:
+    """Load a SKU/HTS mix: one row per line with an HTS code and an import value or share."""
+    parts = []
+    for chunk in read_chunks(source, filename):
+        columns = {}
+        for column in chunk.columns:
+            name = MIX_ALIASES.get(normalize_header(column))
+            if name and name not in columns:
+                columns[name] = chunk[column]
+        if "hts_code" not in columns:
+            raise ValueError("SKU mix needs an HTS code column")
+        value = columns.get("value", pd.Series(1.0, index=chunk.index))
+        parts.append(pd.DataFrame({
+            "sku": columns.get("sku", pd.Series("", index=chunk.index)).astype(str),
+            "hts_code": columns["hts_code"].astype(str),
+            "value": pd.to_numeric(value.astype(str).str.replace(r"[$,%\s]", "", regex=True), errors="coerce").fillna(0.0),
+        }))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["sku", "hts_code", "value"])
+
+
+def duty_by_line(mix: pd.DataFrame, table: TariffTable, default_duty_pct: float) -> pd.DataFrame:
+    """Rate and duty per mix line; codes missing from the table use ``default_duty_pct``."""
+    rates = table.lookup(mix["hts_code"].to_numpy())
+    lines = mix.copy()
+    lines["matched"] = ~np.isnan(rates)
+    lines["duty_pct"] = np.where(lines["matched"], rates, default_duty_pct)
+    lines["duty"] = lines["value"] * lines["duty_pct"] / 100
+    return lines
+
+
+def roll_up(lines: pd.DataFrame, total_import_value: float, export_pct: float, offspec_pct: float) -> dict:
+    """Scale the mix to the annual import value and derive the duty line items.
+
+    Mix values only set each line's share; the blended rate they imply is the
+    ``duty_pct`` that makes the calculator reproduce these totals exactly.
+    """
+    mix_value = float(lines["value"].sum())
+    effective_duty_pct = float(lines["duty"].sum() / mix_value * 100) if mix_value > 0 else 0.0
+    total_duty = total_import_value * effective_duty_pct / 100
+    return {
+        "effective_duty_pct": effective_duty_pct,
+        "total_duty": total_duty,
+        "duty_saved_export": total_duty * export_pct / 100,
+        "duty_saved_offspec": total_duty * offspec_pct / 100,
+        "matched_share": float(lines.loc[lines["matched"], "value"].sum() / mix_value) if mix_value > 0 else 0.0,
+    }
@@ -0,0 +1,129 @@
+"""``calculations`` against the calculator's original scalar formulas."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculations import (
+    INPUT_DEFAULTS,
+    INPUT_FIELDS,
+    LINE_ITEMS,
+    MPF_CAP,
+    MPF_MIN,
+    cached_savings,
+    compute_savings,
+    savings_frame,
+)
+
+
+def reference(shipments_per_week, avg_import_value, mpf_pct, broker_cost, current_interest_rate,
+              export_pct, offspec_pct, hmf_pct, duty_pct, avg_stock_days, ftz_consult, ftz_mgmt,
+              ftz_software, ftz_bond, noftz_consult, noftz_mgmt, noftz_software, noftz_bond):
+    """The CALCULATIONS block app.py ran before the engine existed, line for line."""
+    export_sales = export_pct / 100
+    off_spec = offspec_pct / 100
+    avg_duty = duty_pct / 100
+    mpf_rate = mpf_pct / 100
+    hmf_rate = hmf_pct / 100
+
+    total_import_value = shipments_per_week * avg_import_value * 52
+    entries_per_year = shipments_per_week * 52
+
+    total_duty = total_import_value * avg_duty
+    duty_saved_export = total_import_value * export_sales * avg_duty
+    duty_saved_offspec = total_import_value * off_spec * avg_duty
+
+    total_net_duty_no_ftz = total_duty
+    total_net_duty_with_ftz = total_duty - duty_saved_export - duty_saved_offspec
+
+    per_entry_mpf = min(avg_import_value * mpf_rate, 634.62)
+    mpf_no_ftz = per_entry_mpf * entries_per_year
+    mpf_with_ftz = min(shipments_per_week * avg_import_value * mpf_rate, 634.62) * 52
+
+    broker_hmf_no_ftz = entries_per_year * broker_cost + shipments_per_week * avg_import_value * hmf_rate
+    broker_hmf_with_ftz = 52 * broker_cost + shipments_per_week * avg_import_value * hmf_rate
+
+    cost_with_ftz = ftz_consult + ftz_mgmt + ftz_software + ftz_bond
+    cost_without_ftz = noftz_consult + noftz_mgmt + noftz_software + noftz_bond
+
+    interest_rate = current_interest_rate / 100
+    total_wc_saving = total_net_duty_with_ftz * interest_rate * (avg_stock_days / 365)
+
+    total_cost_without_ftz = total_net_duty_no_ftz + mpf_no_ftz + broker_hmf_no_ftz + cost_without_ftz
+    total_cost_with_ftz = total_net_duty_with_ftz + mpf_with_ftz + broker_hmf_with_ftz + cost_with_ftz - total_wc_saving
+
+    net_savings_to_brand = total_cost_without_ftz - total_cost_with_ftz
+    return {name: float(value) for name, value in locals().items() if name in LINE_ITEMS}
+
+
+MPF_RATE = INPUT_DEFAULTS["mpf_pct"] / 100
+
+SCENARIOS = {
+    "defaults": {},
+    # Per-entry MPF exactly at the floor, and below it (the calculator does not floor)
+    "mpf_at_floor": {"avg_import_value": MPF_MIN / MPF_RATE},
+    "mpf_below_floor": {"shipments_per_week": 1, "avg_import_value": 5000},
+    # Per-entry MPF exactly at the cap, and weekly value just over it
+    "mpf_at_cap": {"avg_import_value": MPF_CAP / MPF_RATE},
+    "mpf_over_cap": {"shipments_per_week": 1, "avg_import_value": MPF_CAP / MPF_RATE + 1},
+    "no_ftz_costs": {
+        "shipments_per_week": 7, "avg_import_value": 1000, "export_pct": 100.0, "offspec_pct": 0.0,
+        "duty_pct": 0.0, "ftz_consult": 0, "ftz_mgmt": 0, "ftz_software": 0, "ftz_bond": 0,
+        "noftz_consult": 12000, "noftz_mgmt": 3500, "noftz_software": 800, "noftz_bond": 250,
+    },
+    "high_volume": {
+        "shipments_per_week": 40, "avg_import_value": 2_750_000, "mpf_pct": 0.3464, "broker_cost": 95.5,
+        "current_interest_rate": 8.25, "export_pct": 12.5, "offspec_pct": 3.0, "hmf_pct": 0.125,
+        "duty_pct": 17.5, "avg_stock_days": 120,
+    },
+}
+
+
+def _expected(overrides):
+    return reference(**{**INPUT_DEFAULTS, **overrides})
+
+
+@pytest.mark.parametrize("overrides", SCENARIOS.values(), ids=SCENARIOS.keys())
+def test_scalar_matches_reference(overrides):
+    assert compute_savings(overrides) == _expected(overrides)
+
+
+@pytest.mark.parametrize("overrides", SCENARIOS.values(), ids=SCENARIOS.keys())
+def test_cached_matches_reference(overrides):
+    expected = _expected(overrides)
+    # The second call is served from the cache
+    assert cached_savings(overrides) == expected
+    assert cached_savings(overrides) == expected
+
+
+def test_mpf_floor_and_cap_scenarios():
+    assert compute_savings(SCENARIOS["mpf_at_floor"])["per_entry_mpf"] == pytest.approx(MPF_MIN)
+    assert compute_savings(SCENARIOS["mpf_below_floor"])["per_entry_mpf"] < MPF_MIN
+    assert compute_savings(SCENARIOS["mpf_at_cap"])["per_entry_mpf"] == pytest.approx(MPF_CAP)
+    assert compute_savings(SCENARIOS["mpf_over_cap"])["mpf_with_ftz"] == MPF_CAP * 52
+
+
+def test_batch_matches_reference():
+    rows = [{**INPUT_DEFAULTS, **overrides} for overrides in SCENARIOS.values()]
+    results = compute_savings({name: [row[name] for row in rows] for name in INPUT_FIELDS})
+    for i, row in enumerate(rows):
+        assert {name: float(results[name][i]) for name in LINE_ITEMS} == reference(**row)
+
+
+def test_savings_frame_matches_reference():
+    # Only some input columns; the rest come from the defaults
+    df = pd.DataFrame(
+        {"shipments_per_week": [1, 2, 40], "avg_import_value": [5000, MPF_CAP / MPF_RATE, 2_750_000]},
+        index=[10, 20, 30],
+    )
+    frame = savings_frame(df, defaults={"duty_pct": 12.0})
+    assert list(frame.index) == [10, 20, 30]
+    for index, row in df.iterrows():
+        expected = reference(**{**INPUT_DEFAULTS, "duty_pct": 12.0, **row.to_dict()})
+        assert frame.loc[index, list(LINE_ITEMS)].to_dict() == expected
+
+
+def test_batch_broadcasts_scalars():
+    results = compute_savings(shipments_per_week=np.arange(1, 4))
+    assert all(results[name].shape == (3,) for name in LINE_ITEMS)
+    assert float(results["net_savings_to_brand"][1]) == reference(**INPUT_DEFAULTS)["net_savings_to_brand"]
@@ -0,0 +1,13 @@
+"""Cold start stays within ``benchmarks.bench_startup.BUDGET``."""
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+# Sandboxes every path the app writes to before anything else imports it
+import benchmarks  # noqa: E402,F401
+from benchmarks import bench_startup  # noqa: E402
+
+
+def test_cold_start_within_budget():
+    assert bench_startup.over_budget(bench_startup.run(rounds=3)) == []